@@ -0,0 +1,63 @@
+import asyncio
+import os
+import random
+
+
+class FakeUserMessage:
+    """Stand-in for emergentintegrations' UserMessage, so the fake backend never imports the SDK"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeLlmError(Exception):
+    """An injected provider failure"""
+
+
+class FakeLlmChat:
+    """Local stand-in for LlmChat that answers without calling a provider.
+
+    Enabled in server.py with LLM_BACKEND=fake. Replies echo the start of the prompt and are
+    streamed word by word, one chunk every LLM_FAKE_CHUNK_DELAY seconds. To exercise timeouts and
+    the circuit breaker, LLM_FAKE_FAILURE_RATE makes that share of calls fail with FakeLlmError
+    after the first chunk's delay.
+    """
+
+    def __init__(self, api_key=None, session_id=None, system_message=None, chunk_delay=None, failure_rate=None):
+        self.session_id = session_id
+        self.system_message = system_message
+        self.chunk_delay = float(chunk_delay if chunk_delay is not None else os.environ.get('LLM_FAKE_CHUNK_DELAY', 0.05))
+        self.failure_rate = float(failure_rate if failure_rate is not None else os.environ.get('LLM_FAKE_FAILURE_RATE', 0))
+        self.provider = None
+        self.model = None
+
+    def with_model(self, provider, model):
+        self.provider = provider
+        self.model = model
+        return self
+
+    def _reply(self, text):
+        first_line = text.strip().splitlines()[0] if text.strip() else ""
+        return (
+            f"Recommendations ({self.model or 'fake'}): "
+            f"1. Finish today's DSA problems first. 2. Push one project commit. "
+            f"3. Send your applications before the evening. Prompt was: {first_line[:80]}"
+        )
+
+    async def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            await asyncio.sleep(self.chunk_delay)
+            raise FakeLlmError("Injected LLM provider failure")
+
+    async def send_message(self, user_message):
+        await self._maybe_fail()
+        reply = self._reply(user_message.text)
+        await asyncio.sleep(self.chunk_delay * len(reply.split()))
+        return reply
+
+    async def stream_message(self, user_message):
+        await self._maybe_fail()
+        words = self._reply(user_message.text).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.chunk_delay)
+            yield word if i == 0 else " " + word
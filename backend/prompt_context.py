@@ -0,0 +1,145 @@
+"""Token-budgeted context for AI recommendation prompts.
+
+The context is built from sections in priority order: today's tasks, a compact progress
+summary, and a digest of earlier recommendations. Each section's lines are counted once, and
+fit_sections keeps the leading lines of each within a token budget, so the prompt stays the
+same size however much history a user has.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+@lru_cache(maxsize=1)
+def _token_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """Token count of `text`, estimated at four characters per token when tiktoken is unavailable"""
+    encoding = _token_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
+
+class ContextSection:
+    """A titled block of prompt lines, most important first, with each line's token count.
+
+    The first fit_sections pass gives a section at most `share` of the budget; whatever the
+    others leave unused is handed out in a second pass.
+    """
+    def __init__(self, name: str, title: str, lines: Iterable[str], share: float):
+        self.name = name
+        self.title = title
+        self.share = share
+        # Counted with the blank line separating it from the section before
+        self.title_tokens = count_tokens("\n" + title + "\n")
+        self.lines = [(line, count_tokens(line + "\n")) for line in lines]
+
+def fit_sections(sections: List[ContextSection], budget: int) -> Tuple[str, Dict[str, int]]:
+    """Render the leading lines of each section that fit in `budget` tokens.
+
+    Returns the context text and the tokens spent per section. A section's title is only
+    spent on when at least one of its lines fits. Lines are counted one by one, so if the joined
+    text still counts over budget, the lowest priority lines are dropped until it fits.
+    """
+    kept = [0] * len(sections)
+    spent = {section.name: 0 for section in sections}
+    total = 0
+    for capped in (True, False):
+        for i, section in enumerate(sections):
+            allowance = budget - total
+            if capped:
+                allowance = min(allowance, int(budget * section.share) - spent[section.name])
+            while kept[i] < len(section.lines):
+                tokens = section.lines[kept[i]][1] + (section.title_tokens if kept[i] == 0 else 0)
+                if tokens > allowance:
+                    break
+                kept[i] += 1
+                allowance -= tokens
+                spent[section.name] += tokens
+                total += tokens
+
+    def render():
+        return "\n\n".join("\n".join([section.title, *(line for line, _ in section.lines[:count])])
+                           for section, count in zip(sections, kept) if count)
+
+    text = render()
+    while any(kept) and count_tokens(text) > budget:
+        i = max(i for i, count in enumerate(kept) if count)
+        kept[i] -= 1
+        spent[sections[i].name] -= sections[i].lines[kept[i]][1] + (sections[i].title_tokens if kept[i] == 0 else 0)
+        text = render()
+    return text, spent
+
+# Sections
+STATUS_MARKS = {"COMPLETED": "✅", "IN_PROGRESS": "⏳"}
+STATUS_ORDER = {"IN_PROGRESS": 0, "PENDING": 1, "COMPLETED": 2}
+
+def task_lines(tasks: List[Dict[str, Any]]) -> List[str]:
+    """One line per task: unfinished tasks first, highest priority first within a status"""
+    if not tasks:
+        return ["Nothing scheduled"]
+    ordered = sorted(tasks, key=lambda task: (STATUS_ORDER.get(task["status"], 1), -task.get("priority", 1)))
+    return [f"{STATUS_MARKS.get(task['status'], '❌')} {task['category']}: {task['description']}" for task in ordered]
+
+def _percent(completed: int, total: int) -> str:
+    return f"{completed / total * 100:.0f}%" if total else "0%"
+
+def summary_lines(week_rollups: List[Dict[str, Any]], overall: Optional[Dict[str, Any]],
+                  recent_days: List[Dict[str, Any]], current_week: int, window_days: int,
+                  previous_weeks: int = 3) -> List[str]:
+    """Compact progress lines: the current week, a few weeks before it, recent completions and overall"""
+    lines = []
+    weeks = {}
+    for rollup in week_rollups:
+        week = weeks.setdefault(rollup["week_number"], {"phase": rollup["phase"], "total": 0, "completed": 0})
+        week["total"] += rollup["total"]
+        week["completed"] += rollup["completed"]
+    if current_week in weeks:
+        week = weeks[current_week]
+        lines.append(f"This week (week {current_week}, {week['phase']}): {week['completed']}/{week['total']} tasks done "
+                     f"({_percent(week['completed'], week['total'])})")
+    earlier = [number for number in sorted(weeks, reverse=True) if number < current_week][:previous_weeks]
+    if earlier:
+        lines.append("Earlier weeks: " + ", ".join(
+            f"week {number} {_percent(weeks[number]['completed'], weeks[number]['total'])}" for number in earlier))
+
+    completed = sum(day.get("completed", 0) for day in recent_days)
+    active = sum(1 for day in recent_days if day.get("completed", 0) > 0)
+    categories: Dict[str, int] = {}
+    for day in recent_days:
+        for category, count in day.get("categories", {}).items():
+            categories[category] = categories.get(category, 0) + count
+    line = f"Last {window_days} days: {completed} tasks completed on {active} of {window_days} days"
+    if categories:
+        line += " (" + ", ".join(f"{category} {count}" for category, count in
+                                 sorted(categories.items(), key=lambda item: -item[1])) + ")"
+    lines.append(line)
+    if overall and overall.get("total"):
+        lines.append(f"Overall: {overall['completed']}/{overall['total']} tasks done "
+                     f"({_percent(overall['completed'], overall['total'])})")
+    return lines
+
+_LIST_MARKER_RE = re.compile(r"^(?:[-*•#>]+|\d+[.)])\s*")
+_NOT_WORDS_RE = re.compile(r"[\W_]+")
+
+def recommendation_lines(recommendations: List[Dict[str, Any]]) -> List[str]:
+    """Distinct advice lines from earlier recommendations, newest first.
+
+    Replies are split into lines and stripped of list markers and markdown emphasis. A line
+    repeating one already kept (ignoring case and punctuation) is dropped, as are headings.
+    """
+    lines, seen = [], set()
+    for recommendation in recommendations:
+        for text in recommendation.get("recommendations", []):
+            for raw in text.splitlines():
+                line = _LIST_MARKER_RE.sub("", raw.strip()).replace("**", "").strip()
+                key = _NOT_WORDS_RE.sub(" ", line.lower()).strip()
+                if not key or line.endswith(":") or key in seen:
+                    continue
+                seen.add(key)
+                lines.append(f"- {line}")
+    return lines
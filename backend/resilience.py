@@ -0,0 +1,194 @@
+"""Deadlines, retries and circuit breaking for calls to storage and the LLM provider.
+
+A deadline is an absolute time.monotonic() instant shared by everything awaited while serving
+one request. Mongo commands inherit it as maxTimeMS through pymongo's client-side timeout, the
+SQLite engine interrupts queries that run past it, and LLM calls shorten their own timeout to
+what is left of it. Retries never wait past it either.
+"""
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+import pymongo
+
+# Deadlines
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+def deadline_at() -> Optional[float]:
+    """The current context's deadline as a time.monotonic() instant, or None when unbounded"""
+    return _deadline.get()
+
+def remaining(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the deadline, at most `cap`; None when neither bounds it"""
+    at = _deadline.get()
+    if at is None:
+        return cap
+    left = at - time.monotonic()
+    return left if cap is None else min(left, cap)
+
+@contextmanager
+def deadline(seconds: float):
+    """Bound everything awaited in this block to `seconds` from now; an outer deadline is never extended"""
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        with pymongo.timeout(seconds):
+            yield
+    finally:
+        _deadline.reset(token)
+
+def is_timeout(error: BaseException) -> bool:
+    """Whether `error` means a deadline or timeout ran out, whichever client raised it"""
+    return isinstance(error, TimeoutError) or getattr(error, "timeout", False) is True
+
+class DeadlineMiddleware:
+    """Give every HTTP request a deadline of `timeout_seconds`.
+
+    Clients may ask for a shorter one with X-Request-Timeout-Ms. Paths in `path_timeouts` get
+    their own fixed deadline instead, which clients cannot shorten. Streamed responses (paths in
+    `exempt_paths`, and requests accepting NDJSON or event streams) run as long as the client
+    keeps reading, so they get none.
+    """
+    STREAMING_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+    def __init__(self, app, timeout_seconds: float, exempt_paths=(), path_timeouts=None):
+        self.app = app
+        self.timeout_seconds = timeout_seconds
+        self.exempt_paths = set(exempt_paths)
+        self.path_timeouts = dict(path_timeouts or {})
+
+    def timeout_for(self, scope) -> Optional[float]:
+        if scope["path"] in self.exempt_paths:
+            return None
+        if scope["path"] in self.path_timeouts:
+            return self.path_timeouts[scope["path"]]
+        headers = dict(scope["headers"])
+        accept = headers.get(b"accept", b"").decode("latin-1")
+        if any(media_type in accept for media_type in self.STREAMING_MEDIA_TYPES):
+            return None
+        try:
+            requested = float(headers.get(b"x-request-timeout-ms", b"")) / 1000
+        except ValueError:
+            return self.timeout_seconds
+        return min(self.timeout_seconds, requested) if requested > 0 else self.timeout_seconds
+
+    async def __call__(self, scope, receive, send):
+        timeout = self.timeout_for(scope) if scope["type"] == "http" else None
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+        with deadline(timeout):
+            await self.app(scope, receive, send)
+
+# Retries
+async def retry(call: Callable[[], Awaitable[Any]], is_transient: Callable[[BaseException], bool],
+                attempts: int = 3, base_delay: float = 0.05, max_delay: float = 1.0,
+                on_retry: Optional[Callable[[BaseException, int], None]] = None) -> Any:
+    """Await call(), retrying transient failures up to `attempts` times in all.
+
+    Waits between attempts back off exponentially with full jitter, so callers that failed
+    together do not retry together. Only retry calls that are safe to repeat. A failure is
+    re-raised at once when it is not transient, or when the wait would pass the deadline.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == attempts or is_timeout(e) or not is_transient(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            left = remaining()
+            if left is not None and delay >= left:
+                raise
+            if on_retry is not None:
+                on_retry(e, attempt)
+            await asyncio.sleep(delay)
+
+# Circuit breaking
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable after repeated failures; retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Stop calling a dependency that keeps failing, then probe it until it recovers.
+
+    Closed, calls go through. After `failure_threshold` consecutive failures the circuit opens
+    and calls fail fast with CircuitOpenError for `reset_seconds`. Then it is half open: one trial
+    call goes through, closing the circuit if it succeeds and reopening it if it fails.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self._opened_at >= self.reset_seconds else "open"
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call is let through"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_seconds - self.clock())
+
+    def check(self):
+        """Raise CircuitOpenError if a call would be rejected now, without claiming the trial call"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            raise CircuitOpenError(self.name, self.retry_after() or self.reset_seconds)
+
+    def before_call(self):
+        self.check()
+        if self.state == "half_open":
+            self._probing = True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            self._opened_at = self.clock()
+        self._probing = False
+
+    def release(self):
+        """Give up the trial call without recording an outcome"""
+        self._probing = False
+
+    @contextmanager
+    def guard(self, is_failure: Callable[[BaseException], bool] = lambda error: True):
+        """Let one call through, or raise CircuitOpenError, and record how it went.
+
+        Errors for which `is_failure` is false, such as the caller's own deadline running out,
+        say nothing about the dependency and are not recorded.
+        """
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.release()
+            raise
+        except BaseException:
+            # Cancelled or closed early: the call neither failed nor succeeded
+            self.release()
+            raise
+        else:
+            self.record_success()
@@ -0,0 +1,165 @@
+"""Response encodings negotiated with the client: gzip/brotli compression and MessagePack.
+
+brotli and msgpack are optional; without them responses fall back to gzip and JSON.
+"""
+import gzip
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# MessagePack
+def _msgpack_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default, datetime=False)
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+def render(request: Request, content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """MessagePack for clients that accept it, JSON otherwise"""
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if wants_msgpack(request):
+        return MsgPackResponse(content, headers=headers)
+    return ORJSONResponse(content, headers=headers)
+
+# Compression
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """The supported content coding the client weighs highest, preferring br on ties"""
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                continue
+        if coding == "*":
+            weights = {**{c: weight for c in available}, **weights}
+        elif coding in available:
+            weights[coding] = weight
+    candidates = [coding for coding in available if weights.get(coding, 0) > 0]
+    return max(candidates, key=lambda coding: weights[coding]) if candidates else None
+
+class _Compressor:
+    """Incremental compressor whose chunks can be flushed to the client as they are produced"""
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self.encoding == "br" else self._zlib.flush()
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip, whichever the client accepts and weighs higher.
+
+    Responses with a Content-Length are buffered and compressed whole, or passed through when
+    under `minimum_size`. Responses without one, such as NDJSON streams, are compressed chunk by
+    chunk and flushed so they still arrive incrementally. Responses that already carry a
+    Content-Encoding and event streams pass through untouched. ETags of compressed responses are
+    made weak, since the bytes differ from the identity representation.
+    """
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        headers = None
+        mode = None  # "passthrough", "buffer" or "stream", decided on the response start
+        buffered = []
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, headers, mode, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = MutableHeaders(raw=message["headers"])
+                length = headers.get("content-length")
+                if ("content-encoding" in headers or headers.get("content-type", "").startswith("text/event-stream")
+                        or message["status"] in (204, 304) or (length is not None and int(length) < self.minimum_size)):
+                    mode = "passthrough"
+                    await send(message)
+                else:
+                    mode = "buffer" if length is not None else "stream"
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = f"W/{etag}"
+                return
+            if message["type"] != "http.response.body" or mode == "passthrough":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if mode == "buffer":
+                buffered.append(body)
+                if not more_body:
+                    body = self.compress(encoding, b"".join(buffered))
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                return
+
+            if compressor is None:
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                await send(start_message)
+            data = compressor.chunk(body)
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,32 +1,177 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Query, UploadFile, File, WebSocket, WebSocketDisconnect, Depends, Header
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo import monitoring
+from prometheus_client import Counter as MetricCounter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Dict, Optional, Any, Iterable, Iterator
+from collections import OrderedDict, Counter, deque
+from contextlib import aclosing, asynccontextmanager
+from contextvars import Context, ContextVar
+from functools import lru_cache
 import uuid
-from datetime import datetime, timezone
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import time
+import hashlib
+import json
+import orjson
+import base64
+import io
+import asyncio
+import math
+from datetime import datetime, timezone, timedelta
+from storage import Storage, MotorStorage, MemoryStorage, SqliteStorage, RetryingStorage, search_terms
+from responses import CompressionMiddleware, render, wants_msgpack
+from transfer import FORMATS, LineTooLong, decode_documents, encode_documents
+from settings import Settings
+from prompt_context import ContextSection, count_tokens, fit_sections, recommendation_lines, summary_lines, task_lines
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineMiddleware, is_timeout, remaining
 import re
 from enum import Enum
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
+settings = Settings.from_env()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Metrics
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+REQUEST_COUNT = MetricCounter("http_requests_total", "HTTP requests by status", ["method", "route", "status"])
+MONGO_LATENCY = Histogram("mongo_command_duration_seconds", "MongoDB command latency", ["collection", "command"])
+MONGO_DOCUMENTS = MetricCounter("mongo_documents_returned_total", "Documents returned by MongoDB commands", ["collection", "command"])
+MONGO_FAILURES = MetricCounter("mongo_command_failures_total", "Failed MongoDB commands", ["collection", "command"])
+LLM_LATENCY = Histogram("llm_call_duration_seconds", "LLM call latency", ["mode", "outcome"],
+                        buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120))
+LLM_TOKENS = MetricCounter("llm_tokens_total", "LLM tokens sent and received", ["direction"])
+AI_CONTEXT_TOKENS = Histogram("ai_context_tokens", "Tokens in recommendation prompts, whole and per context section",
+                              ["section"], buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000))
+RESPONSE_CACHE_REQUESTS = MetricCounter("response_cache_requests_total", "Response cache lookups", ["result"])
+STORAGE_READ_RETRIES = MetricCounter("storage_read_retries_total", "Storage reads retried after a transient error", ["method"])
+LLM_CIRCUIT_OPEN = Gauge("llm_circuit_open", "1 while the LLM circuit breaker is open or half open")
+
+SLOW_REQUEST_SECONDS = settings.slow_request_ms / 1000
+REQUEST_TIMEOUT_SECONDS = settings.request_timeout_seconds
+# Streamed endpoints run as long as the client keeps reading, so they get no request deadline
+DEADLINE_EXEMPT_PATHS = {"/api/export", "/api/import", "/api/ai/recommendations/stream"}
+# Mongo commands issued while serving the current request, for the slow request log
+request_queries: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("request_queries", default=None)
+
+def query_shape(value):
+    """Replace the literal values of a filter or pipeline with '?' so only its shape remains"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [query_shape(v) for v in value]
+    return "?"
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and operation and counts the documents returned"""
+    SHAPE_FIELDS = ("filter", "pipeline", "q", "query", "updates", "deletes")
+
+    def __init__(self):
+        self._inflight: Dict[int, tuple] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"
+        record = None
+        queries = request_queries.get()
+        if queries is not None:
+            shape = {field: query_shape(event.command[field]) for field in self.SHAPE_FIELDS if field in event.command}
+            record = {"collection": collection, "command": event.command_name, "shape": shape}
+            queries.append(record)
+        self._inflight[event.request_id] = (collection, record)
+
+    def succeeded(self, event):
+        collection, record = self._inflight.pop(event.request_id, ("-", None))
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            returned = len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+            MONGO_DOCUMENTS.labels(collection, event.command_name).inc(returned)
+        if record is not None:
+            record["ms"] = round(event.duration_micros / 1000, 2)
+
+    def failed(self, event):
+        collection, record = self._inflight.pop(event.request_id, ("-", None))
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        if record is not None:
+            record["failed"] = True
+
+# Storage
+def create_engine(settings: Settings) -> Storage:
+    if settings.storage_engine == "memory":
+        return MemoryStorage()
+    if settings.storage_engine == "sqlite":
+        return SqliteStorage(settings.sqlite_path or str(ROOT_DIR / 'dashboard.sqlite3'))
+    if settings.storage_engine != "mongo":
+        raise ValueError(f"Unknown STORAGE_ENGINE {settings.storage_engine!r}")
+    client = AsyncIOMotorClient(settings.mongo_url, event_listeners=[MongoCommandMetrics()], **settings.mongo_client_options())
+    return MotorStorage(client[settings.db_name], logger=logging.getLogger(__name__))
+
+def create_store(settings: Settings) -> RetryingStorage:
+    """The configured engine, with its idempotent reads retried on transient errors"""
+    return RetryingStorage(
+        create_engine(settings),
+        attempts=settings.read_retry_attempts,
+        base_delay=settings.read_retry_base_delay_ms / 1000,
+        on_retry=lambda method, error, attempt: STORAGE_READ_RETRIES.labels(method).inc()
+    )
+
+# Opened by the lifespan in each worker process, so forked workers never share a client created
+# before the fork; tests and benchmarks may set it themselves beforehand and then close it themselves
+store: Optional[Storage] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global store
+    owned = store is None
+    if owned:
+        store = create_store(settings)
+    # Data from before user partitioning belongs to the default user
+    claimed = await store.claim_unowned(DEFAULT_USER_ID)
+    if claimed:
+        logger.info(f"Assigned {claimed} unowned tasks to user {DEFAULT_USER_ID}")
+        await rebuild_rollups(DEFAULT_USER_ID)
+    await store.ensure_indexes()
+    try:
+        yield
+    finally:
+        if owned:
+            store.close()
+            store = None
 
 # Create the main app without a prefix
-app = FastAPI(title="Internship Prep Dashboard API")
+app = FastAPI(title="Internship Prep Dashboard API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Users
+# Data is partitioned by user. There is no login here: the auth proxy in front of the API names
+# the user in X-User-Id, and requests without one act as DEFAULT_USER_ID.
+DEFAULT_USER_ID = settings.default_user_id
+USER_ID_RE = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+def resolve_user_id(user_id: Optional[str]) -> str:
+    user_id = user_id or DEFAULT_USER_ID
+    if not USER_ID_RE.match(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user id")
+    return user_id
+
+async def current_user(x_user_id: Optional[str] = Header(None)) -> str:
+    return resolve_user_id(x_user_id)
+
+async def client_id(x_client_id: Optional[str] = Header(None)) -> Optional[str]:
+    """The browser tab making a write, named in X-Client-Id, so it can skip its own change events"""
+    return x_client_id
+
 # Enums for task categories
 class TaskCategory(str, Enum):
     DSA = "DSA"
@@ -66,6 +211,21 @@ class TaskUpdate(BaseModel):
     description: Optional[str] = None
     priority: Optional[int] = None
 
+class BulkTaskItem(TaskUpdate):
+    id: str
+
+class BulkTaskFilter(BaseModel):
+    category: Optional[TaskCategory] = None
+    status: Optional[TaskStatus] = None
+    week_number: Optional[int] = None
+    date: Optional[str] = None
+
+class BulkTaskRequest(BaseModel):
+    items: List[BulkTaskItem] = []
+    filter: Optional[BulkTaskFilter] = None
+    update: Optional[TaskUpdate] = None
+    ordered: bool = True
+
 class WeeklyProgress(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     week_number: int
@@ -87,196 +247,1304 @@ class AIRecommendation(BaseModel):
     recommendations: List[str]
     focus_areas: List[str]
     priority_tasks: List[str]
+    prompt_tokens: Optional[int] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class AIPromptRequest(BaseModel):
     user_prompt: str
     context: Optional[str] = None
+    session_id: Optional[str] = None
+
+class AIJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+class AIJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    status: AIJobStatus = AIJobStatus.QUEUED
+    user_prompt: str
+    session_id: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    completed_at: Optional[datetime] = None
+
+# LLM chat
+LLM_PROVIDER = "openai"
+LLM_MODEL = settings.llm_model
+LLM_SYSTEM_MESSAGE = "You are an AI assistant helping with internship preparation. You analyze daily tasks, progress, and provide focused recommendations for software engineering roles (frontend/backend/fullstack). Be concise and actionable."
+
+@lru_cache(maxsize=1)
+def llm_classes() -> tuple:
+    """(LlmChat, UserMessage), imported on first use: emergentintegrations loads every provider SDK"""
+    if settings.llm_backend == "fake":
+        from fake_llm import FakeLlmChat, FakeUserMessage
+        return FakeLlmChat, FakeUserMessage
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+    return LlmChat, UserMessage
+
+def new_user_message(text: str):
+    return llm_classes()[1](text=text)
+
+def new_llm_chat(session_id: str):
+    LlmChat = llm_classes()[0]
+    return LlmChat(
+        api_key=settings.emergent_llm_key,
+        session_id=session_id,
+        system_message=LLM_SYSTEM_MESSAGE
+    ).with_model(LLM_PROVIDER, LLM_MODEL)
+
+async def stream_llm(chat, user_message):
+    """Yield completion chunks, falling back to one chunk for clients without streaming support"""
+    stream_message = getattr(chat, "stream_message", None)
+    if stream_message is None:
+        yield await chat.send_message(user_message)
+        return
+    async with aclosing(stream_message(user_message)) as stream:
+        async for chunk in stream:
+            yield chunk
+
+class LlmOverloadedError(Exception):
+    """Raised when too many LLM calls are already waiting for a slot"""
+
+class LlmExecutor:
+    """Runs LLM calls with a concurrency cap, a bounded wait queue, a per-call deadline and a
+    circuit breaker.
+
+    Calls time out after timeout_seconds, or sooner if the request's deadline comes first.
+    Only the provider call itself counts towards the breaker; while it is open, calls fail fast
+    with CircuitOpenError instead of queueing.
+    Callers passing a session id reuse that user's session chat (kept in a bounded LRU pool keyed
+    by user and session id); everyone else gets a fresh chat per call, so conversation state never
+    leaks between users, even when they pick the same session id.
+    """
+    def __init__(self, max_concurrency: int = 8, max_queue_depth: int = 32,
+                 timeout_seconds: float = 60.0, max_sessions: int = 1024,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.timeout_seconds = timeout_seconds
+        self.max_sessions = max_sessions
+        self.breaker = breaker or CircuitBreaker("The LLM provider")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._sessions: "OrderedDict[tuple, Any]" = OrderedDict()
+
+    @property
+    def saturated(self) -> bool:
+        return self._waiting >= self.max_queue_depth
+
+    def session_for(self, user_id: str, session_id: Optional[str]):
+        if session_id is None:
+            return new_llm_chat(f"internship-prep-dashboard-{uuid.uuid4()}")
+        key = (user_id, session_id)
+        chat = self._sessions.get(key)
+        if chat is None:
+            chat = self._sessions[key] = new_llm_chat(f"internship-prep-dashboard-{user_id}-{session_id}")
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return chat
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the concurrency slots, rejecting the caller if the wait queue is full"""
+        if self.saturated:
+            raise LlmOverloadedError(f"{self._waiting} LLM calls already waiting")
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
 
-# Initialize LLM Chat
-llm_chat = LlmChat(
-    api_key=os.environ.get('EMERGENT_LLM_KEY'),
-    session_id="internship-prep-dashboard",
-    system_message="You are an AI assistant helping with internship preparation. You analyze daily tasks, progress, and provide focused recommendations for software engineering roles (frontend/backend/fullstack). Be concise and actionable."
-).with_model("openai", "gpt-4o-mini")
+    def _timeout(self) -> float:
+        timeout = remaining(self.timeout_seconds)
+        if timeout <= 0:
+            raise asyncio.TimeoutError("The request deadline passed before the LLM was called")
+        return timeout
+
+    def _provider_failure(self, timeout: float):
+        """For breaker.guard: a timeout only counts against the provider if it had the full LLM timeout"""
+        cut_short = timeout < self.timeout_seconds
+        return lambda error: not (cut_short and is_timeout(error))
+
+    async def send(self, user_id: str, session_id: Optional[str], user_message) -> str:
+        self.breaker.check()
+        async with self.slot():
+            timeout = self._timeout()
+            chat = self.session_for(user_id, session_id)
+            started, outcome = time.perf_counter(), "error"
+            try:
+                with self.breaker.guard(self._provider_failure(timeout)):
+                    text = await asyncio.wait_for(chat.send_message(user_message), timeout)
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                LLM_LATENCY.labels("send", outcome).observe(time.perf_counter() - started)
+            LLM_TOKENS.labels("prompt").inc(count_tokens(user_message.text))
+            LLM_TOKENS.labels("completion").inc(count_tokens(text))
+            return text
+
+    async def stream(self, user_id: str, session_id: Optional[str], user_message):
+        """Yield completion chunks, holding a slot for the whole stream and enforcing the deadline"""
+        self.breaker.check()
+        async with self.slot():
+            timeout = self._timeout()
+            deadline = asyncio.get_running_loop().time() + timeout
+            started, outcome, completion_tokens = time.perf_counter(), "cancelled", 0
+            LLM_TOKENS.labels("prompt").inc(count_tokens(user_message.text))
+            try:
+                with self.breaker.guard(self._provider_failure(timeout)):
+                    async with aclosing(stream_llm(self.session_for(user_id, session_id), user_message)) as stream:
+                        while True:
+                            left = deadline - asyncio.get_running_loop().time()
+                            try:
+                                chunk = await asyncio.wait_for(stream.__anext__(), max(left, 0))
+                            except StopAsyncIteration:
+                                outcome = "ok"
+                                return
+                            except asyncio.TimeoutError:
+                                outcome = "timeout"
+                                raise
+                            completion_tokens += count_tokens(chunk)
+                            yield chunk
+            except Exception:
+                if outcome == "cancelled":
+                    outcome = "error"
+                raise
+            finally:
+                LLM_LATENCY.labels("stream", outcome).observe(time.perf_counter() - started)
+                LLM_TOKENS.labels("completion").inc(completion_tokens)
+
+LLM_TIMEOUT_SECONDS = settings.llm_timeout_seconds
+llm_executor = LlmExecutor(
+    max_concurrency=settings.llm_max_concurrency,
+    max_queue_depth=settings.llm_max_queue_depth,
+    timeout_seconds=LLM_TIMEOUT_SECONDS,
+    max_sessions=settings.llm_max_sessions,
+    breaker=CircuitBreaker(
+        "The LLM provider",
+        failure_threshold=settings.llm_breaker_failures,
+        reset_seconds=settings.llm_breaker_reset_seconds
+    )
+)
+LLM_CIRCUIT_OPEN.set_function(lambda: llm_executor.breaker.state != "closed")
 
 # Markdown Schedule Parser
+class ScheduleParseError(ValueError):
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f"Line {line_number}: {message}")
+        self.line_number = line_number
+
 class ScheduleParser:
-    @staticmethod
-    def parse_schedule_data():
-        """Parse the markdown schedule and create tasks"""
-        # This represents the parsed schedule data from the markdown file
-        # Phase 1: September 2025 - October 2025 (detailed)
-        schedule_data = [
-            # Week 1: Sep 22 - Sep 28
-            {"date": "2025-09-22", "week": 1, "phase": "Launch & Foundation", "category": "DSA", "description": "2 Easy problems (arrays, strings)", "priority": 2},
-            {"date": "2025-09-22", "week": 1, "phase": "Launch & Foundation", "category": "PROJECT", "description": "Create portfolio-2026 repo; scaffold Next.js/React app", "priority": 3},
-            {"date": "2025-09-22", "week": 1, "phase": "Launch & Foundation", "category": "LEARN", "description": "Oracle portal & voucher claim", "priority": 1},
-            {"date": "2025-09-22", "week": 1, "phase": "Launch & Foundation", "category": "OPS", "description": "Install Docker; docker run hello-world", "priority": 2},
-            {"date": "2025-09-22", "week": 1, "phase": "Launch & Foundation", "category": "APPLY", "description": "5 apps; 10 LinkedIn messages", "priority": 3},
-            
-            {"date": "2025-09-23", "week": 1, "phase": "Launch & Foundation", "category": "DSA", "description": "2 Easy problems (hashmap)", "priority": 2},
-            {"date": "2025-09-23", "week": 1, "phase": "Launch & Foundation", "category": "PROJECT", "description": "Build homepage + nav; push commit", "priority": 3},
-            {"date": "2025-09-23", "week": 1, "phase": "Launch & Foundation", "category": "LEARN", "description": "React hooks (useState, useEffect)", "priority": 2},
-            {"date": "2025-09-23", "week": 1, "phase": "Launch & Foundation", "category": "OPS", "description": "Dockerfile: backend skeleton", "priority": 2},
-            {"date": "2025-09-23", "week": 1, "phase": "Launch & Foundation", "category": "APPLY", "description": "5 apps/follow-ups", "priority": 3},
-            
-            {"date": "2025-09-24", "week": 1, "phase": "Launch & Foundation", "category": "DSA", "description": "1 Medium (two-pointer), 1 Easy (string)", "priority": 2},
-            {"date": "2025-09-24", "week": 1, "phase": "Launch & Foundation", "category": "PROJECT", "description": "Implement simple TODO UI", "priority": 3},
-            {"date": "2025-09-24", "week": 1, "phase": "Launch & Foundation", "category": "LEARN", "description": "JavaScript ES6 features", "priority": 2},
-            {"date": "2025-09-24", "week": 1, "phase": "Launch & Foundation", "category": "OPS", "description": "Setup GitHub Actions (CI)", "priority": 2},
-            {"date": "2025-09-24", "week": 1, "phase": "Launch & Foundation", "category": "APPLY", "description": "5 LinkedIn / 2 apps", "priority": 3},
-            
-            # Week 2: Sep 29 - Oct 5
-            {"date": "2025-09-29", "week": 2, "phase": "Launch & Foundation", "category": "DSA", "description": "2 Medium problems", "priority": 2},
-            {"date": "2025-09-29", "week": 2, "phase": "Launch & Foundation", "category": "PROJECT", "description": "Implement user signup endpoint", "priority": 3},
-            {"date": "2025-09-29", "week": 2, "phase": "Launch & Foundation", "category": "LEARN", "description": "OCI Foundations module 1", "priority": 1},
-            {"date": "2025-09-29", "week": 2, "phase": "Launch & Foundation", "category": "OPS", "description": "Test DB migrations; seed data", "priority": 2},
-            {"date": "2025-09-29", "week": 2, "phase": "Launch & Foundation", "category": "APPLY", "description": "5 applications", "priority": 3},
-            
-            {"date": "2025-09-30", "week": 2, "phase": "Launch & Foundation", "category": "DSA", "description": "2 Easy + 1 Medium", "priority": 2},
-            {"date": "2025-09-30", "week": 2, "phase": "Launch & Foundation", "category": "PROJECT", "description": "Build login flow (JWT)", "priority": 3},
-            {"date": "2025-09-30", "week": 2, "phase": "Launch & Foundation", "category": "LEARN", "description": "SQL indexing", "priority": 2},
-            {"date": "2025-09-30", "week": 2, "phase": "Launch & Foundation", "category": "OPS", "description": "Configure GitHub Actions secret", "priority": 2},
-            {"date": "2025-09-30", "week": 2, "phase": "Launch & Foundation", "category": "APPLY", "description": "5 apps / 5 LinkedIn messages", "priority": 3},
-            
-            # Additional weeks can be added here...
-        ]
+    """Streaming parser for markdown schedules.
+
+    Recognised lines are `# Phase N: name`, `## Week N: range`, `### YYYY-MM-DD` and task
+    bullets `- CATEGORY: description {priority: N}`; everything else is ignored. Rows are
+    yielded one at a time so plans of any length are parsed in constant memory.
+    """
+    PHASE_RE = re.compile(r"^#\s+Phase\s+\d+\s*:\s*(?P<phase>.+?)\s*$")
+    WEEK_RE = re.compile(r"^##\s+Week\s+(?P<week>\d+)\b")
+    DAY_RE = re.compile(r"^###\s+(?P<date>\d{4}-\d{2}-\d{2})\b")
+    TASK_RE = re.compile(
+        r"^[-*]\s+\**(?P<category>[A-Za-z]+)\**\s*:\s*(?P<description>.+?)"
+        r"(?:\s*\{priority:\s*(?P<priority>\d+)\})?\s*$"
+    )
+    DEFAULT_PRIORITIES = {"DSA": 2, "PROJECT": 3, "LEARN": 2, "OPS": 2, "APPLY": 3}
+    SCHEDULE_PATH = Path(settings.schedule_path or ROOT_DIR / 'schedule.md')
+
+    @classmethod
+    def iter_rows(cls, lines: Iterable[str], outline: Optional[List[Dict[str, Any]]] = None):
+        """Yield validated task rows; phase and week headers are appended to `outline` as they are seen"""
+        phase = week = date = None
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if match := cls.PHASE_RE.match(line):
+                phase, week, date = match["phase"], None, None
+                if outline is not None:
+                    outline.append({"phase": phase, "weeks": []})
+            elif match := cls.WEEK_RE.match(line):
+                week, date = int(match["week"]), None
+                if outline is not None and outline:
+                    outline[-1]["weeks"].append({"week_number": week, "title": line.lstrip("#").strip(), "line": line_number})
+            elif match := cls.DAY_RE.match(line):
+                date = match["date"]
+                try:
+                    datetime.strptime(date, "%Y-%m-%d")
+                except ValueError:
+                    raise ScheduleParseError(line_number, f"invalid date {date}")
+            elif match := cls.TASK_RE.match(line):
+                if phase is None or week is None or date is None:
+                    raise ScheduleParseError(line_number, "task listed before its phase, week and date headers")
+                category = match["category"].upper()
+                if category not in TaskCategory.__members__:
+                    raise ScheduleParseError(line_number, f"unknown category {match['category']}")
+                yield {
+                    "date": date,
+                    "week": week,
+                    "phase": phase,
+                    "category": category,
+                    "description": match["description"],
+                    "priority": int(match["priority"]) if match["priority"] else cls.DEFAULT_PRIORITIES[category]
+                }
+
+    @classmethod
+    def parse_schedule_data(cls, path: Optional[Path] = None, outline: Optional[List[Dict[str, Any]]] = None):
+        """Parse the markdown schedule file and yield task rows"""
+        with open(path or cls.SCHEDULE_PATH, encoding="utf-8") as lines:
+            yield from cls.iter_rows(lines, outline)
+
+def content_hash(binary_file, chunk_size: int = 1 << 16) -> str:
+    """SHA-256 of a binary file object, read in chunks and rewound afterwards"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: binary_file.read(chunk_size), b""):
+        digest.update(chunk)
+    binary_file.seek(0)
+    return digest.hexdigest()
+
+# Schedule ingestion
+# Schedule rows are identified by a natural key, so re-ingesting a schedule only writes what changed
+# and keeps the status of tasks that are still in it.
+SCHEDULE_FIELDS = ("week_number", "phase", "priority")
+
+def schedule_row_key(date: str, category: str, description: str) -> str:
+    digest = hashlib.sha1(description.encode()).hexdigest()[:16]
+    return f"{date}:{TaskCategory(category).value}:{digest}"
+
+async def ingest_schedule(user_id: str, rows: Iterable[Dict[str, Any]], dry_run: bool = False,
+                          batch_size: int = 500) -> Dict[str, Any]:
+    """Diff schedule rows against the user's stored tasks and apply the inserts, updates and deletes in batches"""
+    stored = {}
+    async for task in store.iter_tasks(user_id, fields=("id", "natural_key", "date", "category", "description", *SCHEDULE_FIELDS)):
+        key = task.get("natural_key") or schedule_row_key(task["date"], task["category"], task["description"])
+        stored[key] = task
+    
+    seen = set()
+    counts = Counter()
+    diff = {"insert": [], "update": [], "delete": []}
+    inserts, updates, deletes = [], [], []
+    
+    async def flush():
+        if not dry_run and (inserts or updates or deletes):
+            await store.write_schedule(user_id, inserts, updates, deletes)
+        inserts.clear()
+        updates.clear()
+        deletes.clear()
+    
+    for row in rows:
+        key = schedule_row_key(row["date"], row["category"], row["description"])
+        if key in seen:
+            counts["duplicate"] += 1
+            continue
+        seen.add(key)
+        fields = {"week_number": row["week"], "phase": row["phase"], "priority": row["priority"]}
+        existing = stored.get(key)
+        
+        if existing is None:
+            task = Task(
+                date=row["date"],
+                category=TaskCategory(row["category"]),
+                description=row["description"],
+                **fields
+            ).dict()
+            task["natural_key"] = key
+            inserts.append(task)
+            operation = "insert"
+        else:
+            changes = {f: v for f, v in fields.items() if existing.get(f) != v}
+            if "natural_key" not in existing:
+                changes["natural_key"] = key
+            if not changes:
+                counts["unchanged"] += 1
+                continue
+            updates.append((existing["id"], changes))
+            operation = "update"
+        
+        counts[operation] += 1
+        if len(diff[operation]) < 100:
+            diff[operation].append(key)
+        if len(inserts) + len(updates) >= batch_size:
+            await flush()
+    
+    removed = [task["id"] for key, task in stored.items() if key not in seen]
+    diff["delete"] = [key for key in stored if key not in seen][:100]
+    counts["delete"] = len(removed)
+    for start in range(0, len(removed), batch_size):
+        deletes.extend(removed[start:start + batch_size])
+        await flush()
+    await flush()
+    
+    changed = counts["insert"] + counts["update"] + counts["delete"]
+    return {
+        "dry_run": dry_run,
+        "count": len(seen),
+        "changed": changed,
+        "inserted": counts["insert"],
+        "updated": counts["update"],
+        "deleted": counts["delete"],
+        "unchanged": counts["unchanged"],
+        "duplicates": counts["duplicate"],
+        "diff": diff
+    }
+
+async def ingest_schedule_source(user_id: str, binary_file, dry_run: bool = False, force: bool = False) -> Dict[str, Any]:
+    """Ingest a markdown schedule, skipping it entirely if the user already ingested this exact content.
+
+    The parsed outline and ingestion result are kept in schedule_sources keyed by content hash,
+    so restarts and repeated initializations do not reparse an unchanged file.
+    """
+    source_hash = content_hash(binary_file)
+    latest = await store.latest_schedule_source(user_id)
+    if latest is not None and latest["content_hash"] == source_hash and not force:
+        count = latest["result"]["count"]
+        return {
+            "dry_run": dry_run, "count": count, "changed": 0, "inserted": 0, "updated": 0, "deleted": 0,
+            "unchanged": count, "duplicates": 0, "skipped": True, "content_hash": source_hash
+        }
+    
+    outline = []
+    lines = io.TextIOWrapper(binary_file, encoding="utf-8")
+    try:
+        result = await ingest_schedule(user_id, ScheduleParser.iter_rows(lines, outline), dry_run=dry_run)
+    finally:
+        lines.detach()
+    
+    if not dry_run:
+        summary = {k: v for k, v in result.items() if k != "diff"}
+        await store.record_schedule_source(
+            user_id, source_hash, {"outline": outline, "result": summary, "ingested_at": datetime.now(timezone.utc)}
+        )
+    return {**result, "skipped": False, "content_hash": source_hash}
+
+# Progress rollups
+# Counters kept in progress_rollups so progress reads touch a handful of small documents per user:
+#   "<user>:all"                    overall totals
+#   "<user>:week:<n>:<phase>"       per week (and phase, matching the weekly progress grouping)
+#   "<user>:day:<date>"             per day
+#   "<user>:category:<category>"    per category
+# Each document carries total/completed plus the same counters per category.
+def _rollup_targets(user_id: str, week_number: int, phase: str, date: str, category: str):
+    """Rollup document ids a task contributes to, with the fields identifying each document"""
+    category = TaskCategory(category).value
+    return [
+        (f"{user_id}:all", {"kind": "all"}),
+        (f"{user_id}:week:{week_number}:{phase}", {"kind": "week", "week_number": week_number, "phase": phase}),
+        (f"{user_id}:day:{date}", {"kind": "day", "date": date}),
+        (f"{user_id}:category:{category}", {"kind": "category", "category": category}),
+    ]
+
+async def compute_rollups(user_id: str) -> Dict[str, Dict[str, Any]]:
+    """Build the user's rollup documents from a fresh grouping of their stored tasks"""
+    rollups = {}
+    async for group in store.task_status_groups(user_id):
+        targets = _rollup_targets(user_id, group["week_number"], group["phase"], group["date"], group["category"])
+        for rollup_id, fields in targets:
+            doc = rollups.setdefault(rollup_id, {
+                "_id": rollup_id, "user_id": user_id, **fields, "total": 0, "completed": 0, "categories": {}
+            })
+            doc["total"] += group["total"]
+            doc["completed"] += group["completed"]
+            if fields["kind"] == "week":
+                doc["start_date"] = min(doc.get("start_date", group["date"]), group["date"])
+                doc["end_date"] = max(doc.get("end_date", group["date"]), group["date"])
+            category_counts = doc["categories"].setdefault(TaskCategory(group["category"]).value, {"total": 0, "completed": 0})
+            category_counts["total"] += group["total"]
+            category_counts["completed"] += group["completed"]
+    return rollups
+
+# Completion history
+# One document per user and local day that tasks were completed on, holding "completed" and a
+# per-category count. Trends, velocity and streaks over a range read one small document per day
+# instead of the tasks, and status changes keep it current incrementally.
+def completion_day(completed_at) -> Optional[str]:
+    """The local day of a completed_at value as any engine returns it (aware, naive UTC or ISO string)"""
+    if completed_at is None:
+        return None
+    if isinstance(completed_at, str):
+        completed_at = datetime.fromisoformat(completed_at)
+    if completed_at.tzinfo is None:
+        completed_at = completed_at.replace(tzinfo=timezone.utc)
+    return completed_at.astimezone().strftime("%Y-%m-%d")
+
+async def compute_completion_days(user_id: str) -> Dict[str, Dict[str, Any]]:
+    """Build the user's completion history from the completed_at of their completed tasks"""
+    days = {}
+    async for task in store.iter_tasks(user_id, {"status": TaskStatus.COMPLETED}, fields=("category", "completed_at")):
+        date = completion_day(task.get("completed_at"))
+        if date is None:
+            continue
+        day = days.setdefault(date, {"date": date, "completed": 0, "categories": {}})
+        category = TaskCategory(task["category"]).value
+        day["completed"] += 1
+        day["categories"][category] = day["categories"].get(category, 0) + 1
+    return days
+
+async def rebuild_rollups(user_id: str) -> int:
+    """Replace the user's stored rollups and completion history with freshly computed ones"""
+    rollups, days = await asyncio.gather(compute_rollups(user_id), compute_completion_days(user_id))
+    await store.replace_rollups(user_id, rollups)
+    await store.replace_completion_days(user_id, days)
+    return len(rollups) + len(days)
+
+async def verify_rollups(user_id: str) -> List[Dict[str, Any]]:
+    """Compare the user's stored rollups and completion history with a fresh aggregation and report any drift"""
+    expected = await compute_rollups(user_id)
+    stored = {doc["_id"]: doc for doc in await store.find_rollups(user_id)}
+    counters = lambda doc: doc and {k: doc[k] for k in ("total", "completed", "categories")}
+    drift = []
+    for rollup_id in sorted(set(expected) | set(stored)):
+        want, have = expected.get(rollup_id), stored.get(rollup_id)
+        if counters(want) != counters(have):
+            drift.append({"id": rollup_id, "expected": counters(want), "actual": counters(have)})
+    
+    # Days that dropped back to zero completions are kept, so compare the non-zero counts
+    expected_days = await compute_completion_days(user_id)
+    stored_days = {doc["date"]: doc for doc in await store.find_completion_days(user_id)}
+    day_counters = lambda doc: {
+        "completed": doc.get("completed", 0) if doc else 0,
+        "categories": {k: v for k, v in (doc or {}).get("categories", {}).items() if v}
+    }
+    for date in sorted(set(expected_days) | set(stored_days)):
+        want, have = day_counters(expected_days.get(date)), day_counters(stored_days.get(date))
+        if want != have:
+            drift.append({"id": f"{user_id}:completed:{date}", "expected": want, "actual": have})
+    return drift
+
+async def apply_status_changes(user_id: str, changes: List[tuple]):
+    """Update the rollups and completion history touched by (previous task, applied update fields) changes"""
+    increments: Dict[str, Counter] = {}
+    completions: Dict[str, Counter] = {}
+    for task, update_data in changes:
+        new_status = update_data.get("status")
+        if new_status is None:
+            continue
+        category = TaskCategory(task["category"]).value
+        was_completed = task["status"] == TaskStatus.COMPLETED
+        
+        # Completing again restamps completed_at, which moves the task to another day in the history
+        previous_day = completion_day(task.get("completed_at")) if was_completed else None
+        if previous_day:
+            completions.setdefault(previous_day, Counter()).update({"completed": -1, f"categories.{category}": -1})
+        if new_status == TaskStatus.COMPLETED:
+            new_day = completion_day(update_data["completed_at"])
+            completions.setdefault(new_day, Counter()).update({"completed": 1, f"categories.{category}": 1})
         
-        return schedule_data
+        delta = int(new_status == TaskStatus.COMPLETED) - int(was_completed)
+        if delta == 0:
+            continue
+        for rollup_id, _ in _rollup_targets(user_id, task["week_number"], task["phase"], task["date"], category):
+            counters = increments.setdefault(rollup_id, Counter())
+            counters["completed"] += delta
+            counters[f"categories.{category}.completed"] += delta
+    await store.increment_rollups(user_id, {rollup_id: dict(counters) for rollup_id, counters in increments.items() if counters})
+    await store.increment_completion_days(user_id, {
+        date: {path: amount for path, amount in counters.items() if amount}
+        for date, counters in completions.items() if any(counters.values())
+    })
+
+async def apply_status_change(user_id: str, task: Dict[str, Any], update_data: Dict[str, Any]):
+    """Update the rollups and completion history a task belongs to after an update"""
+    await apply_status_changes(user_id, [(task, update_data)])
+
+def task_update_fields(task_update: TaskUpdate) -> Dict[str, Any]:
+    """$set fields for a task update, stamping or clearing completed_at when the status changes"""
+    update_data = {k: v for k, v in task_update.dict().items() if v is not None}
+    
+    if task_update.status == TaskStatus.COMPLETED:
+        update_data["completed_at"] = datetime.now(timezone.utc)
+    elif task_update.status in [TaskStatus.PENDING, TaskStatus.IN_PROGRESS]:
+        update_data["completed_at"] = None
+    return update_data
+
+def _week_progress(rollup: Dict[str, Any]) -> Dict[str, Any]:
+    categories = rollup.get("categories", {})
+    completed = lambda category: categories.get(category, {}).get("completed", 0)
+    return {
+        "week_number": rollup["week_number"],
+        "phase": rollup["phase"],
+        "start_date": rollup.get("start_date"),
+        "end_date": rollup.get("end_date"),
+        "total_tasks": rollup["total"],
+        "completed_tasks": rollup["completed"],
+        "dsa_completed": completed("DSA"),
+        "projects_completed": completed("PROJECT"),
+        "applications_sent": completed("APPLY"),
+        "completion_percentage": (rollup["completed"] / rollup["total"] * 100) if rollup["total"] > 0 else 0
+    }
+
+def _current_week(week_rollups: List[Dict[str, Any]], date: str) -> int:
+    """Week number of the latest scheduled week that has started by the given date"""
+    if not week_rollups:
+        return 1
+    started = [r for r in week_rollups if r["start_date"] <= date]
+    if started:
+        return max(started, key=lambda r: r["start_date"])["week_number"]
+    return min(week_rollups, key=lambda r: r["start_date"])["week_number"]
+
+# Fast read path
+# Documents we wrote ourselves are projected down to the model fields and serialized straight
+# to JSON with orjson, skipping per-row model construction and FastAPI's response validation.
+TASK_FIELDS = tuple(Task.model_fields)
+AI_RECOMMENDATION_FIELDS = tuple(AIRecommendation.model_fields)
+
+def parse_task_fields(fields: Optional[str]) -> tuple:
+    """Task fields named in a comma separated ?fields= list, always including the id and date cursors need"""
+    if not fields:
+        return TASK_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(requested) - set(TASK_FIELDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown task fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(["id", "date", *requested]))
+
+# Keyset pagination
+# Task listings are ordered by (date, id); a cursor encodes the last (date, id) a client has seen
+def encode_cursor(task: Dict[str, Any]) -> str:
+    raw = json.dumps([task["date"], task["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Turn an opaque cursor back into the (date, id) position the next page starts after"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, task_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return date, task_id
+
+# Search results are ordered by (score desc, id) instead, so their cursors carry the score
+def encode_search_cursor(task: Dict[str, Any]) -> str:
+    raw = json.dumps([task["score"], task["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, task_id = json.loads(raw)
+        score = float(score)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return score, task_id
+
+async def stream_ndjson(documents):
+    """Yield one JSON document per line as the storage engine produces them"""
+    async for doc in documents:
+        yield orjson.dumps(doc) + b"\n"
+
+# Response cache
+class ResponseCache:
+    """Bounded LRU/TTL cache of rendered GET responses, partitioned by user.
+
+    Writes bump their user's generation, which invalidates every entry rendered for that user
+    before them; invalidating without a user bumps the global generation and drops everything.
+    The cache is per process, so with several workers the TTL bounds how stale another worker's
+    entries can get.
+    """
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._partition_generations: Dict[str, int] = {}
+        self._entries: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+
+    def generation_of(self, partition: str) -> tuple:
+        return self.generation, self._partition_generations.get(partition, 0)
+
+    def get(self, key, partition: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["generation"] != self.generation_of(partition) or entry["expires_at"] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, partition: str, body: bytes, headers: Dict[str, str], generation: tuple):
+        entry = {
+            "body": body,
+            "headers": headers,
+            "generation": generation,
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        if generation == self.generation_of(partition):
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, partition: Optional[str] = None):
+        if partition is None:
+            self.generation += 1
+            self._entries.clear()
+        else:
+            self._partition_generations[partition] = self._partition_generations.get(partition, 0) + 1
+
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl_seconds=settings.response_cache_ttl_seconds
+)
+
+# Read endpoints served through the response cache
+CACHED_PATHS = {
+    "/api/tasks", "/api/tasks/calendar", "/api/tasks/search", "/api/progress/weekly", "/api/progress/daily", "/api/dashboard/overview",
+    "/api/progress/completions", "/api/progress/velocity", "/api/progress/streaks"
+}
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+# Task change events
+class TaskEventHub:
+    """In-process pub/sub of task change events for WebSocket clients.
+
+    Events are delivered to the subscribers of the user they belong to and carry a sequence
+    number; the most recent ones are kept so a reconnecting client can catch up from the last
+    sequence it saw. The epoch changes on every restart, and clients that fall outside the buffer,
+    come from another epoch or fall behind are told to resync instead.
+
+    Only sockets on the worker that handled a write hear about it, so clients apply their own
+    writes from the responses. Events carry the X-Client-Id of the client that made the change
+    as `origin`, so that client can skip them.
+    """
+    def __init__(self, buffer_size: int = 1000, subscriber_queue_size: int = 256):
+        self.epoch = str(uuid.uuid4())
+        self.seq = 0
+        self.subscriber_queue_size = subscriber_queue_size
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: Dict[str, set] = {}
+
+    def publish(self, user_id: str, event_type: str, **payload):
+        self.seq += 1
+        event = {"type": event_type, "epoch": self.epoch, "seq": self.seq, **payload}
+        self._buffer.append((user_id, event))
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client this far behind is cheaper to resync than to replay
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync", "epoch": self.epoch, "seq": self.seq})
+        return event
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id, set())
+        queues.discard(queue)
+        if not queues:
+            self._subscribers.pop(user_id, None)
+
+    def replay(self, user_id: str, since: Optional[int], epoch: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """The user's events after `since`, or None when they may be gone and the client must resync"""
+        if since is None:
+            return []
+        if epoch != self.epoch or since > self.seq:
+            return None
+        if since < self.seq and (not self._buffer or self._buffer[0][1]["seq"] > since + 1):
+            return None
+        return [event for owner, event in self._buffer if owner == user_id and event["seq"] > since]
+
+task_events = TaskEventHub()
+
+def task_delta(previous: Dict[str, Any], update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact description of a task change, enough for clients to patch tasks and counters"""
+    delta = {
+        "id": previous["id"],
+        "date": previous["date"],
+        "week_number": previous["week_number"],
+        "category": TaskCategory(previous["category"]).value,
+        "previous_status": TaskStatus(previous["status"]).value,
+        "status": TaskStatus(update_data.get("status", previous["status"])).value,
+    }
+    delta.update({k: v for k, v in update_data.items() if k != "status"})
+    return delta
+
+# AI response cache
+class LlmResponseCache:
+    """Content-addressed cache of LLM completions.
+
+    An in-process LRU hot tier sits in front of the ai_response_cache collection, whose TTL index
+    expires old entries. Identical requests arriving while a completion is in flight share it; the
+    shared call runs without any one caller's deadline, and each caller waits only as long as its
+    own deadline allows.
+    """
+    def __init__(self, max_hot_entries: int = 256, ttl_seconds: float = 86400.0):
+        self.max_hot_entries = max_hot_entries
+        self.ttl_seconds = ttl_seconds
+        self._hot: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def key_for(*parts: str) -> str:
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def _hot_get(self, key: str) -> Optional[str]:
+        entry = self._hot.get(key)
+        if entry is None:
+            return None
+        expires_at, text = entry
+        if expires_at < time.monotonic():
+            del self._hot[key]
+            return None
+        self._hot.move_to_end(key)
+        return text
+
+    def _hot_put(self, key: str, text: str):
+        self._hot[key] = (time.monotonic() + self.ttl_seconds, text)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.max_hot_entries:
+            self._hot.popitem(last=False)
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """Return a cached completion from the hot tier or the stored response cache"""
+        text = self._hot_get(key)
+        if text is not None:
+            return text
+        text = await store.get_cached_response(key)
+        if text is not None:
+            self._hot_put(key, text)
+        return text
+
+    async def put(self, key: str, text: str):
+        await store.put_cached_response(key, text)
+        self._hot_put(key, text)
+
+    async def _load(self, key: str, call):
+        text = await self.lookup(key)
+        if text is not None:
+            return text, True
+        text = await call()
+        await self.put(key, text)
+        return text, False
+
+    async def get_or_call(self, key: str, call):
+        """Return (text, cached), invoking `call` only if no tier has the key and no call is in flight"""
+        text = self._hot_get(key)
+        if text is not None:
+            return text, True
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            text, _ = await asyncio.wait_for(asyncio.shield(inflight), remaining())
+            return text, True
+        # A fresh context, so the call is not bound to this caller's deadline
+        task = asyncio.get_running_loop().create_task(self._load(key, call), context=Context())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.wait_for(asyncio.shield(task), remaining())
+
+llm_cache = LlmResponseCache(
+    max_hot_entries=settings.ai_cache_max_hot_entries,
+    ttl_seconds=settings.ai_cache_ttl_seconds
+)
+
+# AI recommendation context
+# Prompts carry today's tasks, a progress summary and a digest of recent advice, fitted to
+# a token budget. The history reads are bounded (week rollups, a window of completion days and
+# the latest few recommendations), so prompt size and build time stay flat as history grows.
+AI_CONTEXT_TOKEN_BUDGET = settings.ai_context_token_budget
+AI_CONTEXT_WINDOW_DAYS = settings.ai_context_window_days
+AI_CONTEXT_RECOMMENDATIONS = settings.ai_context_recommendations
+
+class PromptContextCache:
+    """LRU of the history sections of recommendation prompts, per user and day.
+
+    The progress summary and the digest of recent recommendations are built and token-counted
+    once, then reused until the day ends, a new recommendation is saved, or one of the user's
+    writes starts a new response cache generation.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def get(self, user_id: str, date: str) -> Optional[List[ContextSection]]:
+        entry = self._entries.get((user_id, date))
+        if entry is None or entry[0] != response_cache.generation_of(user_id):
+            return None
+        self._entries.move_to_end((user_id, date))
+        return entry[1]
+
+    def put(self, user_id: str, date: str, generation: tuple, sections: List[ContextSection]):
+        self._entries[(user_id, date)] = (generation, sections)
+        self._entries.move_to_end((user_id, date))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, user_id: str, date: str):
+        self._entries.pop((user_id, date), None)
+
+prompt_context_cache = PromptContextCache(max_entries=settings.ai_context_cache_max_entries)
+
+async def build_history_sections(user_id: str, date: str) -> List[ContextSection]:
+    """The progress summary and the digest of the latest recommendations"""
+    day = datetime.strptime(date, "%Y-%m-%d")
+    window_start = (day - timedelta(days=AI_CONTEXT_WINDOW_DAYS)).strftime("%Y-%m-%d")
+    yesterday = (day - timedelta(days=1)).strftime("%Y-%m-%d")
+    rollups, recent_days, recommendations = await asyncio.gather(
+        store.find_rollups(user_id, ["all", "week"]),
+        store.find_completion_days(user_id, window_start, yesterday),
+        store.recent_recommendations(user_id, AI_CONTEXT_RECOMMENDATIONS, ("date", "recommendations"))
+    )
+    week_rollups = [rollup for rollup in rollups if rollup["kind"] == "week"]
+    overall = next((rollup for rollup in rollups if rollup["kind"] == "all"), None)
+    summary = summary_lines(week_rollups, overall, recent_days, _current_week(week_rollups, date), AI_CONTEXT_WINDOW_DAYS)
+    advice = recommendation_lines(recommendations)
+    return [
+        ContextSection("summary", "Progress so far:", summary, share=0.25),
+        ContextSection("recommendations", "Recent advice, not worth repeating:", advice, share=0.25),
+    ]
+
+# Sections left out of the completion cache key: the advice digest changes with every saved
+# recommendation, so keying on it would stop identical requests from ever hitting the cache
+UNCACHED_CONTEXT_SECTIONS = {"recommendations"}
+
+async def build_prompt_context(user_id: str, date: str) -> tuple:
+    """Return (context, tokens per section, cache basis): today's tasks and the cached history
+    sections fitted to AI_CONTEXT_TOKEN_BUDGET with today's tasks kept first, and the text of the
+    sections that identify the request for the completion cache"""
+    generation = response_cache.generation_of(user_id)
+    history = prompt_context_cache.get(user_id, date)
+    if history is None:
+        tasks, history = await asyncio.gather(
+            store.find_tasks(user_id, {"date": date}, limit=100),
+            build_history_sections(user_id, date)
+        )
+        prompt_context_cache.put(user_id, date, generation, history)
+    else:
+        tasks = await store.find_tasks(user_id, {"date": date}, limit=100)
+    completed = sum(task["status"] == TaskStatus.COMPLETED for task in tasks)
+    today = ContextSection("tasks", f"Today's tasks ({date}), {completed}/{len(tasks)} done:", task_lines(tasks), share=0.5)
+    sections = [today, *history]
+    context, section_tokens = fit_sections(sections, AI_CONTEXT_TOKEN_BUDGET)
+    cache_basis = "\n".join(line for section in sections if section.name not in UNCACHED_CONTEXT_SECTIONS
+                            for line in (section.title, *(line for line, _ in section.lines)))
+    return context, section_tokens, cache_basis
+
+def record_prompt_tokens(prompt: str, section_tokens: Dict[str, int]) -> int:
+    """Observe the size of a recommendation prompt and its context sections; returns the prompt's tokens"""
+    prompt_tokens = count_tokens(prompt)
+    AI_CONTEXT_TOKENS.labels("prompt").observe(prompt_tokens)
+    for section, tokens in section_tokens.items():
+        AI_CONTEXT_TOKENS.labels(section).observe(tokens)
+    return prompt_tokens
+
+# AI recommendation helpers
+def build_recommendation_prompt(context: str, user_prompt: str) -> str:
+    return f"""Based on my internship preparation progress, provide focused recommendations for today.
+
+Context: {context}
+
+User question/request: {user_prompt}
+
+Please provide:
+1. Top 3 priority tasks for today
+2. Focus areas that need attention
+3. Specific actionable recommendations
+4. Time management tips
+
+Keep it concise and actionable."""
+
+async def save_recommendation(user_id: str, date: str, recommendations_text: str, prompt_tokens: Optional[int] = None):
+    ai_rec = AIRecommendation(
+        date=date,
+        recommendations=[recommendations_text],
+        focus_areas=["DSA", "Projects", "Applications"],  # Could be parsed from response
+        priority_tasks=["Complete daily DSA", "Work on portfolio", "Send applications"],  # Could be parsed
+        prompt_tokens=prompt_tokens
+    )
+    await store.insert_recommendation(user_id, ai_rec.dict())
+    prompt_context_cache.discard(user_id, date)
+
+async def stale_recommendation(user_id: str, context: str) -> Optional[Dict[str, Any]]:
+    """The user's last recorded recommendation, served while the LLM circuit is open"""
+    recent = await store.recent_recommendations(user_id, 1, ("date", "recommendations"))
+    if not recent:
+        return None
+    return {
+        "date": recent[0]["date"],
+        "recommendations": "\n".join(recent[0]["recommendations"]),
+        "context_used": context,
+        "cached": True,
+        "stale": True
+    }
+
+async def generate_recommendations(user_id: str, request: AIPromptRequest) -> Dict[str, Any]:
+    """Build the prompt, get a (possibly cached) completion and record it.
+
+    While the LLM circuit is open the user's last recommendation is returned instead, marked
+    stale; CircuitOpenError is raised only if there is none.
+    """
+    # Today's tasks and recent history, within the context token budget
+    today = datetime.now().strftime("%Y-%m-%d")
+    context, section_tokens, cache_basis = await build_prompt_context(user_id, today)
+    prompt = build_recommendation_prompt(context, request.user_prompt)
+    prompt_tokens = record_prompt_tokens(prompt, section_tokens)
+    
+    # Identical model, system message, tasks, progress and question share one cached completion
+    user_message = new_user_message(prompt)
+    cache_key = LlmResponseCache.key_for(LLM_MODEL, LLM_SYSTEM_MESSAGE, cache_basis, request.user_prompt)
+    try:
+        response, cached = await llm_cache.get_or_call(
+            cache_key, lambda: llm_executor.send(user_id, request.session_id, user_message)
+        )
+    except CircuitOpenError:
+        fallback = await stale_recommendation(user_id, context)
+        if fallback is None:
+            raise
+        return fallback
+    
+    # Parse response into structured format
+    recommendations_text = response.strip()
+    
+    # Save AI recommendation
+    await save_recommendation(user_id, today, recommendations_text, prompt_tokens)
+    
+    return {
+        "date": today,
+        "recommendations": recommendations_text,
+        "context_used": context,
+        "prompt_tokens": prompt_tokens,
+        "cached": cached,
+        "stale": False
+    }
+
+# Background AI jobs; references are kept so running tasks are not garbage collected
+ai_job_tasks = set()
+
+async def run_ai_job(user_id: str, job_id: str, request: AIPromptRequest):
+    await store.update_job(user_id, job_id, {"status": AIJobStatus.RUNNING})
+    try:
+        result = await generate_recommendations(user_id, request)
+        update = {"status": AIJobStatus.COMPLETED, "result": result}
+    except asyncio.TimeoutError:
+        update = {"status": AIJobStatus.FAILED, "error": "AI recommendation timed out"}
+    except Exception as e:
+        logging.error(f"Error running AI job {job_id}: {e}")
+        update = {"status": AIJobStatus.FAILED, "error": str(e)}
+    update["completed_at"] = datetime.now(timezone.utc)
+    await store.update_job(user_id, job_id, update)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def http_error(message: str, error: Exception, timeout_detail: str = "The request timed out") -> HTTPException:
+    """The HTTPException to answer with for an error raised while serving a request.
+
+    HTTPExceptions pass through unchanged, an unavailable or saturated LLM is a 503, a spent
+    deadline or timeout is a 504, and anything else is logged as `message` and becomes a 500.
+    """
+    if isinstance(error, HTTPException):
+        return error
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(math.ceil(error.retry_after))})
+    if isinstance(error, LlmOverloadedError):
+        return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "5"})
+    if is_timeout(error):
+        logging.warning(f"{message}: timed out ({error!r})")
+        return HTTPException(status_code=504, detail=timeout_detail)
+    logging.error(f"{message}: {error}")
+    return HTTPException(status_code=500, detail=str(error))
 
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Internship Prep Dashboard API"}
 
+async def _initialize_from(user_id: str, binary_file, dry_run: bool, force: bool,
+                           origin: Optional[str] = None) -> Dict[str, Any]:
+    result = await ingest_schedule_source(user_id, binary_file, dry_run=dry_run, force=force)
+    if result["changed"] and not dry_run:
+        await rebuild_rollups(user_id)
+        response_cache.invalidate(user_id)
+        task_events.publish(user_id, "schedule_changed", origin=origin, inserted=result["inserted"],
+                            updated=result["updated"], deleted=result["deleted"])
+    
+    if result["skipped"]:
+        message = f"Initialized {result['count']} tasks. Schedule unchanged since it was last ingested"
+    else:
+        verb = "Would apply" if dry_run else "Applied"
+        message = (f"Initialized {result['count']} tasks. {verb} {result['inserted']} inserts, "
+                   f"{result['updated']} updates, {result['deleted']} deletes")
+    return {"message": message, **result}
+
 @api_router.post("/tasks/initialize")
-async def initialize_schedule():
-    """Initialize the schedule from markdown data"""
+async def initialize_schedule(dry_run: bool = False, force: bool = False, user_id: str = Depends(current_user),
+                              origin: Optional[str] = Depends(client_id)):
+    """Initialize the schedule from the markdown schedule file, applying only the differences to stored tasks"""
     try:
-        # Clear existing tasks
-        await db.tasks.delete_many({})
-        
-        # Parse and insert schedule data
-        schedule_data = ScheduleParser.parse_schedule_data()
-        tasks = []
-        
-        for item in schedule_data:
-            task = Task(
-                date=item["date"],
-                category=TaskCategory(item["category"]),
-                description=item["description"],
-                week_number=item["week"],
-                phase=item["phase"],
-                priority=item["priority"]
-            )
-            tasks.append(task.dict())
-        
-        if tasks:
-            await db.tasks.insert_many(tasks)
-        
-        return {"message": f"Initialized {len(tasks)} tasks", "count": len(tasks)}
+        with open(ScheduleParser.SCHEDULE_PATH, "rb") as schedule_file:
+            return await _initialize_from(user_id, schedule_file, dry_run, force, origin)
+    except ScheduleParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise http_error("Error initializing schedule", e)
+
+@api_router.post("/tasks/initialize/upload")
+async def initialize_schedule_upload(file: UploadFile = File(...), dry_run: bool = False, force: bool = False,
+                                     user_id: str = Depends(current_user), origin: Optional[str] = Depends(client_id)):
+    """Initialize the schedule from an uploaded markdown schedule"""
+    try:
+        return await _initialize_from(user_id, file.file, dry_run, force, origin)
+    except ScheduleParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logging.error(f"Error initializing schedule: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error initializing schedule from upload", e)
+
+@api_router.get("/schedule/outline")
+async def get_schedule_outline(user_id: str = Depends(current_user)):
+    """Get the phase and week outline of the most recently ingested schedule"""
+    source = await store.latest_schedule_source(user_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="No schedule ingested yet")
+    return {"content_hash": source["content_hash"], "ingested_at": source["ingested_at"], "outline": source["outline"]}
 
 @api_router.get("/tasks", response_model=List[Task])
 async def get_tasks(
+    request: Request,
     category: Optional[TaskCategory] = None,
     status: Optional[TaskStatus] = None,
     week: Optional[int] = None,
-    date: Optional[str] = None
+    date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    fields: Optional[str] = None,
+    user_id: str = Depends(current_user)
 ):
-    """Get tasks with optional filters"""
-    try:
-        query = {}
-        if category:
-            query["category"] = category
-        if status:
-            query["status"] = status
-        if week:
-            query["week_number"] = week
-        if date:
-            query["date"] = date
-            
-        tasks = await db.tasks.find(query).sort("date", 1).to_list(1000)
-        return [Task(**task) for task in tasks]
+    """Get tasks with optional filters, one page at a time.
+
+    The next page's cursor is returned in the X-Next-Cursor header. Clients sending
+    Accept: application/x-ndjson get every matching task streamed instead of a page.
+    ?fields=status,category limits each task to those fields (plus id and date), read
+    through a storage projection.
+    """
+    projection = parse_task_fields(fields)
+    query = {}
+    if category:
+        query["category"] = category
+    if status:
+        query["status"] = status
+    if week:
+        query["week_number"] = week
+    if date:
+        query["date"] = date
+    after = decode_cursor(cursor) if cursor else None
+    
+    try:
+        if "application/x-ndjson" in request.headers.get("accept", ""):
+            stream = store.iter_tasks(user_id, query, after, fields=projection)
+            return StreamingResponse(stream_ndjson(stream), media_type="application/x-ndjson")
+        
+        tasks = await store.find_tasks(user_id, query, after, limit=limit + 1, fields=projection)
+        headers = {}
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(tasks[-1])
+        return render(request, tasks, headers=headers)
+    except Exception as e:
+        raise http_error("Error fetching tasks", e)
+
+# The fields the calendar renders, and the widest range it asks for (a six week month grid, with slack)
+CALENDAR_FIELDS = ("id", "date", "category", "status", "priority", "description", "week_number", "phase")
+CALENDAR_MAX_DAYS = 62
+
+def group_calendar_days(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group tasks ordered by date into one entry per day with its completion counts"""
+    days = []
+    for task in tasks:
+        if not days or days[-1]["date"] != task["date"]:
+            days.append({"date": task["date"], "total": 0, "completed": 0, "tasks": []})
+        day = days[-1]
+        day["total"] += 1
+        day["completed"] += task["status"] == TaskStatus.COMPLETED
+        day["tasks"].append({field: task[field] for field in CALENDAR_FIELDS if field != "date" and field in task})
+    return days
+
+@api_router.get("/tasks/calendar")
+async def get_task_calendar(
+    request: Request,
+    from_date: str = Query(..., alias="from"),
+    to_date: str = Query(..., alias="to"),
+    user_id: str = Depends(current_user)
+):
+    """Get the tasks between two dates grouped per day, trimmed to the fields the calendar renders.
+
+    Clients ask for one month grid at a time, so each month is its own cache entry and ETag.
+    """
+    try:
+        start = datetime.strptime(from_date, "%Y-%m-%d")
+        end = datetime.strptime(to_date, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be YYYY-MM-DD dates")
+    if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The range must span 1 to {CALENDAR_MAX_DAYS} days")
+    
+    try:
+        tasks = await store.find_tasks_between(user_id, from_date, to_date, fields=CALENDAR_FIELDS)
+        days = group_calendar_days(tasks)
+        return render(request, {
+            "from": from_date,
+            "to": to_date,
+            "total": sum(day["total"] for day in days),
+            "completed": sum(day["completed"] for day in days),
+            "days": days
+        })
     except Exception as e:
-        logging.error(f"Error fetching tasks: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error fetching calendar", e)
+
+# The most words a search query is matched on; the rest are ignored
+SEARCH_MAX_TERMS = 16
+
+@api_router.get("/tasks/search")
+async def search_tasks(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[TaskCategory] = None,
+    status: Optional[TaskStatus] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None,
+    user_id: str = Depends(current_user)
+):
+    """Search task descriptions and phases, best matches first.
+
+    Tasks matching any word of q are ranked by relevance and returned with their score, a
+    description match counting more than a phase match. The next page's cursor is returned in
+    the X-Next-Cursor header.
+    """
+    terms = search_terms(q)[:SEARCH_MAX_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="q must contain at least one word")
+    projection = parse_task_fields(fields)
+    query = {}
+    if category:
+        query["category"] = category
+    if status:
+        query["status"] = status
+    after = decode_search_cursor(cursor) if cursor else None
+    
+    try:
+        tasks = await store.search_tasks(user_id, terms, query, after, limit=limit + 1, fields=projection)
+        headers = {}
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            headers["X-Next-Cursor"] = encode_search_cursor(tasks[-1])
+        return render(request, tasks, headers=headers)
+    except Exception as e:
+        raise http_error("Error searching tasks", e)
 
 @api_router.put("/tasks/{task_id}", response_model=Task)
-async def update_task(task_id: str, task_update: TaskUpdate):
+async def update_task(task_id: str, task_update: TaskUpdate, user_id: str = Depends(current_user),
+                      origin: Optional[str] = Depends(client_id)):
     """Update a task"""
     try:
-        update_data = {k: v for k, v in task_update.dict().items() if v is not None}
+        update_data = task_update_fields(task_update)
         
-        if task_update.status == TaskStatus.COMPLETED:
-            update_data["completed_at"] = datetime.now(timezone.utc)
-        elif task_update.status in [TaskStatus.PENDING, TaskStatus.IN_PROGRESS]:
-            update_data["completed_at"] = None
-            
-        result = await db.tasks.update_one(
-            {"id": task_id},
-            {"$set": update_data}
-        )
+        previous_task = await store.update_task(user_id, task_id, update_data)
         
-        if result.matched_count == 0:
+        if previous_task is None:
             raise HTTPException(status_code=404, detail="Task not found")
-            
-        updated_task = await db.tasks.find_one({"id": task_id})
-        return Task(**updated_task)
+        
+        await apply_status_change(user_id, previous_task, update_data)
+        response_cache.invalidate(user_id)
+        task_events.publish(user_id, "tasks_updated", origin=origin, tasks=[task_delta(previous_task, update_data)])
+        return Task(**{**previous_task, **update_data})
     except Exception as e:
-        logging.error(f"Error updating task: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error updating task", e)
+
+@api_router.patch("/tasks/bulk")
+async def bulk_update_tasks(request: BulkTaskRequest, user_id: str = Depends(current_user),
+                            origin: Optional[str] = Depends(client_id)):
+    """Apply many task updates, listed by id or selected by a filter, in one bulk write.
+
+    The response lists each item's result and the change deltas applied, as pushed to other clients.
+    """
+    if request.filter is not None:
+        if request.update is None:
+            raise HTTPException(status_code=400, detail="A filter update needs an update")
+        if not request.filter.dict(exclude_none=True):
+            raise HTTPException(status_code=400, detail="Filter must set at least one field")
+    
+    try:
+        items = [(item.id, TaskUpdate(**item.dict(exclude={"id"}))) for item in request.items]
+        if request.filter is not None:
+            query = request.filter.dict(exclude_none=True)
+            async for task in store.iter_tasks(user_id, query, fields=("id",)):
+                items.append((task["id"], request.update))
+        
+        fields = ("id", "status", "category", "week_number", "phase", "date", "completed_at")
+        previous = {task["id"]: task for task in await store.get_tasks(user_id, [task_id for task_id, _ in items], fields)}
+        
+        results, operations, applied_items = [], [], []
+        for task_id, task_update in items:
+            update_data = task_update_fields(task_update)
+            if task_id not in previous:
+                results.append({"id": task_id, "result": "not_found"})
+            elif not update_data:
+                results.append({"id": task_id, "result": "unchanged"})
+            else:
+                operations.append((task_id, update_data))
+                applied_items.append((len(results), task_id, task_update, update_data))
+                results.append({"id": task_id, "result": "updated"})
+        
+        errors = await store.update_tasks(user_id, operations, ordered=request.ordered)
+        
+        # Ordered writes stop at the first error; replay the rest in order to get rollup deltas right
+        first_error = min(errors) if errors and request.ordered else None
+        changes, deltas = [], []
+        for op_index, (result_index, task_id, task_update, update_data) in enumerate(applied_items):
+            if op_index in errors:
+                results[result_index].update(result="error", error=errors[op_index])
+            elif first_error is not None and op_index > first_error:
+                results[result_index]["result"] = "skipped"
+            else:
+                changes.append((dict(previous[task_id]), update_data))
+                deltas.append(task_delta(previous[task_id], update_data))
+                previous[task_id].update({k: v for k, v in update_data.items() if k in ("status", "completed_at")})
+        
+        await apply_status_changes(user_id, changes)
+        response_cache.invalidate(user_id)
+        if deltas:
+            task_events.publish(user_id, "tasks_updated", origin=origin, tasks=deltas)
+        
+        counts = Counter(result["result"] for result in results)
+        return {"counts": dict(counts), "results": results, "tasks": deltas}
+    except Exception as e:
+        raise http_error("Error bulk updating tasks", e)
 
 @api_router.get("/progress/weekly")
-async def get_weekly_progress():
+async def get_weekly_progress(user_id: str = Depends(current_user)):
     """Get weekly progress statistics"""
     try:
-        # Aggregate progress data by week
-        pipeline = [
-            {
-                "$group": {
-                    "_id": {"week": "$week_number", "phase": "$phase"},
-                    "total_tasks": {"$sum": 1},
-                    "completed_tasks": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}},
-                    "dsa_completed": {"$sum": {"$cond": [{"$and": [{"$eq": ["$category", "DSA"]}, {"$eq": ["$status", "COMPLETED"]}]}, 1, 0]}},
-                    "projects_completed": {"$sum": {"$cond": [{"$and": [{"$eq": ["$category", "PROJECT"]}, {"$eq": ["$status", "COMPLETED"]}]}, 1, 0]}},
-                    "applications_sent": {"$sum": {"$cond": [{"$and": [{"$eq": ["$category", "APPLY"]}, {"$eq": ["$status", "COMPLETED"]}]}, 1, 0]}},
-                }
-            },
-            {
-                "$project": {
-                    "week_number": "$_id.week",
-                    "phase": "$_id.phase",
-                    "total_tasks": 1,
-                    "completed_tasks": 1,
-                    "dsa_completed": 1,
-                    "projects_completed": 1,
-                    "applications_sent": 1,
-                    "completion_percentage": {"$multiply": [{"$divide": ["$completed_tasks", "$total_tasks"]}, 100]},
-                    "_id": 0
-                }
-            },
-            {"$sort": {"week_number": 1}}
-        ]
-        
-        progress_data = await db.tasks.aggregate(pipeline).to_list(100)
-        return progress_data
+        rollups = await store.find_rollups(user_id, ["week"])
+        return [_week_progress(rollup) for rollup in sorted(rollups, key=lambda r: (r["week_number"], r["start_date"]))]
     except Exception as e:
-        logging.error(f"Error fetching weekly progress: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error fetching weekly progress", e)
 
 @api_router.get("/progress/daily")
-async def get_daily_progress(date: Optional[str] = None):
+async def get_daily_progress(date: Optional[str] = None, user_id: str = Depends(current_user)):
     """Get daily progress for a specific date or today"""
     try:
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
             
         # Get tasks for the date
-        tasks = await db.tasks.find({"date": date}).to_list(100)
+        tasks = await store.find_tasks(user_id, {"date": date}, limit=100, fields=TASK_FIELDS)
         
         total_tasks = len(tasks)
         completed_tasks = len([t for t in tasks if t["status"] == "COMPLETED"])
@@ -296,105 +1564,267 @@ async def get_daily_progress(date: Optional[str] = None):
             "completed_tasks": completed_tasks,
             "completion_percentage": (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
             "category_stats": category_stats,
-            "tasks": [Task(**task) for task in tasks]
+            "tasks": tasks
         }
     except Exception as e:
-        logging.error(f"Error fetching daily progress: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error fetching daily progress", e)
 
-@api_router.post("/ai/recommendations")
-async def get_ai_recommendations(request: AIPromptRequest):
-    """Get AI-powered daily focus recommendations"""
+# Completion analytics, answered from the completion history in O(days) for any range
+ANALYTICS_MAX_DAYS = 731
+
+def analytics_range(from_date: Optional[str], to_date: Optional[str], default_days: int) -> tuple:
+    """Parse an inclusive from/to range, defaulting to the `default_days` days ending today"""
     try:
-        # Get today's tasks for context
-        today = datetime.now().strftime("%Y-%m-%d")
-        tasks = await db.tasks.find({"date": today}).to_list(100)
-        
-        # Build context
-        context = f"Today's tasks ({today}):\n"
-        for task in tasks:
-            status_emoji = "✅" if task["status"] == "COMPLETED" else "⏳" if task["status"] == "IN_PROGRESS" else "❌"
-            context += f"{status_emoji} {task['category']}: {task['description']}\n"
-        
-        # Create user message
-        prompt = f"""Based on my internship preparation progress, provide focused recommendations for today.
+        end = datetime.strptime(to_date or datetime.now().strftime("%Y-%m-%d"), "%Y-%m-%d")
+        start = datetime.strptime(from_date, "%Y-%m-%d") if from_date else end - timedelta(days=default_days - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from and to must be YYYY-MM-DD dates")
+    if end < start or (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The range must span 1 to {ANALYTICS_MAX_DAYS} days")
+    return start, end
 
-Context: {context}
+def iter_days(start: datetime, end: datetime) -> Iterator[str]:
+    for offset in range((end - start).days + 1):
+        yield (start + timedelta(days=offset)).strftime("%Y-%m-%d")
 
-User question/request: {request.user_prompt}
+def compute_streaks(active_days: List[str], today: str) -> Dict[str, Any]:
+    """Current and longest runs of consecutive days in the ascending `active_days`.
 
-Please provide:
-1. Top 3 priority tasks for today
-2. Focus areas that need attention
-3. Specific actionable recommendations
-4. Time management tips
+    The current streak is still alive when its last day is today or yesterday.
+    """
+    ordinal = lambda day: datetime.fromisoformat(day).toordinal()
+    longest = {"days": 0, "start": None, "end": None}
+    run_start, previous = 0, None
+    for index, day in enumerate(map(ordinal, active_days)):
+        if previous is None or day - previous != 1:
+            run_start = index
+        previous = day
+        if index - run_start + 1 > longest["days"]:
+            longest = {"days": index - run_start + 1, "start": active_days[run_start], "end": active_days[index]}
+    
+    current = {"days": 0, "start": None, "end": None}
+    if previous is not None and ordinal(today) - previous <= 1:
+        current = {"days": len(active_days) - run_start, "start": active_days[run_start], "end": active_days[-1]}
+    return {"current": current, "longest": longest}
 
-Keep it concise and actionable."""
+@api_router.get("/progress/completions")
+async def get_completions(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    user_id: str = Depends(current_user)
+):
+    """Get the tasks completed per day over a range, the last 30 days by default"""
+    start, end = analytics_range(from_date, to_date, 30)
+    try:
+        stored = {
+            doc["date"]: doc
+            for doc in await store.find_completion_days(user_id, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+        }
+        days = []
+        for date in iter_days(start, end):
+            doc = stored.get(date, {})
+            days.append({
+                "date": date,
+                "completed": doc.get("completed", 0),
+                "categories": {category: count for category, count in doc.get("categories", {}).items() if count}
+            })
+        return {
+            "from": start.strftime("%Y-%m-%d"),
+            "to": end.strftime("%Y-%m-%d"),
+            "total": sum(day["completed"] for day in days),
+            "days": days
+        }
+    except Exception as e:
+        raise http_error("Error fetching completions", e)
 
-        user_message = UserMessage(text=prompt)
-        response = await llm_chat.send_message(user_message)
-        
-        # Parse response into structured format
-        recommendations_text = response.strip()
-        
-        # Save AI recommendation
-        ai_rec = AIRecommendation(
-            date=today,
-            recommendations=[recommendations_text],
-            focus_areas=["DSA", "Projects", "Applications"],  # Could be parsed from response
-            priority_tasks=["Complete daily DSA", "Work on portfolio", "Send applications"]  # Could be parsed
-        )
-        
-        await db.ai_recommendations.insert_one(ai_rec.dict())
+@api_router.get("/progress/velocity")
+async def get_velocity(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    user_id: str = Depends(current_user)
+):
+    """Get completions per category over a range (the last 28 days by default), as rates and week by week"""
+    start, end = analytics_range(from_date, to_date, 28)
+    try:
+        stored = await store.find_completion_days(user_id, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+        span_days = (end - start).days + 1
+        totals = Counter({category.value: 0 for category in TaskCategory})
+        weeks: Dict[str, Dict[str, Any]] = {}
+        for doc in stored:
+            day = datetime.strptime(doc["date"], "%Y-%m-%d")
+            week_start = (day - timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+            week = weeks.setdefault(week_start, {"week_start": week_start, "completed": 0, "categories": Counter()})
+            week["completed"] += doc.get("completed", 0)
+            for category, count in doc.get("categories", {}).items():
+                week["categories"][category] += count
+                totals[category] += count
         
         return {
-            "date": today,
-            "recommendations": recommendations_text,
-            "context_used": context
+            "from": start.strftime("%Y-%m-%d"),
+            "to": end.strftime("%Y-%m-%d"),
+            "days": span_days,
+            "categories": {
+                category: {
+                    "completed": count,
+                    "per_day": round(count / span_days, 3),
+                    "per_week": round(count / span_days * 7, 3)
+                }
+                for category, count in totals.items()
+            },
+            "weeks": [
+                {**week, "categories": {category: count for category, count in week["categories"].items() if count}}
+                for _, week in sorted(weeks.items())
+            ]
         }
     except Exception as e:
-        logging.error(f"Error generating AI recommendations: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error fetching velocity", e)
+
+@api_router.get("/progress/streaks")
+async def get_streaks(user_id: str = Depends(current_user)):
+    """Get the current and longest streaks of consecutive days with at least one completed task"""
+    try:
+        active_days = [doc["date"] for doc in await store.find_completion_days(user_id) if doc.get("completed", 0) > 0]
+        return {
+            **compute_streaks(active_days, datetime.now().strftime("%Y-%m-%d")),
+            "active_days": len(active_days),
+            "last_completed_on": active_days[-1] if active_days else None
+        }
+    except Exception as e:
+        raise http_error("Error fetching streaks", e)
+
+@api_router.post("/ai/recommendations")
+async def get_ai_recommendations(request: AIPromptRequest, user_id: str = Depends(current_user)):
+    """Get AI-powered daily focus recommendations"""
+    try:
+        return await generate_recommendations(user_id, request)
+    except Exception as e:
+        raise http_error("Error generating AI recommendations", e, "AI recommendation timed out")
+
+@api_router.post("/ai/recommendations/stream")
+async def stream_ai_recommendations(request: AIPromptRequest, http_request: Request, user_id: str = Depends(current_user)):
+    """Stream AI recommendations as server-sent events while they are generated"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    
+    async def events():
+        try:
+            # Built inside the stream, so a storage error here is sent as an error event too
+            context, section_tokens, cache_basis = await build_prompt_context(user_id, today)
+            prompt = build_recommendation_prompt(context, request.user_prompt)
+            prompt_tokens = record_prompt_tokens(prompt, section_tokens)
+            cache_key = LlmResponseCache.key_for(LLM_MODEL, LLM_SYSTEM_MESSAGE, cache_basis, request.user_prompt)
+            cached_text = await llm_cache.lookup(cache_key)
+            if cached_text is not None:
+                chunks = [cached_text]
+            else:
+                chunks = []
+                try:
+                    # Leaving the loop closes the upstream stream, so a disconnect cancels generation
+                    async with aclosing(llm_executor.stream(user_id, request.session_id, new_user_message(prompt))) as stream:
+                        async for chunk in stream:
+                            if await http_request.is_disconnected():
+                                logger.info("Client disconnected, cancelling AI recommendation stream")
+                                return
+                            chunks.append(chunk)
+                            yield sse_event("chunk", {"text": chunk})
+                except CircuitOpenError:
+                    fallback = await stale_recommendation(user_id, context)
+                    if fallback is None:
+                        raise
+                    yield sse_event("chunk", {"text": fallback["recommendations"]})
+                    yield sse_event("done", fallback)
+                    return
+                await llm_cache.put(cache_key, "".join(chunks))
+            
+            recommendations_text = "".join(chunks).strip()
+            if cached_text is not None:
+                yield sse_event("chunk", {"text": recommendations_text})
+            await save_recommendation(user_id, today, recommendations_text, prompt_tokens)
+            yield sse_event("done", {
+                "date": today,
+                "recommendations": recommendations_text,
+                "context_used": context,
+                "prompt_tokens": prompt_tokens,
+                "cached": cached_text is not None,
+                "stale": False
+            })
+        except Exception as e:
+            error = http_error("Error streaming AI recommendations", e, "AI recommendation timed out")
+            yield sse_event("error", {"detail": error.detail, "status": error.status_code})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@api_router.post("/ai/jobs", status_code=202)
+async def create_ai_job(request: AIPromptRequest, user_id: str = Depends(current_user)):
+    """Queue an AI recommendation and return a job id to poll"""
+    if llm_executor.saturated:
+        raise HTTPException(status_code=503, detail="Too many AI requests queued", headers={"Retry-After": "5"})
+    try:
+        job = AIJob(user_prompt=request.user_prompt, session_id=request.session_id)
+        await store.insert_job(user_id, job.dict())
+        # The job outlives this request, so it runs in a fresh context, without the request's deadline
+        task = asyncio.create_task(run_ai_job(user_id, job.id, request), context=Context())
+        ai_job_tasks.add(task)
+        task.add_done_callback(ai_job_tasks.discard)
+        return {"job_id": job.id, "status": job.status}
+    except Exception as e:
+        raise http_error("Error creating AI job", e)
+
+@api_router.get("/ai/jobs/{job_id}", response_model=AIJob)
+async def get_ai_job(job_id: str, user_id: str = Depends(current_user)):
+    """Poll the status and result of an AI recommendation job"""
+    try:
+        job = await store.get_job(user_id, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return AIJob(**job)
+    except Exception as e:
+        raise http_error("Error fetching AI job", e)
 
 @api_router.get("/ai/recommendations/history")
-async def get_ai_recommendations_history(limit: int = 10):
+async def get_ai_recommendations_history(limit: int = 10, user_id: str = Depends(current_user)):
     """Get historical AI recommendations"""
     try:
-        recommendations = await db.ai_recommendations.find().sort("created_at", -1).limit(limit).to_list(limit)
-        return [AIRecommendation(**rec) for rec in recommendations]
+        recommendations = await store.recent_recommendations(user_id, limit, AI_RECOMMENDATION_FIELDS)
+        return ORJSONResponse(recommendations)
     except Exception as e:
-        logging.error(f"Error fetching AI recommendations history: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error("Error fetching AI recommendations history", e)
 
 @api_router.get("/dashboard/overview")
-async def get_dashboard_overview():
-    """Get comprehensive dashboard overview"""
+async def get_dashboard_overview(request: Request, fields: Optional[str] = None, user_id: str = Depends(current_user)):
+    """Get comprehensive dashboard overview; ?fields= limits today's tasks as on GET /tasks"""
+    projection = parse_task_fields(fields)
     try:
+        # Rollups and today's tasks are independent, so fetch them concurrently; status is always
+        # read for today's completed count and dropped again if ?fields= did not ask for it
+        today = datetime.now().strftime("%Y-%m-%d")
+        rollups, today_tasks = await asyncio.gather(
+            store.find_rollups(user_id, ["all", "week", "category"]),
+            store.find_tasks(user_id, {"date": today}, limit=100, fields=tuple(dict.fromkeys([*projection, "status"])))
+        )
+        
         # Get overall stats
-        total_tasks = await db.tasks.count_documents({})
-        completed_tasks = await db.tasks.count_documents({"status": "COMPLETED"})
+        totals = next((r for r in rollups if r["kind"] == "all"), {})
+        total_tasks = totals.get("total", 0)
+        completed_tasks = totals.get("completed", 0)
         
         # Get today's progress
-        today = datetime.now().strftime("%Y-%m-%d")
-        today_tasks = await db.tasks.find({"date": today}).to_list(100)
         today_completed = len([t for t in today_tasks if t["status"] == "COMPLETED"])
+        if "status" not in projection:
+            today_tasks = [{k: v for k, v in t.items() if k != "status"} for t in today_tasks]
         
         # Get weekly progress
-        current_week = 1  # Could be calculated based on current date
-        week_tasks = await db.tasks.find({"week_number": current_week}).to_list(100)
-        week_completed = len([t for t in week_tasks if t["status"] == "COMPLETED"])
+        week_rollups = [r for r in rollups if r["kind"] == "week"]
+        current_week = _current_week(week_rollups, today)
+        week_total = sum(r["total"] for r in week_rollups if r["week_number"] == current_week)
+        week_completed = sum(r["completed"] for r in week_rollups if r["week_number"] == current_week)
         
         # Get category distribution
-        category_pipeline = [
-            {"$group": {
-                "_id": "$category",
-                "total": {"$sum": 1},
-                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}}
-            }}
+        category_stats = [
+            {"_id": r["category"], "total": r["total"], "completed": r["completed"]}
+            for r in rollups if r["kind"] == "category"
         ]
-        category_stats = await db.tasks.aggregate(category_pipeline).to_list(10)
         
-        return {
+        return render(request, {
             "overview": {
                 "total_tasks": total_tasks,
                 "completed_tasks": completed_tasks,
@@ -405,29 +1835,309 @@ async def get_dashboard_overview():
                 "total_tasks": len(today_tasks),
                 "completed_tasks": today_completed,
                 "completion_percentage": (today_completed / len(today_tasks) * 100) if today_tasks else 0,
-                "tasks": [Task(**task) for task in today_tasks]
+                "tasks": today_tasks
             },
             "current_week": {
                 "week_number": current_week,
-                "total_tasks": len(week_tasks),
+                "total_tasks": week_total,
                 "completed_tasks": week_completed,
-                "completion_percentage": (week_completed / len(week_tasks) * 100) if week_tasks else 0
+                "completion_percentage": (week_completed / week_total * 100) if week_total else 0
             },
             "category_distribution": category_stats
-        }
+        })
+    except Exception as e:
+        raise http_error("Error fetching dashboard overview", e)
+
+@api_router.post("/progress/rollups/rebuild")
+async def rebuild_progress_rollups(user_id: str = Depends(current_user)):
+    """Rebuild the user's progress rollups from their tasks and verify the result"""
+    try:
+        count = await rebuild_rollups(user_id)
+        response_cache.invalidate(user_id)
+        drift = await verify_rollups(user_id)
+        return {"message": f"Rebuilt {count} rollups", "count": count, "ok": not drift, "drift": drift}
+    except Exception as e:
+        raise http_error("Error rebuilding progress rollups", e)
+
+@api_router.get("/progress/rollups/verify")
+async def verify_progress_rollups(user_id: str = Depends(current_user)):
+    """Compare the user's stored progress rollups against a fresh aggregation"""
+    try:
+        drift = await verify_rollups(user_id)
+        return {"ok": not drift, "drift": drift}
+    except Exception as e:
+        raise http_error("Error verifying progress rollups", e)
+
+# Bulk export and import
+class TransferKind(str, Enum):
+    TASKS = "tasks"
+    RECOMMENDATIONS = "recommendations"
+
+class TransferFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+# Exported fields per kind; tasks keep their natural_key so a restored schedule still diffs against its source
+TRANSFER_FIELDS = {
+    TransferKind.TASKS: (*TASK_FIELDS, "natural_key"),
+    TransferKind.RECOMMENDATIONS: AI_RECOMMENDATION_FIELDS,
+}
+IMPORT_BATCH_SIZE = settings.import_batch_size
+IMPORT_MAX_LINE_BYTES = settings.import_max_line_bytes
+IMPORT_MAX_ERRORS = 100
+
+def import_document(kind: TransferKind, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate one imported row against its model, filling defaults the way creating it would"""
+    if kind == TransferKind.RECOMMENDATIONS:
+        return AIRecommendation(**doc).dict()
+    task = Task(**doc).dict()
+    if isinstance(doc.get("natural_key"), str) and doc["natural_key"]:
+        task["natural_key"] = doc["natural_key"]
+    return task
+
+@api_router.get("/export")
+async def export_documents(kind: TransferKind = TransferKind.TASKS, format: TransferFormat = TransferFormat.NDJSON,
+                           user_id: str = Depends(current_user)):
+    """Stream every task or recommendation of the user as NDJSON or CSV.
+
+    Documents are read straight off a storage cursor and written out as the client consumes
+    them, so the dump never has to fit in memory. List fields are JSON arrays in CSV cells.
+    """
+    if kind == TransferKind.TASKS:
+        documents = store.iter_tasks(user_id, fields=TRANSFER_FIELDS[kind])
+    else:
+        documents = store.iter_recommendations(user_id, fields=TRANSFER_FIELDS[kind])
+    return StreamingResponse(
+        encode_documents(documents, format.value, TRANSFER_FIELDS[kind]),
+        media_type=FORMATS[format.value],
+        headers={"Content-Disposition": f'attachment; filename="{kind.value}.{format.value}"'}
+    )
+
+@api_router.post("/import")
+async def import_documents(request: Request, kind: TransferKind = TransferKind.TASKS,
+                           format: TransferFormat = TransferFormat.NDJSON, user_id: str = Depends(current_user)):
+    """Load tasks or recommendations from an NDJSON or CSV request body, as written by /export.
+
+    The body is parsed as it arrives and written in batches of IMPORT_BATCH_SIZE, replacing
+    stored documents with the same id. Rows that fail validation are skipped and reported by
+    line; the rest are still imported.
+    """
+    imported, failed, errors = 0, 0, []
+    batch, batch_lines = [], []
+
+    def fail(line: int, error: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"line": line, "error": error})
+
+    async def flush():
+        nonlocal imported
+        if kind == TransferKind.RECOMMENDATIONS:
+            await store.upsert_recommendations(user_id, batch)
+            write_errors = {}
+        else:
+            write_errors = await store.upsert_tasks(user_id, batch)
+        for index, error in write_errors.items():
+            fail(batch_lines[index], error)
+        imported += len(batch) - len(write_errors)
+        batch.clear()
+        batch_lines.clear()
+
+    async def refresh_derived():
+        if kind == TransferKind.TASKS and imported:
+            await rebuild_rollups(user_id)
+            response_cache.invalidate(user_id)
+            task_events.publish(user_id, "schedule_changed", imported=imported)
+
+    list_fields = ("recommendations", "focus_areas", "priority_tasks") if kind == TransferKind.RECOMMENDATIONS else ()
+    try:
+        async for line, doc, error in decode_documents(request.stream(), format.value, list_fields, IMPORT_MAX_LINE_BYTES):
+            if error is None:
+                try:
+                    doc = import_document(kind, doc)
+                except ValidationError as e:
+                    error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            if error is not None:
+                fail(line, error)
+                continue
+            batch.append(doc)
+            batch_lines.append(line)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        await flush()
+    except Exception as e:
+        # Batches written before a failure stay written, so derived data has to follow them; a
+        # rebuild error is only logged so the response still reports what stopped the import
+        try:
+            await refresh_derived()
+        except Exception as rebuild_error:
+            logging.error(f"Error rebuilding rollups after a failed import: {rebuild_error}")
+        if isinstance(e, LineTooLong):
+            raise HTTPException(status_code=413, detail=str(e))
+        raise http_error(f"Error importing {kind.value}", e)
+
+    try:
+        await refresh_derived()
     except Exception as e:
-        logging.error(f"Error fetching dashboard overview: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(f"Error importing {kind.value}", e)
+
+    return {"kind": kind.value, "imported": imported, "failed": failed, "errors": errors}
+
+@api_router.websocket("/ws")
+async def task_events_socket(websocket: WebSocket, since: Optional[int] = None, epoch: Optional[str] = None):
+    """Push the user's task change events; reconnecting clients pass the epoch and last seq they saw to catch up.
+
+    The user is resolved like current_user does, from the X-User-Id header the auth proxy sets on
+    the upgrade request, never from anything the client controls.
+    """
+    try:
+        user_id = resolve_user_id(websocket.headers.get("x-user-id"))
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    queue = task_events.subscribe(user_id)
+    receiver = asyncio.create_task(websocket.receive_text())
+    try:
+        # Snapshot before the first await so queued events can be told apart from the backlog
+        last_seq = task_events.seq
+        backlog = task_events.replay(user_id, since, epoch)
+        if backlog is None:
+            backlog = [{"type": "resync", "epoch": task_events.epoch, "seq": last_seq}]
+        await websocket.send_bytes(orjson.dumps({"type": "hello", "epoch": task_events.epoch, "seq": last_seq}))
+        for event in backlog:
+            await websocket.send_bytes(orjson.dumps(event))
+        
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                # Clients only listen; any message or a disconnect ends the subscription
+                getter.cancel()
+                break
+            event = getter.result()
+            if event["type"] != "resync" and event["seq"] <= last_seq:
+                continue
+            last_seq = event["seq"]
+            await websocket.send_bytes(orjson.dumps(event))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task_events.unsubscribe(user_id, queue)
+        receiver.cancel()
+
+@api_router.get("/diagnostics/query-plans")
+async def get_query_plans():
+    """Explain each route's query and flag collection scans"""
+    try:
+        plans = await store.check_query_plans()
+        collscans = [p["route"] for p in plans if p["collscan"]]
+        return {"ok": not collscans, "collscans": collscans, "plans": plans}
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise http_error("Error checking query plans", e)
+
+@app.middleware("http")
+async def cache_read_responses(request: Request, call_next):
+    """Serve cached read endpoints and answer matching If-None-Match requests with 304"""
+    if (request.method != "GET" or request.url.path not in CACHED_PATHS
+            or "application/x-ndjson" in request.headers.get("accept", "")):
+        return await call_next(request)
+    
+    # Responses without an explicit date depend on today's date
+    user_id = request.headers.get("x-user-id") or DEFAULT_USER_ID
+    media = "msgpack" if wants_msgpack(request) else "json"
+    key = (user_id, request.url.path, tuple(sorted(request.query_params.multi_items())), media,
+           datetime.now().strftime("%Y-%m-%d"))
+    entry = response_cache.get(key, user_id)
+    RESPONSE_CACHE_REQUESTS.labels("miss" if entry is None else "hit").inc()
+    if entry is None:
+        generation = response_cache.generation_of(user_id)
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {k: v for k, v in response.headers.items() if k in ("content-type", "x-next-cursor", "vary")}
+        headers["ETag"] = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        headers["Cache-Control"] = "no-cache"
+        entry = response_cache.put(key, user_id, body, headers, generation)
+    
+    if _etag_matches(request.headers.get("if-none-match", ""), entry["headers"]["ETag"]):
+        return Response(status_code=304, headers={"ETag": entry["headers"]["ETag"], "Cache-Control": "no-cache"})
+    return Response(content=entry["body"], status_code=200, headers=entry["headers"])
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record per-route latency and status counts, and log the query shapes behind slow requests"""
+    queries = []
+    token = request_queries.set(queries)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        request_queries.reset(token)
+        route = request.scope.get("route")
+        path = route.path if route else (request.url.path if request.url.path in CACHED_PATHS else "unmatched")
+        REQUEST_LATENCY.labels(request.method, path).observe(elapsed)
+        REQUEST_COUNT.labels(request.method, path, str(status)).inc()
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            logger.warning(f"Slow request {request.method} {path} took {elapsed * 1000:.0f}ms "
+                           f"with {len(queries)} Mongo commands: {json.dumps(queries)}")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness probe that also warms up: opens a storage connection and loads the LLM client,
+    so the first real request pays for neither"""
+    started = time.perf_counter()
+    checks = {}
+    if store is None:
+        checks["storage"] = "not started"
+    else:
+        try:
+            await asyncio.wait_for(store.ping(), settings.readiness_timeout_seconds)
+            checks["storage"] = "ok"
+        except Exception as e:
+            checks["storage"] = f"{type(e).__name__}: {e}"
+    try:
+        # Imported on a worker thread so a cold import does not stall the event loop
+        await asyncio.to_thread(llm_classes)
+        checks["llm"] = "ok"
+    except Exception as e:
+        checks["llm"] = f"{type(e).__name__}: {e}"
+    is_ready = all(check == "ok" for check in checks.values())
+    return ORJSONResponse({"ready": is_ready, "checks": checks, "ms": round((time.perf_counter() - started) * 1000, 1)},
+                          status_code=200 if is_ready else 503)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Bound every non-streaming API request, so a degraded Mongo or LLM provider fails requests fast
+# The synchronous AI route waits on the LLM, so it gets the full LLM timeout plus the usual
+# allowance for its storage reads, and clients cannot shorten it
+app.add_middleware(DeadlineMiddleware, timeout_seconds=REQUEST_TIMEOUT_SECONDS, exempt_paths=DEADLINE_EXEMPT_PATHS,
+                   path_timeouts={"/api/ai/recommendations": LLM_TIMEOUT_SECONDS + REQUEST_TIMEOUT_SECONDS})
+
+# Compress bodies above the threshold for clients that accept gzip or brotli
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_bytes)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_origins=settings.cors_origins.split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Configure logging
@@ -436,7 +2146,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
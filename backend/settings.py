@@ -0,0 +1,81 @@
+"""Process settings read from the environment.
+
+Every knob the app reads lives here: the storage engine, the Mongo connection pool and timeouts,
+read retries, request deadlines, the response and LLM caches, the LLM backend and its limits, and
+the prompt context budget. Settings are read once, when server.py is imported; the clients
+themselves are opened in the app's lifespan, inside each worker process.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+class Settings(BaseModel):
+    # STORAGE_ENGINE picks where data lives: mongo (default), memory or sqlite (SQLITE_PATH)
+    storage_engine: str = "mongo"
+    mongo_url: Optional[str] = None
+    db_name: Optional[str] = None
+    sqlite_path: Optional[str] = None
+
+    # Connection pool per worker process. Idle connections are closed after max_idle_time_ms, so
+    # many workers behind a quiet period do not pin connections on the server.
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: Optional[int] = 60000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: Optional[int] = None
+
+    # Idempotent reads are retried on transient errors, backing off from read_retry_base_delay_ms
+    read_retry_attempts: int = 3
+    read_retry_base_delay_ms: int = 50
+
+    # Requests
+    default_user_id: str = "default"
+    request_timeout_seconds: float = 10.0
+    slow_request_ms: float = 500.0
+    readiness_timeout_seconds: float = 5.0
+    cors_origins: str = "*"
+    compression_min_bytes: int = 1024
+    schedule_path: Optional[str] = None
+    import_batch_size: int = 1000
+    import_max_line_bytes: int = 1 << 20
+    response_cache_max_entries: int = 512
+    response_cache_ttl_seconds: float = 60.0
+
+    # LLM_BACKEND=fake swaps in a local stand-in that streams canned replies
+    llm_backend: Optional[str] = None
+    emergent_llm_key: Optional[str] = None
+    llm_model: str = "gpt-4o-mini"
+    llm_timeout_seconds: float = 60.0
+    llm_max_concurrency: int = 8
+    llm_max_queue_depth: int = 32
+    llm_max_sessions: int = 1024
+    llm_breaker_failures: int = 5
+    llm_breaker_reset_seconds: float = 30.0
+    ai_cache_max_hot_entries: int = 256
+    ai_cache_ttl_seconds: float = 86400.0
+
+    # Recommendation prompts are fitted to ai_context_token_budget tokens
+    ai_context_token_budget: int = 1000
+    ai_context_window_days: int = 7
+    ai_context_recommendations: int = 10
+    ai_context_cache_max_entries: int = 1024
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Each field from the environment variable of its name in upper case; unset or empty keeps the default"""
+        values = {name: os.environ.get(name.upper()) for name in cls.model_fields}
+        return cls(**{name: value for name, value in values.items() if value not in (None, "")})
+
+    def mongo_client_options(self) -> Dict[str, Any]:
+        """Keyword arguments for AsyncIOMotorClient"""
+        options = {
+            "maxPoolSize": self.mongo_max_pool_size,
+            "minPoolSize": self.mongo_min_pool_size,
+            "maxIdleTimeMS": self.mongo_max_idle_time_ms,
+            "connectTimeoutMS": self.mongo_connect_timeout_ms,
+            "serverSelectionTimeoutMS": self.mongo_server_selection_timeout_ms,
+            "socketTimeoutMS": self.mongo_socket_timeout_ms,
+        }
+        return {name: value for name, value in options.items() if value is not None}
@@ -0,0 +1,1405 @@
+"""Storage engines for the dashboard API.
+
+server.py talks to a Storage instead of a Motor database, so the same routes run against MongoDB,
+an indexed in-memory engine (tests, benchmarks and single-process deployments) or SQLite
+(single-node deployments). Every engine returns plain dicts without Mongo's _id, and task
+listings are always ordered by (date, id) so keyset cursors behave the same everywhere.
+Search results are the exception: they are ordered by relevance score, then id.
+
+All user data is partitioned by user_id: every task, rollup, recommendation, job and schedule
+source carries it, every read and write is scoped to one user, and every index leads with it.
+"""
+import asyncio
+import bisect
+import heapq
+import os
+import re
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT, ReturnDocument, UpdateOne, DeleteMany, ReplaceOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from resilience import deadline_at, retry
+
+AI_CACHE_TTL_SECONDS = int(os.environ.get('AI_CACHE_TTL_SECONDS', 86400))
+AI_JOB_TTL_SECONDS = int(os.environ.get('AI_JOB_TTL_SECONDS', 86400))
+
+TASK_SORT = [("date", ASCENDING), ("id", ASCENDING)]
+
+# Task fields covered by full-text search and how much a matching term counts in each
+SEARCH_WEIGHTS = {"description": 2, "phase": 1}
+_SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def search_terms(text: str) -> List[str]:
+    """Lowercased word tokens in first-seen order, split the way every engine's index splits them"""
+    return list(dict.fromkeys(_SEARCH_TOKEN_RE.findall((text or "").lower())))
+
+def _plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+def _normalize(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Store enum members as their values, the way BSON encodes them"""
+    return {k: _plain(v) for k, v in doc.items()}
+
+def _project(doc: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return {k: v for k, v in doc.items() if k != "_id"}
+    return {k: doc[k] for k in fields if k in doc}
+
+def _increment(doc: Dict[str, Any], path: str, amount: int):
+    """Apply a Mongo-style $inc on a dotted path"""
+    *parents, leaf = path.split(".")
+    for key in parents:
+        doc = doc.setdefault(key, {})
+    doc[leaf] = doc.get(leaf, 0) + amount
+
+class Storage(ABC):
+    """Repository interface for tasks, progress rollups, recommendations and AI bookkeeping.
+
+    Every call is scoped to one user_id. Task filters are field equality matches; `after` is a
+    (date, id) keyset position and `fields` limits the returned keys. Engines must implement every
+    abstract method; the rest have defaults that suit engines without the feature.
+    """
+    name = "storage"
+
+    # Tasks
+    @abstractmethod
+    def iter_tasks(self, user_id: str, filters: Optional[Dict[str, Any]] = None, after: Optional[Tuple[str, str]] = None,
+                   fields: Optional[Iterable[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_tasks(self, user_id: str, filters: Optional[Dict[str, Any]] = None, after: Optional[Tuple[str, str]] = None,
+                         limit: Optional[int] = None, fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_tasks(self, user_id: str, task_ids: Iterable[str], fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_tasks_between(self, user_id: str, start: str, end: str,
+                                 fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Tasks dated from `start` to `end` inclusive, ordered by (date, id)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_tasks(self, user_id: str, tasks: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert_tasks(self, user_id: str, tasks: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Insert tasks or replace the stored ones with the same id; return error messages by task index"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_task(self, user_id: str, task_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Set fields on a task and return the task as it was before, or None if it does not exist"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_tasks(self, user_id: str, updates: List[Tuple[str, Dict[str, Any]]], ordered: bool = True) -> Dict[int, str]:
+        """Apply (id, fields) updates and return error messages by update index"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def write_schedule(self, user_id: str, inserts: List[Dict[str, Any]], updates: List[Tuple[str, Dict[str, Any]]],
+                             deletes: List[str]):
+        """Apply one batch of a schedule diff; inserts are skipped if their natural_key already exists"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def search_tasks(self, user_id: str, terms: List[str], filters: Optional[Dict[str, Any]] = None,
+                           after: Optional[Tuple[float, str]] = None, limit: Optional[int] = None,
+                           fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Tasks matching any of the search terms, each with its relevance `score`.
+
+        Ordered by score descending, then id; `after` is the (score, id) of the last task seen.
+        Scores are engine specific and only comparable within one engine.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def task_status_groups(self, user_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Task counts grouped by week_number, phase, date and category, with the completed count"""
+        raise NotImplementedError
+
+    # Progress rollups
+    @abstractmethod
+    async def find_rollups(self, user_id: str, kinds: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def replace_rollups(self, user_id: str, rollups: Dict[str, Dict[str, Any]]):
+        """Replace every stored rollup of the user with the given documents, keyed by rollup id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def increment_rollups(self, user_id: str, increments: Dict[str, Dict[str, int]]):
+        """Add to dotted counter paths per rollup id"""
+        raise NotImplementedError
+
+    # Completion history, one document per day tasks were completed on
+    @abstractmethod
+    async def find_completion_days(self, user_id: str, start: Optional[str] = None,
+                                   end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Days from `start` to `end` inclusive (open ended when omitted), ordered by date"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def replace_completion_days(self, user_id: str, days: Dict[str, Dict[str, Any]]):
+        """Replace the user's completion history with the given documents, keyed by date"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def increment_completion_days(self, user_id: str, increments: Dict[str, Dict[str, int]]):
+        """Add to dotted counter paths per date, creating the days that do not exist yet"""
+        raise NotImplementedError
+
+    # AI recommendations, jobs and the response cache
+    @abstractmethod
+    async def insert_recommendation(self, user_id: str, recommendation: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def recent_recommendations(self, user_id: str, limit: int, fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_recommendations(self, user_id: str, fields: Optional[Iterable[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Every recommendation of the user, oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert_recommendations(self, user_id: str, recommendations: List[Dict[str, Any]]):
+        """Insert recommendations or replace the stored ones with the same id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_job(self, user_id: str, job: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_job(self, user_id: str, job_id: str, fields: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_job(self, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_cached_response(self, key: str) -> Optional[str]:
+        """Completions are keyed by their full prompt, so the cache is shared between users"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def put_cached_response(self, key: str, text: str):
+        raise NotImplementedError
+
+    # Schedule sources
+    @abstractmethod
+    async def latest_schedule_source(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def record_schedule_source(self, user_id: str, source_hash: str, source: Dict[str, Any]):
+        """Store a source under its content hash and mark it as the user's latest one"""
+        raise NotImplementedError
+
+    # Lifecycle
+    async def ping(self):
+        """Round trip to the backing store, opening its connection if it is not open yet"""
+
+    async def ensure_indexes(self) -> Dict[str, Any]:
+        return {}
+
+    async def claim_unowned(self, user_id: str) -> int:
+        """Assign data written before partitioning to user_id; returns the number of tasks claimed"""
+        return 0
+
+    async def check_query_plans(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError(f"Query plans are not available on the {self.name} engine")
+
+    def is_transient(self, error: BaseException) -> bool:
+        """Whether `error` may go away if the same call is simply made again"""
+        return False
+
+    @abstractmethod
+    async def drop(self):
+        """Delete everything; used by benchmarks"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+# MongoDB
+# Declared indexes per collection, shaped after the filters and sorts the routes actually run.
+# Every index on user data leads with user_id, so each query stays within one user's keys.
+INDEX_SPECS = {
+    "tasks": [
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], name="user_id_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("natural_key", ASCENDING)], name="user_id_natural_key_unique", unique=True,
+                   partialFilterExpression={"natural_key": {"$exists": True}}),
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("status", ASCENDING)], name="user_id_date_status"),
+        IndexModel([("user_id", ASCENDING), ("week_number", ASCENDING), ("category", ASCENDING)], name="user_id_week_number_category"),
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], name="user_id_date_id"),
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], name="user_id_category_date_id"),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)], name="user_id_status_date_id"),
+        # Prefixed by user_id, so every $text query must also match one user_id
+        IndexModel([("user_id", ASCENDING), ("description", TEXT), ("phase", TEXT)], name="user_id_description_phase_text",
+                   weights=SEARCH_WEIGHTS),
+    ],
+    "ai_recommendations": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at_desc"),
+    ],
+    "ai_response_cache": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=AI_CACHE_TTL_SECONDS),
+    ],
+    "ai_jobs": [
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], name="user_id_id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=AI_JOB_TTL_SECONDS),
+    ],
+    "progress_rollups": [
+        IndexModel([("user_id", ASCENDING), ("kind", ASCENDING), ("week_number", ASCENDING)], name="user_id_kind_week_number"),
+    ],
+    "completion_days": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_id_date_unique", unique=True),
+    ],
+    "schedule_sources": [
+        IndexModel([("user_id", ASCENDING), ("latest", ASCENDING)], name="user_id_latest"),
+    ],
+}
+
+# Shard keys for a sharded cluster (sh.shardCollection(f"{db}.{collection}", key)). Every unique
+# index above is prefixed by its collection's shard key, as sharding requires; the shared response
+# cache has no owner and spreads by its hashed prompt key instead.
+SHARD_KEYS = {
+    "tasks": {"user_id": 1},
+    "progress_rollups": {"user_id": 1},
+    "completion_days": {"user_id": 1},
+    "ai_recommendations": {"user_id": 1},
+    "ai_jobs": {"user_id": 1},
+    "schedule_sources": {"user_id": 1},
+    "ai_response_cache": {"_id": "hashed"},
+}
+
+# Collections holding per-user data, claimed for the default user when upgrading older databases
+USER_COLLECTIONS = ("tasks", "ai_recommendations", "ai_jobs")
+
+def _index_key(key: Iterable[Tuple[str, Any]], weights: Optional[Dict[str, Any]]) -> list:
+    """Comparable key pattern; a text index reports its fields as weights behind _fts/_ftsx keys"""
+    pattern = [(field, direction if isinstance(direction, str) else int(direction)) for field, direction in key
+               if direction != TEXT and field not in ("_fts", "_ftsx")]
+    return pattern + sorted((field, int(weight)) for field, weight in (weights or {}).items())
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of an explain() winning plan"""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+# Query shapes issued by the routes, used by the query plan check
+ROUTE_QUERIES = [
+    {"route": "GET /api/tasks?category", "collection": "tasks", "filter": {"user_id": "default", "category": "DSA"}, "sort": TASK_SORT},
+    {"route": "GET /api/tasks?status", "collection": "tasks", "filter": {"user_id": "default", "status": "COMPLETED"}, "sort": TASK_SORT},
+    {"route": "GET /api/tasks?week", "collection": "tasks", "filter": {"user_id": "default", "week_number": 1}, "sort": TASK_SORT},
+    {"route": "GET /api/tasks?date", "collection": "tasks", "filter": {"user_id": "default", "date": "2025-09-22"}, "sort": TASK_SORT},
+    {"route": "GET /api/tasks?week&category", "collection": "tasks",
+     "filter": {"user_id": "default", "week_number": 1, "category": "DSA"}, "sort": TASK_SORT},
+    {"route": "PUT /api/tasks/{task_id}", "collection": "tasks",
+     "filter": {"user_id": "default", "id": "00000000-0000-0000-0000-000000000000"}, "sort": None},
+    {"route": "GET /api/tasks/calendar", "collection": "tasks",
+     "filter": {"user_id": "default", "date": {"$gte": "2025-09-01", "$lte": "2025-10-12"}}, "sort": TASK_SORT},
+    {"route": "GET /api/progress/completions", "collection": "completion_days",
+     "filter": {"user_id": "default", "date": {"$gte": "2025-09-01", "$lte": "2025-09-30"}}, "sort": [("date", ASCENDING)]},
+    {"route": "GET /api/tasks/search", "collection": "tasks",
+     "filter": {"user_id": "default", "$text": {"$search": "graph"}}, "sort": None},
+    {"route": "GET /api/progress/daily", "collection": "tasks", "filter": {"user_id": "default", "date": "2025-09-22"}, "sort": None},
+    {"route": "GET /api/progress/weekly", "collection": "progress_rollups", "filter": {"user_id": "default", "kind": "week"}, "sort": None},
+    {"route": "GET /api/ai/recommendations/history", "collection": "ai_recommendations",
+     "filter": {"user_id": "default"}, "sort": [("created_at", -1)]},
+]
+
+class MotorStorage(Storage):
+    """MongoDB through Motor"""
+    name = "mongo"
+
+    def __init__(self, db, logger=None):
+        self.db = db
+        self.logger = logger
+
+    @staticmethod
+    def _projection(fields: Optional[Iterable[str]]) -> Dict[str, int]:
+        return {"_id": 0, **({field: 1 for field in fields} if fields is not None else {})}
+
+    @staticmethod
+    def _task_query(user_id: str, filters: Optional[Dict[str, Any]], after: Optional[Tuple[str, str]]) -> Dict[str, Any]:
+        query = {**(filters or {}), "user_id": user_id}
+        if after is not None:
+            date, task_id = after
+            query["$or"] = [{"date": {"$gt": date}}, {"date": date, "id": {"$gt": task_id}}]
+        return query
+
+    async def iter_tasks(self, user_id, filters=None, after=None, fields=None):
+        cursor = self.db.tasks.find(self._task_query(user_id, filters, after), self._projection(fields)).sort(TASK_SORT)
+        async for task in cursor.batch_size(500):
+            yield task
+
+    async def find_tasks(self, user_id, filters=None, after=None, limit=None, fields=None):
+        cursor = self.db.tasks.find(self._task_query(user_id, filters, after), self._projection(fields)).sort(TASK_SORT)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(limit)
+
+    async def find_tasks_between(self, user_id, start, end, fields=None):
+        query = {"user_id": user_id, "date": {"$gte": start, "$lte": end}}
+        return await self.db.tasks.find(query, self._projection(fields)).sort(TASK_SORT).to_list(None)
+
+    async def get_tasks(self, user_id, task_ids, fields=None):
+        query = {"user_id": user_id, "id": {"$in": list(task_ids)}}
+        return await self.db.tasks.find(query, self._projection(fields)).to_list(None)
+
+    async def insert_tasks(self, user_id, tasks):
+        if tasks:
+            await self.db.tasks.insert_many([{**task, "user_id": user_id} for task in tasks], ordered=False)
+
+    async def upsert_tasks(self, user_id, tasks):
+        if not tasks:
+            return {}
+        try:
+            await self.db.tasks.bulk_write(
+                [ReplaceOne({"user_id": user_id, "id": task["id"]}, {**task, "user_id": user_id}, upsert=True) for task in tasks],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            return {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        return {}
+
+    async def update_task(self, user_id, task_id, fields):
+        return await self.db.tasks.find_one_and_update(
+            {"user_id": user_id, "id": task_id}, {"$set": fields},
+            projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+
+    async def update_tasks(self, user_id, updates, ordered=True):
+        if not updates:
+            return {}
+        try:
+            await self.db.tasks.bulk_write(
+                [UpdateOne({"user_id": user_id, "id": task_id}, {"$set": fields}) for task_id, fields in updates],
+                ordered=ordered
+            )
+        except BulkWriteError as e:
+            return {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        return {}
+
+    async def write_schedule(self, user_id, inserts, updates, deletes):
+        operations = [
+            UpdateOne({"user_id": user_id, "natural_key": task["natural_key"]},
+                      {"$setOnInsert": {**task, "user_id": user_id}}, upsert=True)
+            for task in inserts
+        ]
+        operations += [UpdateOne({"user_id": user_id, "id": task_id}, {"$set": fields}) for task_id, fields in updates]
+        if deletes:
+            operations.append(DeleteMany({"user_id": user_id, "id": {"$in": list(deletes)}}))
+        if operations:
+            await self.db.tasks.bulk_write(operations, ordered=False)
+
+    async def search_tasks(self, user_id, terms, filters=None, after=None, limit=None, fields=None):
+        pipeline = [
+            {"$match": {**(filters or {}), "user_id": user_id, "$text": {"$search": " ".join(terms)}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if after is not None:
+            score, task_id = after
+            pipeline.append({"$match": {"$or": [{"score": {"$lt": score}}, {"score": score, "id": {"$gt": task_id}}]}})
+        pipeline.append({"$sort": {"score": -1, "id": 1}})
+        if limit is not None:
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": {**self._projection(fields), **({"score": 1} if fields is not None else {})}})
+        return await self.db.tasks.aggregate(pipeline).to_list(limit)
+
+    async def task_status_groups(self, user_id):
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {
+                "_id": {"week_number": "$week_number", "phase": "$phase", "date": "$date", "category": "$category"},
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}}
+            }}
+        ]
+        async for row in self.db.tasks.aggregate(pipeline):
+            yield {**row["_id"], "total": row["total"], "completed": row["completed"]}
+
+    async def find_rollups(self, user_id, kinds=None):
+        query = {"user_id": user_id}
+        if kinds is not None:
+            query["kind"] = {"$in": list(kinds)}
+        return await self.db.progress_rollups.find(query).to_list(None)
+
+    async def replace_rollups(self, user_id, rollups):
+        if rollups:
+            await self.db.progress_rollups.bulk_write(
+                [ReplaceOne({"_id": rollup_id}, {**doc, "user_id": user_id}, upsert=True) for rollup_id, doc in rollups.items()],
+                ordered=False
+            )
+        await self.db.progress_rollups.delete_many({"user_id": user_id, "_id": {"$nin": list(rollups)}})
+
+    async def increment_rollups(self, user_id, increments):
+        operations = [
+            UpdateOne({"_id": rollup_id, "user_id": user_id}, {"$inc": counters})
+            for rollup_id, counters in increments.items()
+        ]
+        if operations:
+            await self.db.progress_rollups.bulk_write(operations, ordered=False)
+
+    async def find_completion_days(self, user_id, start=None, end=None):
+        query = {"user_id": user_id}
+        if start is not None or end is not None:
+            query["date"] = {**({"$gte": start} if start else {}), **({"$lte": end} if end else {})}
+        return await self.db.completion_days.find(query, {"_id": 0}).sort("date", ASCENDING).to_list(None)
+
+    async def replace_completion_days(self, user_id, days):
+        await self.db.completion_days.delete_many({"user_id": user_id})
+        if days:
+            await self.db.completion_days.insert_many(
+                [{**doc, "_id": f"{user_id}:{date}", "user_id": user_id, "date": date} for date, doc in days.items()]
+            )
+
+    async def increment_completion_days(self, user_id, increments):
+        operations = [
+            UpdateOne({"_id": f"{user_id}:{date}", "user_id": user_id}, {"$inc": counters, "$setOnInsert": {"date": date}},
+                      upsert=True)
+            for date, counters in increments.items()
+        ]
+        if operations:
+            await self.db.completion_days.bulk_write(operations, ordered=False)
+
+    async def insert_recommendation(self, user_id, recommendation):
+        await self.db.ai_recommendations.insert_one({**recommendation, "user_id": user_id})
+
+    async def recent_recommendations(self, user_id, limit, fields=None):
+        return await self.db.ai_recommendations.find({"user_id": user_id}, self._projection(fields)) \
+            .sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def iter_recommendations(self, user_id, fields=None):
+        cursor = self.db.ai_recommendations.find({"user_id": user_id}, self._projection(fields)).sort("created_at", ASCENDING)
+        async for recommendation in cursor.batch_size(500):
+            yield recommendation
+
+    async def upsert_recommendations(self, user_id, recommendations):
+        if recommendations:
+            await self.db.ai_recommendations.bulk_write(
+                [ReplaceOne({"user_id": user_id, "id": doc["id"]}, {**doc, "user_id": user_id}, upsert=True)
+                 for doc in recommendations],
+                ordered=False
+            )
+
+    async def insert_job(self, user_id, job):
+        await self.db.ai_jobs.insert_one({**job, "user_id": user_id})
+
+    async def update_job(self, user_id, job_id, fields):
+        await self.db.ai_jobs.update_one({"user_id": user_id, "id": job_id}, {"$set": fields})
+
+    async def get_job(self, user_id, job_id):
+        return await self.db.ai_jobs.find_one({"user_id": user_id, "id": job_id}, {"_id": 0})
+
+    async def get_cached_response(self, key):
+        stored = await self.db.ai_response_cache.find_one({"_id": key})
+        return stored["response"] if stored is not None else None
+
+    async def put_cached_response(self, key, text):
+        await self.db.ai_response_cache.update_one(
+            {"_id": key},
+            {"$set": {"response": text, "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def latest_schedule_source(self, user_id):
+        return await self.db.schedule_sources.find_one({"user_id": user_id, "latest": True})
+
+    async def record_schedule_source(self, user_id, source_hash, source):
+        await self.db.schedule_sources.update_many({"user_id": user_id, "latest": True}, {"$set": {"latest": False}})
+        await self.db.schedule_sources.replace_one(
+            {"_id": f"{user_id}:{source_hash}"},
+            {**source, "user_id": user_id, "content_hash": source_hash, "latest": True},
+            upsert=True
+        )
+
+    async def ping(self):
+        await self.db.command("ping")
+
+    def is_transient(self, error):
+        # Network errors and primary elections; timeouts mean the deadline is already spent
+        return isinstance(error, AutoReconnect) and not error.timeout
+
+    async def ensure_indexes(self):
+        """Create missing indexes and drop stale ones so each collection matches INDEX_SPECS"""
+        report = {}
+        for collection_name, specs in INDEX_SPECS.items():
+            collection = self.db[collection_name]
+            existing = await collection.index_information()
+            declared = {spec.document["name"]: spec.document for spec in specs}
+            created, dropped = [], []
+
+            for name, info in existing.items():
+                if name == "_id_":
+                    continue
+                wanted = declared.get(name)
+                same_shape = wanted is not None \
+                    and _index_key(wanted["key"].items(), wanted.get("weights")) == _index_key(info["key"], info.get("weights")) \
+                    and bool(wanted.get("unique")) == bool(info.get("unique")) \
+                    and bool(wanted.get("sparse")) == bool(info.get("sparse")) \
+                    and wanted.get("expireAfterSeconds") == info.get("expireAfterSeconds") \
+                    and dict(wanted.get("partialFilterExpression") or {}) == dict(info.get("partialFilterExpression") or {})
+                if not same_shape:
+                    await collection.drop_index(name)
+                    dropped.append(name)
+
+            missing = [spec for spec in specs if spec.document["name"] not in existing or spec.document["name"] in dropped]
+            if missing:
+                created = await collection.create_indexes(missing)
+
+            report[collection_name] = {"created": created, "dropped": dropped}
+            if (created or dropped) and self.logger:
+                self.logger.info(f"Reconciled indexes on {collection_name}: created={created} dropped={dropped}")
+        return report
+
+    async def claim_unowned(self, user_id):
+        unowned = {"user_id": {"$exists": False}}
+        claimed = 0
+        for collection_name in USER_COLLECTIONS:
+            result = await self.db[collection_name].update_many(unowned, {"$set": {"user_id": user_id}})
+            if collection_name == "tasks":
+                claimed = result.modified_count
+        # Unowned rollups and sources are derived data; rollups are rebuilt and sources re-ingested
+        await self.db.progress_rollups.delete_many(unowned)
+        await self.db.completion_days.delete_many(unowned)
+        await self.db.schedule_sources.delete_many(unowned)
+        return claimed
+
+    async def check_query_plans(self):
+        """Run explain() on each route query and flag any that fall back to a collection scan"""
+        results = []
+        for shape in ROUTE_QUERIES:
+            cursor = self.db[shape["collection"]].find(shape["filter"])
+            if shape["sort"]:
+                cursor = cursor.sort(shape["sort"])
+            explanation = await cursor.explain()
+            stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+            results.append({
+                "route": shape["route"],
+                "collection": shape["collection"],
+                "filter": shape["filter"],
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages
+            })
+        return results
+
+    async def drop(self):
+        await self.db.client.drop_database(self.db.name)
+
+    def close(self):
+        self.db.client.close()
+
+# In-memory
+class MemoryStorage(Storage):
+    """Everything in process memory, with tasks indexed per user by id, date, week and natural key,
+    plus an inverted index of search terms.
+
+    Suited to tests, benchmarks and single-process deployments; nothing survives a restart.
+    """
+    name = "memory"
+
+    def __init__(self, cache_ttl_seconds: float = AI_CACHE_TTL_SECONDS, job_ttl_seconds: float = AI_JOB_TTL_SECONDS):
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.job_ttl_seconds = job_ttl_seconds
+        self._reset()
+
+    def _reset(self):
+        # Tasks are keyed by (user_id, id); the secondary indexes hold ids within a user
+        self._tasks: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._by_user: Dict[str, set] = defaultdict(set)
+        self._by_date: Dict[Tuple[str, str], set] = defaultdict(set)
+        self._by_week: Dict[Tuple[str, int], set] = defaultdict(set)
+        self._by_natural_key: Dict[Tuple[str, str], str] = {}
+        # Search postings: (user_id, term) -> {task id: weighted term frequency}
+        self._by_term: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(dict)
+        self._order: Dict[str, List[Tuple[str, str]]] = {}
+        self._rollups: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        self._completion_days: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        self._completion_dates: Dict[str, List[str]] = defaultdict(list)
+        self._recommendations: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._recommendation_ids: Dict[str, set] = defaultdict(set)
+        self._jobs: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._responses: Dict[str, Tuple[float, str]] = {}
+        self._sources: Dict[str, Dict[str, Any]] = {}
+
+    def _index(self, task: Dict[str, Any]):
+        user_id = task["user_id"]
+        self._by_user[user_id].add(task["id"])
+        self._by_date[(user_id, task["date"])].add(task["id"])
+        self._by_week[(user_id, task["week_number"])].add(task["id"])
+        if task.get("natural_key"):
+            self._by_natural_key[(user_id, task["natural_key"])] = task["id"]
+        for term, weight in self._term_weights(task).items():
+            self._by_term[(user_id, term)][task["id"]] = weight
+        # Re-sorted lazily on the next ordered read, so batch inserts sort once
+        self._order.pop(user_id, None)
+
+    def _unindex(self, task: Dict[str, Any]):
+        user_id = task["user_id"]
+        self._by_user[user_id].discard(task["id"])
+        self._by_date[(user_id, task["date"])].discard(task["id"])
+        self._by_week[(user_id, task["week_number"])].discard(task["id"])
+        if task.get("natural_key"):
+            self._by_natural_key.pop((user_id, task["natural_key"]), None)
+        for term in self._term_weights(task):
+            postings = self._by_term[(user_id, term)]
+            postings.pop(task["id"], None)
+            if not postings:
+                del self._by_term[(user_id, term)]
+        self._order.pop(user_id, None)
+
+    @staticmethod
+    def _term_weights(task: Dict[str, Any]) -> Dict[str, float]:
+        weights = Counter()
+        for field, weight in SEARCH_WEIGHTS.items():
+            for term in _SEARCH_TOKEN_RE.findall(str(task.get(field) or "").lower()):
+                weights[term] += weight
+        return dict(weights)
+
+    def _insert(self, user_id: str, task: Dict[str, Any]):
+        task = {**_normalize(task), "user_id": user_id}
+        task.pop("_id", None)
+        self._tasks[(user_id, task["id"])] = task
+        self._index(task)
+
+    def _delete(self, user_id: str, task_id: str):
+        task = self._tasks.pop((user_id, task_id), None)
+        if task is not None:
+            self._unindex(task)
+
+    def _set(self, task: Dict[str, Any], fields: Dict[str, Any]):
+        reindex = any(key in fields for key in ("date", "week_number", "natural_key", *SEARCH_WEIGHTS))
+        if reindex:
+            self._unindex(task)
+        task.update(_normalize(fields))
+        if reindex:
+            self._index(task)
+
+    def _sorted_keys(self, user_id: str) -> List[Tuple[str, str]]:
+        order = self._order.get(user_id)
+        if order is None:
+            order = self._order[user_id] = sorted(
+                (self._tasks[(user_id, task_id)]["date"], task_id) for task_id in self._by_user.get(user_id, ())
+            )
+        return order
+
+    def _scan(self, user_id, filters, after):
+        filters = _normalize(filters or {})
+        # Narrow to the smallest index the filters allow before checking the remaining fields
+        if "id" in filters:
+            task = self._tasks.get((user_id, filters["id"]))
+            candidates = [(task["date"], task["id"])] if task is not None else []
+        elif "date" in filters:
+            candidates = sorted((filters["date"], task_id) for task_id in self._by_date.get((user_id, filters["date"]), ()))
+        elif "week_number" in filters:
+            candidates = sorted(
+                (self._tasks[(user_id, task_id)]["date"], task_id)
+                for task_id in self._by_week.get((user_id, filters["week_number"]), ())
+            )
+        else:
+            candidates = self._sorted_keys(user_id)
+        start = bisect.bisect_right(candidates, tuple(after)) if after is not None else 0
+        for position in range(start, len(candidates)):
+            task = self._tasks[(user_id, candidates[position][1])]
+            if all(task.get(key) == value for key, value in filters.items()):
+                yield task
+
+    async def iter_tasks(self, user_id, filters=None, after=None, fields=None):
+        for task in self._scan(user_id, filters, after):
+            yield _project(task, fields)
+
+    async def find_tasks(self, user_id, filters=None, after=None, limit=None, fields=None):
+        tasks = []
+        for task in self._scan(user_id, filters, after):
+            if limit is not None and len(tasks) >= limit:
+                break
+            tasks.append(_project(task, fields))
+        return tasks
+
+    async def find_tasks_between(self, user_id, start, end, fields=None):
+        order = self._sorted_keys(user_id)
+        first, last = bisect.bisect_left(order, (start,)), bisect.bisect_right(order, (end, "\uffff"))
+        return [_project(self._tasks[(user_id, task_id)], fields) for _, task_id in order[first:last]]
+
+    async def get_tasks(self, user_id, task_ids, fields=None):
+        found = (self._tasks.get((user_id, task_id)) for task_id in dict.fromkeys(task_ids))
+        return [_project(task, fields) for task in found if task is not None]
+
+    async def insert_tasks(self, user_id, tasks):
+        for task in tasks:
+            self._insert(user_id, task)
+
+    async def upsert_tasks(self, user_id, tasks):
+        errors = {}
+        for index, task in enumerate(tasks):
+            owner = self._by_natural_key.get((user_id, task["natural_key"])) if task.get("natural_key") else None
+            if owner is not None and owner != task["id"]:
+                errors[index] = f"natural_key {task['natural_key']} belongs to task {owner}"
+                continue
+            self._delete(user_id, task["id"])
+            self._insert(user_id, task)
+        return errors
+
+    async def update_task(self, user_id, task_id, fields):
+        task = self._tasks.get((user_id, task_id))
+        if task is None:
+            return None
+        previous = dict(task)
+        self._set(task, fields)
+        return previous
+
+    async def update_tasks(self, user_id, updates, ordered=True):
+        for task_id, fields in updates:
+            task = self._tasks.get((user_id, task_id))
+            if task is not None:
+                self._set(task, fields)
+        return {}
+
+    async def write_schedule(self, user_id, inserts, updates, deletes):
+        for task in inserts:
+            if (user_id, task["natural_key"]) not in self._by_natural_key:
+                self._insert(user_id, task)
+        await self.update_tasks(user_id, updates)
+        for task_id in deletes:
+            self._delete(user_id, task_id)
+
+    async def search_tasks(self, user_id, terms, filters=None, after=None, limit=None, fields=None):
+        # Only the postings of the query terms are touched, so cost follows the matches, not the collection
+        if len(terms) == 1:
+            scores = self._by_term.get((user_id, terms[0]), {})
+        else:
+            scores = Counter()
+            for term in terms:
+                scores.update(self._by_term.get((user_id, term), {}))
+        ranked = ((-score, task_id) for task_id, score in scores.items())
+        if after is not None:
+            position = (-after[0], after[1])
+            ranked = (key for key in ranked if key > position)
+        filters = _normalize(filters or {})
+        if not filters:
+            ranked = heapq.nsmallest(limit, ranked) if limit is not None else sorted(ranked)
+            return [{**_project(self._tasks[(user_id, task_id)], fields), "score": -negative_score}
+                    for negative_score, task_id in ranked]
+        # Popped in rank order, so filters are only checked until the page is full
+        ranked = list(ranked)
+        heapq.heapify(ranked)
+        results = []
+        while ranked and (limit is None or len(results) < limit):
+            negative_score, task_id = heapq.heappop(ranked)
+            task = self._tasks[(user_id, task_id)]
+            if all(task.get(key) == value for key, value in filters.items()):
+                results.append({**_project(task, fields), "score": -negative_score})
+        return results
+
+    async def task_status_groups(self, user_id):
+        totals, completed = Counter(), Counter()
+        for task_id in self._by_user.get(user_id, ()):
+            task = self._tasks[(user_id, task_id)]
+            group = (task["week_number"], task["phase"], task["date"], task["category"])
+            totals[group] += 1
+            completed[group] += task["status"] == "COMPLETED"
+        for (week_number, phase, date, category), total in totals.items():
+            yield {"week_number": week_number, "phase": phase, "date": date, "category": category,
+                   "total": total, "completed": completed[(week_number, phase, date, category)]}
+
+    async def find_rollups(self, user_id, kinds=None):
+        kinds = set(kinds) if kinds is not None else None
+        return [
+            orjson.loads(orjson.dumps(doc)) for doc in self._rollups.get(user_id, {}).values()
+            if kinds is None or doc["kind"] in kinds
+        ]
+
+    async def replace_rollups(self, user_id, rollups):
+        self._rollups[user_id] = {
+            rollup_id: orjson.loads(orjson.dumps({**doc, "user_id": user_id})) for rollup_id, doc in rollups.items()
+        }
+
+    async def increment_rollups(self, user_id, increments):
+        for rollup_id, counters in increments.items():
+            doc = self._rollups.get(user_id, {}).get(rollup_id)
+            if doc is None:
+                continue
+            for path, amount in counters.items():
+                _increment(doc, path, amount)
+
+    async def find_completion_days(self, user_id, start=None, end=None):
+        dates = self._completion_dates.get(user_id, [])
+        first = bisect.bisect_left(dates, start) if start else 0
+        last = bisect.bisect_right(dates, end) if end else len(dates)
+        days = self._completion_days[user_id]
+        return [orjson.loads(orjson.dumps(days[date])) for date in dates[first:last]]
+
+    async def replace_completion_days(self, user_id, days):
+        self._completion_days[user_id] = {
+            date: orjson.loads(orjson.dumps({**doc, "user_id": user_id, "date": date})) for date, doc in days.items()
+        }
+        self._completion_dates[user_id] = sorted(days)
+
+    async def increment_completion_days(self, user_id, increments):
+        days = self._completion_days[user_id]
+        for date, counters in increments.items():
+            if date not in days:
+                days[date] = {"user_id": user_id, "date": date}
+                bisect.insort(self._completion_dates[user_id], date)
+            for path, amount in counters.items():
+                _increment(days[date], path, amount)
+
+    async def insert_recommendation(self, user_id, recommendation):
+        self._recommendations[user_id].append({**_normalize(recommendation), "user_id": user_id})
+        self._recommendation_ids[user_id].add(recommendation["id"])
+
+    async def recent_recommendations(self, user_id, limit, fields=None):
+        if limit <= 0:
+            return []
+        return [_project(doc, fields) for doc in reversed(self._recommendations.get(user_id, [])[-limit:])]
+
+    async def iter_recommendations(self, user_id, fields=None):
+        stored = self._recommendations.get(user_id, [])
+        for position in range(len(stored)):
+            yield _project(stored[position], fields)
+
+    async def upsert_recommendations(self, user_id, recommendations):
+        stored, ids = self._recommendations[user_id], self._recommendation_ids[user_id]
+        incoming = {doc["id"]: {**_normalize(doc), "user_id": user_id} for doc in recommendations}
+        if incoming.keys() & ids:
+            stored[:] = [incoming.pop(doc["id"]) if doc["id"] in incoming else doc for doc in stored]
+        added = sorted(incoming.values(), key=lambda doc: doc["created_at"])
+        ids.update(incoming)
+        # Kept oldest first; restoring an older history than the stored one needs a re-sort
+        out_of_order = added and stored and added[0]["created_at"] < stored[-1]["created_at"]
+        stored.extend(added)
+        if out_of_order:
+            stored.sort(key=lambda doc: doc["created_at"])
+
+    async def insert_job(self, user_id, job):
+        self._jobs[(user_id, job["id"])] = (time.time(), {**_normalize(job), "user_id": user_id})
+
+    async def update_job(self, user_id, job_id, fields):
+        if (user_id, job_id) in self._jobs:
+            self._jobs[(user_id, job_id)][1].update(_normalize(fields))
+
+    async def get_job(self, user_id, job_id):
+        created, job = self._jobs.get((user_id, job_id), (0, None))
+        if job is None or time.time() - created > self.job_ttl_seconds:
+            self._jobs.pop((user_id, job_id), None)
+            return None
+        return dict(job)
+
+    async def get_cached_response(self, key):
+        created, text = self._responses.get(key, (0, None))
+        if text is None or time.time() - created > self.cache_ttl_seconds:
+            self._responses.pop(key, None)
+            return None
+        return text
+
+    async def put_cached_response(self, key, text):
+        self._responses[key] = (time.time(), text)
+
+    async def latest_schedule_source(self, user_id):
+        source = self._sources.get(user_id)
+        return dict(source) if source is not None else None
+
+    async def record_schedule_source(self, user_id, source_hash, source):
+        # Only the latest source per user is ever read back
+        self._sources[user_id] = {
+            "_id": f"{user_id}:{source_hash}", **source, "user_id": user_id, "content_hash": source_hash, "latest": True
+        }
+
+    async def drop(self):
+        self._reset()
+
+# SQLite
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    user_id TEXT NOT NULL, id TEXT NOT NULL, natural_key TEXT, date TEXT NOT NULL, week_number INTEGER NOT NULL,
+    phase TEXT NOT NULL, category TEXT NOT NULL, status TEXT NOT NULL, doc BLOB NOT NULL,
+    PRIMARY KEY (user_id, id), UNIQUE (user_id, natural_key)
+);
+CREATE INDEX IF NOT EXISTS tasks_user_id_date_id ON tasks (user_id, date, id);
+CREATE INDEX IF NOT EXISTS tasks_user_id_week_number_category ON tasks (user_id, week_number, category);
+CREATE INDEX IF NOT EXISTS tasks_user_id_category_date_id ON tasks (user_id, category, date, id);
+CREATE INDEX IF NOT EXISTS tasks_user_id_status_date_id ON tasks (user_id, status, date, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_search USING fts5(
+    description, phase, tokenize = 'unicode61 remove_diacritics 0'
+);
+CREATE TRIGGER IF NOT EXISTS tasks_search_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_search (rowid, description, phase)
+    VALUES (new.rowid, json_extract(CAST(new.doc AS TEXT), '$.description'), new.phase);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_search_update AFTER UPDATE OF doc ON tasks BEGIN
+    UPDATE tasks_search SET description = json_extract(CAST(new.doc AS TEXT), '$.description'), phase = new.phase
+    WHERE rowid = new.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_search_delete AFTER DELETE ON tasks BEGIN
+    DELETE FROM tasks_search WHERE rowid = old.rowid;
+END;
+CREATE TABLE IF NOT EXISTS progress_rollups (
+    user_id TEXT NOT NULL, id TEXT NOT NULL, kind TEXT NOT NULL, doc BLOB NOT NULL, PRIMARY KEY (user_id, id)
+);
+CREATE TABLE IF NOT EXISTS completion_days (
+    user_id TEXT NOT NULL, date TEXT NOT NULL, doc BLOB NOT NULL, PRIMARY KEY (user_id, date)
+);
+CREATE TABLE IF NOT EXISTS ai_recommendations (
+    user_id TEXT NOT NULL, id TEXT NOT NULL, created_at TEXT NOT NULL, doc BLOB NOT NULL, PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS ai_recommendations_user_id_created_at ON ai_recommendations (user_id, created_at);
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    user_id TEXT NOT NULL, id TEXT NOT NULL, created REAL NOT NULL, doc BLOB NOT NULL, PRIMARY KEY (user_id, id)
+);
+CREATE TABLE IF NOT EXISTS ai_response_cache (key TEXT PRIMARY KEY, created REAL NOT NULL, response TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS schedule_sources (
+    user_id TEXT NOT NULL, hash TEXT NOT NULL, latest INTEGER NOT NULL, doc BLOB NOT NULL, PRIMARY KEY (user_id, hash)
+);
+"""
+
+@contextmanager
+def _transaction(conn):
+    conn.execute("BEGIN")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+# Task fields with their own column, filterable and kept in sync with the JSON document
+SQLITE_TASK_COLUMNS = ("user_id", "id", "natural_key", "date", "week_number", "phase", "category", "status")
+
+class SqliteStorage(Storage):
+    """A single SQLite file, for single-node deployments.
+
+    Documents are stored as JSON next to the columns that are filtered on, and an FTS5 table
+    that triggers keep in sync with the tasks table serves search. The stdlib driver is
+    blocking, so every call runs on one dedicated thread, which also serializes access to the
+    connection. Datetimes come back as ISO strings.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, cache_ttl_seconds: float = AI_CACHE_TTL_SECONDS,
+                 job_ttl_seconds: float = AI_JOB_TTL_SECONDS):
+        self.path = path
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.job_ttl_seconds = job_ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SQLITE_SCHEMA)
+        return self._connection
+
+    async def _run(self, func, *args):
+        # Queries still running at the caller's deadline are interrupted
+        deadline = deadline_at()
+
+        def call():
+            conn = self._connect()
+            if deadline is None:
+                return func(conn, *args)
+            conn.set_progress_handler(lambda: time.monotonic() >= deadline, 1000)
+            try:
+                return func(conn, *args)
+            except sqlite3.OperationalError as e:
+                if str(e) == "interrupted":
+                    raise TimeoutError("SQLite query interrupted at the request deadline") from e
+                raise
+            finally:
+                conn.set_progress_handler(None, 0)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    @staticmethod
+    def _task_row(user_id: str, task: Dict[str, Any]) -> tuple:
+        task = {**_normalize(task), "user_id": user_id}
+        task.pop("_id", None)
+        return tuple(task.get(column) for column in SQLITE_TASK_COLUMNS) + (orjson.dumps(task),)
+
+    @staticmethod
+    def _where(user_id: str, filters: Optional[Dict[str, Any]], after: Optional[Tuple[str, str]],
+               table: str = "") -> Tuple[str, list]:
+        prefix = f"{table}." if table else ""
+        clauses, params = [f"{prefix}user_id = ?"], [user_id]
+        for key, value in _normalize(filters or {}).items():
+            if key not in SQLITE_TASK_COLUMNS:
+                raise ValueError(f"Cannot filter tasks on {key}")
+            clauses.append(f"{prefix}{key} = ?")
+            params.append(value)
+        if after is not None:
+            clauses.append("(date, id) > (?, ?)")
+            params.extend(after)
+        return " WHERE " + " AND ".join(clauses), params
+
+    async def iter_tasks(self, user_id, filters=None, after=None, fields=None, batch_size=500):
+        # Pages of keyset reads, so a long iteration never holds the connection
+        while True:
+            page = await self.find_tasks(user_id, filters, after, batch_size)
+            for task in page:
+                yield _project(task, fields)
+            if len(page) < batch_size:
+                return
+            after = (page[-1]["date"], page[-1]["id"])
+
+    async def find_tasks(self, user_id, filters=None, after=None, limit=None, fields=None):
+        where, params = self._where(user_id, filters, after)
+        sql = f"SELECT doc FROM tasks{where} ORDER BY date, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        return [_project(orjson.loads(doc), fields) for (doc,) in rows]
+
+    async def find_tasks_between(self, user_id, start, end, fields=None):
+        sql = "SELECT doc FROM tasks WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date, id"
+        rows = await self._run(lambda conn: conn.execute(sql, (user_id, start, end)).fetchall())
+        return [_project(orjson.loads(doc), fields) for (doc,) in rows]
+
+    async def get_tasks(self, user_id, task_ids, fields=None):
+        task_ids = list(dict.fromkeys(task_ids))
+
+        def select(conn):
+            rows = []
+            for start in range(0, len(task_ids), 500):
+                chunk = task_ids[start:start + 500]
+                sql = f"SELECT doc FROM tasks WHERE user_id = ? AND id IN ({','.join('?' * len(chunk))})"
+                rows.extend(conn.execute(sql, [user_id, *chunk]).fetchall())
+            return rows
+        return [_project(orjson.loads(doc), fields) for (doc,) in await self._run(select)]
+
+    def _insert_rows(self, conn, user_id, tasks, or_ignore=False):
+        verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+        placeholders = ",".join("?" * (len(SQLITE_TASK_COLUMNS) + 1))
+        conn.executemany(
+            f"{verb} INTO tasks ({','.join(SQLITE_TASK_COLUMNS)}, doc) VALUES ({placeholders})",
+            [self._task_row(user_id, task) for task in tasks]
+        )
+
+    def _update_rows(self, conn, user_id, updates):
+        assignments = ", ".join(f"{column} = ?" for column in SQLITE_TASK_COLUMNS[2:])
+        for task_id, fields in updates:
+            row = conn.execute("SELECT doc FROM tasks WHERE user_id = ? AND id = ?", (user_id, task_id)).fetchone()
+            if row is None:
+                continue
+            columns = self._task_row(user_id, {**orjson.loads(row[0]), **_normalize(fields)})
+            conn.execute(f"UPDATE tasks SET {assignments}, doc = ? WHERE user_id = ? AND id = ?",
+                         columns[2:] + (user_id, task_id))
+
+    async def insert_tasks(self, user_id, tasks):
+        def insert(conn):
+            with _transaction(conn):
+                self._insert_rows(conn, user_id, tasks)
+        await self._run(insert)
+
+    async def upsert_tasks(self, user_id, tasks):
+        placeholders = ",".join("?" * (len(SQLITE_TASK_COLUMNS) + 1))
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in (*SQLITE_TASK_COLUMNS[2:], "doc"))
+        sql = (f"INSERT INTO tasks ({','.join(SQLITE_TASK_COLUMNS)}, doc) VALUES ({placeholders}) "
+               f"ON CONFLICT (user_id, id) DO UPDATE SET {assignments}")
+
+        def upsert(conn):
+            errors = {}
+            with _transaction(conn):
+                for index, task in enumerate(tasks):
+                    try:
+                        conn.execute(sql, self._task_row(user_id, task))
+                    except sqlite3.IntegrityError as e:
+                        errors[index] = str(e)
+            return errors
+        return await self._run(upsert)
+
+    async def update_task(self, user_id, task_id, fields):
+        def update(conn):
+            with _transaction(conn):
+                row = conn.execute("SELECT doc FROM tasks WHERE user_id = ? AND id = ?", (user_id, task_id)).fetchone()
+                if row is None:
+                    return None
+                self._update_rows(conn, user_id, [(task_id, fields)])
+                return orjson.loads(row[0])
+        return await self._run(update)
+
+    async def update_tasks(self, user_id, updates, ordered=True):
+        def update(conn):
+            with _transaction(conn):
+                self._update_rows(conn, user_id, updates)
+        await self._run(update)
+        return {}
+
+    async def write_schedule(self, user_id, inserts, updates, deletes):
+        def write(conn):
+            with _transaction(conn):
+                self._insert_rows(conn, user_id, inserts, or_ignore=True)
+                self._update_rows(conn, user_id, updates)
+                conn.executemany("DELETE FROM tasks WHERE user_id = ? AND id = ?", [(user_id, task_id) for task_id in deletes])
+        await self._run(write)
+
+    async def search_tasks(self, user_id, terms, filters=None, after=None, limit=None, fields=None):
+        if not terms:
+            return []
+        where, params = self._where(user_id, filters, None, table="tasks")
+        weights = ", ".join(str(float(weight)) for weight in SEARCH_WEIGHTS.values())
+        # bm25() is lower for better matches; negated so scores rank descending like the other engines
+        sql = (f"SELECT doc, score FROM (SELECT tasks.doc AS doc, tasks.id AS id, -bm25(tasks_search, {weights}) AS score "
+               f"FROM tasks_search JOIN tasks ON tasks.rowid = tasks_search.rowid{where} AND tasks_search MATCH ?)")
+        params.append(" OR ".join(f'"{term}"' for term in terms))
+        if after is not None:
+            sql += " WHERE score < ? OR (score = ? AND id > ?)"
+            params.extend([after[0], after[0], after[1]])
+        sql += " ORDER BY score DESC, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        return [{**_project(orjson.loads(doc), fields), "score": score} for doc, score in rows]
+
+    async def task_status_groups(self, user_id):
+        sql = ("SELECT week_number, phase, date, category, COUNT(*), SUM(status = 'COMPLETED') "
+               "FROM tasks WHERE user_id = ? GROUP BY week_number, phase, date, category")
+        rows = await self._run(lambda conn: conn.execute(sql, (user_id,)).fetchall())
+        for week_number, phase, date, category, total, completed in rows:
+            yield {"week_number": week_number, "phase": phase, "date": date, "category": category,
+                   "total": total, "completed": completed}
+
+    async def find_rollups(self, user_id, kinds=None):
+        sql, params = "SELECT doc FROM progress_rollups WHERE user_id = ?", [user_id]
+        if kinds is not None:
+            kinds = list(kinds)
+            sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+        return [orjson.loads(doc) for (doc,) in await self._run(lambda conn: conn.execute(sql, params).fetchall())]
+
+    async def replace_rollups(self, user_id, rollups):
+        def replace(conn):
+            with _transaction(conn):
+                conn.execute("DELETE FROM progress_rollups WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO progress_rollups (user_id, id, kind, doc) VALUES (?, ?, ?, ?)",
+                    [(user_id, rollup_id, doc["kind"], orjson.dumps({**doc, "user_id": user_id}))
+                     for rollup_id, doc in rollups.items()]
+                )
+        await self._run(replace)
+
+    async def increment_rollups(self, user_id, increments):
+        def increment(conn):
+            with _transaction(conn):
+                for rollup_id, counters in increments.items():
+                    row = conn.execute("SELECT doc FROM progress_rollups WHERE user_id = ? AND id = ?",
+                                       (user_id, rollup_id)).fetchone()
+                    if row is None:
+                        continue
+                    doc = orjson.loads(row[0])
+                    for path, amount in counters.items():
+                        _increment(doc, path, amount)
+                    conn.execute("UPDATE progress_rollups SET doc = ? WHERE user_id = ? AND id = ?",
+                                 (orjson.dumps(doc), user_id, rollup_id))
+        await self._run(increment)
+
+    async def find_completion_days(self, user_id, start=None, end=None):
+        sql, params = "SELECT doc FROM completion_days WHERE user_id = ?", [user_id]
+        if start:
+            sql += " AND date >= ?"
+            params.append(start)
+        if end:
+            sql += " AND date <= ?"
+            params.append(end)
+        sql += " ORDER BY date"
+        return [orjson.loads(doc) for (doc,) in await self._run(lambda conn: conn.execute(sql, params).fetchall())]
+
+    async def replace_completion_days(self, user_id, days):
+        def replace(conn):
+            with _transaction(conn):
+                conn.execute("DELETE FROM completion_days WHERE user_id = ?", (user_id,))
+                conn.executemany(
+                    "INSERT INTO completion_days (user_id, date, doc) VALUES (?, ?, ?)",
+                    [(user_id, date, orjson.dumps({**doc, "user_id": user_id, "date": date})) for date, doc in days.items()]
+                )
+        await self._run(replace)
+
+    async def increment_completion_days(self, user_id, increments):
+        def increment(conn):
+            with _transaction(conn):
+                for date, counters in increments.items():
+                    row = conn.execute("SELECT doc FROM completion_days WHERE user_id = ? AND date = ?",
+                                       (user_id, date)).fetchone()
+                    doc = orjson.loads(row[0]) if row else {"user_id": user_id, "date": date}
+                    for path, amount in counters.items():
+                        _increment(doc, path, amount)
+                    conn.execute("INSERT OR REPLACE INTO completion_days (user_id, date, doc) VALUES (?, ?, ?)",
+                                 (user_id, date, orjson.dumps(doc)))
+        await self._run(increment)
+
+    async def insert_recommendation(self, user_id, recommendation):
+        doc = {**_normalize(recommendation), "user_id": user_id}
+        await self._run(lambda conn: conn.execute(
+            "INSERT INTO ai_recommendations (user_id, id, created_at, doc) VALUES (?, ?, ?, ?)",
+            (user_id, doc["id"], doc["created_at"].isoformat(), orjson.dumps(doc))
+        ))
+
+    async def recent_recommendations(self, user_id, limit, fields=None):
+        rows = await self._run(lambda conn: conn.execute(
+            "SELECT doc FROM ai_recommendations WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+        ).fetchall())
+        return [_project(orjson.loads(doc), fields) for (doc,) in rows]
+
+    async def iter_recommendations(self, user_id, fields=None, batch_size=500):
+        sql = ("SELECT created_at, id, doc FROM ai_recommendations WHERE user_id = ? AND (created_at, id) > (?, ?) "
+               "ORDER BY created_at, id LIMIT ?")
+        after = ("", "")
+        while True:
+            page = await self._run(lambda conn: conn.execute(sql, (user_id, *after, batch_size)).fetchall())
+            for _, _, doc in page:
+                yield _project(orjson.loads(doc), fields)
+            if len(page) < batch_size:
+                return
+            after = page[-1][:2]
+
+    async def upsert_recommendations(self, user_id, recommendations):
+        rows = []
+        for recommendation in recommendations:
+            doc = {**_normalize(recommendation), "user_id": user_id}
+            rows.append((user_id, doc["id"], doc["created_at"].isoformat(), orjson.dumps(doc)))
+
+        def upsert(conn):
+            with _transaction(conn):
+                conn.executemany(
+                    "INSERT INTO ai_recommendations (user_id, id, created_at, doc) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, id) DO UPDATE SET created_at = excluded.created_at, doc = excluded.doc", rows
+                )
+        await self._run(upsert)
+
+    async def insert_job(self, user_id, job):
+        doc = orjson.dumps({**_normalize(job), "user_id": user_id})
+        await self._run(lambda conn: conn.execute(
+            "INSERT INTO ai_jobs (user_id, id, created, doc) VALUES (?, ?, ?, ?)", (user_id, job["id"], time.time(), doc)
+        ))
+
+    async def update_job(self, user_id, job_id, fields):
+        def update(conn):
+            with _transaction(conn):
+                row = conn.execute("SELECT doc FROM ai_jobs WHERE user_id = ? AND id = ?", (user_id, job_id)).fetchone()
+                if row is not None:
+                    job = {**orjson.loads(row[0]), **_normalize(fields)}
+                    conn.execute("UPDATE ai_jobs SET doc = ? WHERE user_id = ? AND id = ?", (orjson.dumps(job), user_id, job_id))
+        await self._run(update)
+
+    async def get_job(self, user_id, job_id):
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT doc FROM ai_jobs WHERE user_id = ? AND id = ? AND created > ?",
+            (user_id, job_id, time.time() - self.job_ttl_seconds)
+        ).fetchone())
+        return orjson.loads(row[0]) if row is not None else None
+
+    async def get_cached_response(self, key):
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT response FROM ai_response_cache WHERE key = ? AND created > ?", (key, time.time() - self.cache_ttl_seconds)
+        ).fetchone())
+        return row[0] if row is not None else None
+
+    async def put_cached_response(self, key, text):
+        await self._run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO ai_response_cache (key, created, response) VALUES (?, ?, ?)", (key, time.time(), text)
+        ))
+
+    async def latest_schedule_source(self, user_id):
+        row = await self._run(lambda conn: conn.execute(
+            "SELECT doc FROM schedule_sources WHERE user_id = ? AND latest = 1", (user_id,)
+        ).fetchone())
+        return orjson.loads(row[0]) if row is not None else None
+
+    async def record_schedule_source(self, user_id, source_hash, source):
+        doc = orjson.dumps({"_id": f"{user_id}:{source_hash}", **source, "user_id": user_id,
+                            "content_hash": source_hash, "latest": True})
+
+        def record(conn):
+            with _transaction(conn):
+                conn.execute("UPDATE schedule_sources SET latest = 0 WHERE user_id = ? AND latest = 1", (user_id,))
+                conn.execute("INSERT OR REPLACE INTO schedule_sources (user_id, hash, latest, doc) VALUES (?, ?, 1, ?)",
+                             (user_id, source_hash, doc))
+        await self._run(record)
+
+    async def ping(self):
+        await self._run(lambda conn: conn.execute("SELECT 1").fetchone())
+
+    def is_transient(self, error):
+        # Another process holding the write lock past the busy timeout
+        return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+    async def ensure_indexes(self):
+        # The schema creates its indexes when the connection opens; databases created before the
+        # search table existed get it filled from the tasks already stored
+        def backfill(conn):
+            with _transaction(conn):
+                if conn.execute("SELECT 1 FROM tasks_search LIMIT 1").fetchone() is None:
+                    conn.execute("INSERT INTO tasks_search (rowid, description, phase) "
+                                 "SELECT rowid, json_extract(CAST(doc AS TEXT), '$.description'), phase FROM tasks")
+        await self._run(backfill)
+        return {}
+
+    async def drop(self):
+        def drop(conn):
+            with _transaction(conn):
+                for table in ("tasks", "progress_rollups", "completion_days", "ai_recommendations", "ai_jobs", "ai_response_cache", "schedule_sources"):
+                    conn.execute(f"DELETE FROM {table}")
+        await self._run(drop)
+
+    def close(self):
+        if self._connection is not None:
+            self._executor.submit(self._connection.close).result()
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+# Retries
+class RetryingStorage:
+    """Wraps an engine so its idempotent reads are retried on transient errors.
+
+    Writes, streamed reads and everything else pass straight through to the engine.
+    """
+    READS = ("find_tasks", "get_tasks", "find_tasks_between", "search_tasks", "find_rollups", "find_completion_days",
+             "recent_recommendations", "get_job", "get_cached_response", "latest_schedule_source")
+
+    def __init__(self, engine: Storage, attempts: int = 3, base_delay: float = 0.05, max_delay: float = 1.0,
+                 on_retry=None):
+        self.engine = engine
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_retry = on_retry
+
+    def __getattr__(self, name):
+        attribute = getattr(self.engine, name)
+        if name not in self.READS:
+            return attribute
+
+        async def read(*args, **kwargs):
+            def on_retry(error, attempt):
+                if self.on_retry is not None:
+                    self.on_retry(name, error, attempt)
+            return await retry(lambda: attribute(*args, **kwargs), self.engine.is_transient, self.attempts,
+                               self.base_delay, self.max_delay, on_retry)
+        return read
@@ -0,0 +1,138 @@
+"""NDJSON and CSV encoding for bulk export and import.
+
+Both directions work on async iterators, one document or one line at a time, so a dump of any
+size streams through in constant memory: exports are written out in chunks of roughly
+`chunk_bytes` as the storage cursor yields, and imports are parsed as the request body arrives.
+"""
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+class LineTooLong(ValueError):
+    pass
+
+# Export
+def _csv_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()
+    return str(value)
+
+async def encode_documents(documents: AsyncIterator[Dict[str, Any]], format: str, fields: Iterable[str],
+                           chunk_bytes: int = 65536) -> AsyncIterator[bytes]:
+    """Serialize documents as NDJSON lines or CSV rows under a header of `fields`"""
+    fields = tuple(fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    chunk = bytearray()
+    if format == "csv":
+        writer.writerow(fields)
+    async for doc in documents:
+        if format == "csv":
+            writer.writerow([_csv_cell(doc.get(field)) for field in fields])
+            chunk += buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            chunk += orjson.dumps({field: doc[field] for field in fields if field in doc}) + b"\n"
+        if len(chunk) >= chunk_bytes:
+            yield bytes(chunk)
+            chunk.clear()
+    if format == "csv" and buffer.tell():
+        chunk += buffer.getvalue().encode()
+    if chunk:
+        yield bytes(chunk)
+
+# Import
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines, keeping their newlines; only one partial line is ever held"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end == -1:
+                break
+            yield pending[start:end + 1]
+            start = end + 1
+        pending = pending[start:]
+        if len(pending) > max_line_bytes:
+            raise LineTooLong(f"A line is longer than {max_line_bytes} bytes")
+    if pending:
+        yield pending
+
+async def decode_documents(chunks: AsyncIterator[bytes], format: str, list_fields: Iterable[str] = (),
+                           max_line_bytes: int = 1 << 20) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """Parse NDJSON lines or CSV rows into (line number, document, error) as the bytes arrive.
+
+    Blank lines are skipped. Empty CSV cells are left out of the document, and cells of
+    `list_fields` hold JSON arrays. A CSV record that spans lines (a quoted cell with a newline
+    in it) is reported at its first line.
+    """
+    list_fields = set(list_fields)
+    header = None
+    record, record_line = "", 0
+    line_number = 0
+    async for raw in iter_lines(chunks, max_line_bytes):
+        line_number += 1
+        try:
+            line = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            yield line_number, None, "Not valid UTF-8"
+            continue
+
+        if format == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                doc = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(doc, dict):
+                yield line_number, doc, None
+            else:
+                yield line_number, None, "Each line must be a JSON object"
+            continue
+
+        # A CSV record is complete once its quotes are balanced
+        if not record:
+            record_line = line_number
+        record += line
+        if record.count('"') % 2:
+            if len(record) > max_line_bytes:
+                raise LineTooLong(f"The record starting on line {record_line} is longer than {max_line_bytes} bytes")
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        row = next(csv.reader([text]))
+        if header is None:
+            header = row
+            continue
+        if len(row) != len(header):
+            yield record_line, None, f"Expected {len(header)} columns, got {len(row)}"
+            continue
+        doc = {}
+        try:
+            for field, cell in zip(header, row):
+                if cell != "":
+                    doc[field] = orjson.loads(cell) if field in list_fields else cell
+        except orjson.JSONDecodeError:
+            yield record_line, None, f"{field} must be a JSON array"
+            continue
+        yield record_line, doc, None
+    if record.strip():
+        yield record_line, None, "Unterminated quoted field"
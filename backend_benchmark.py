@@ -0,0 +1,1135 @@
+"""Local benchmark suite for the Internship Prep Dashboard API.
+
+Runs the FastAPI app in process against a storage engine (mongomock-motor by default, the
+mongod from MONGO_URL with --store mongo, or the memory and sqlite engines) and the fake LLM,
+seeds a dataset per size, drives concurrent load at every route and reports p50/p95/p99 latency,
+requests per second and memory. mongomock-motor has no real indexes and seeds slowly past ~10k
+tasks, so use another store for the 100k and 1M sizes.
+
+The storage command runs the same conformance checks and operation timings against every
+engine, so engines can be compared before picking one for a deployment. The users command
+seeds many users and checks that per-user routes stay flat as the user count grows, and the
+search command shows search latency following the number of matches rather than the collection size.
+The transfer command streams a full export and import and reports their peak memory, the
+startup command times a fresh process from import to its first served request, the
+resilience command injects storage and LLM faults to exercise retries, deadlines and the LLM
+circuit breaker, and the context command shows recommendation prompts staying within their
+token budget as history grows.
+
+    python backend_benchmark.py run --sizes 1000,100000 --output baseline.json
+    python backend_benchmark.py run --sizes 1000 --store memory --compare baseline.json
+    python backend_benchmark.py overview 10000
+    python backend_benchmark.py serialization
+    python backend_benchmark.py payload 1000
+    python backend_benchmark.py storage --engines memory,sqlite,mongomock --tasks 10000
+    python backend_benchmark.py users --users 1,100,10000,100000 --store sqlite
+    python backend_benchmark.py search --sizes 1000,10000,100000 --store sqlite
+    python backend_benchmark.py transfer 1000000 --format csv
+    python backend_benchmark.py startup --store sqlite --runs 5
+    python backend_benchmark.py resilience --failure-rate 0.3
+    python backend_benchmark.py context --history 10,1000,100000 --store sqlite
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0.001")
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import httpx  # noqa: E402
+import orjson  # noqa: E402
+from typing import List  # noqa: E402
+from fastapi import Request  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+import server  # noqa: E402
+from pymongo.errors import AutoReconnect  # noqa: E402
+from resilience import remaining  # noqa: E402
+from storage import MemoryStorage, MotorStorage, RetryingStorage, SqliteStorage  # noqa: E402
+from transfer import encode_documents  # noqa: E402
+
+CATEGORIES = ["DSA", "PROJECT", "LEARN", "OPS", "APPLY"]
+STATUSES = ["PENDING", "IN_PROGRESS", "COMPLETED"]
+STORES = ["mongomock", "mongo", "memory", "sqlite"]
+START_DATE = "2025-09-22"
+# Seeded descriptions mention two of these, so searches for a topic match a fixed share of tasks
+TOPICS = ["arrays", "graphs", "trees", "heaps", "tries", "greedy", "sorting", "hashing", "recursion", "backtracking",
+          "docker", "kubernetes", "react", "fastapi", "mongodb", "sqlite", "caching", "testing", "resume", "networking"]
+
+
+def make_tasks(count, start_date=START_DATE, seed=42):
+    """Generate a schedule of `count` tasks, five per day, one category each"""
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    for i in range(count):
+        day = i // len(CATEGORIES)
+        status = rng.choice(STATUSES)
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "natural_key": f"seed-{seed}-{i}",
+            "date": (start + timedelta(days=day)).strftime("%Y-%m-%d"),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "description": f"Seeded task {i}: {TOPICS[i * 7 % len(TOPICS)]} and {TOPICS[(i // 5 * 3 + 1) % len(TOPICS)]}",
+            "status": status,
+            "week_number": day // 7 + 1,
+            "phase": f"Phase {day // 90 + 1}",
+            "priority": rng.randint(1, 3),
+            "created_at": datetime.now(timezone.utc),
+            "completed_at": start.replace(tzinfo=timezone.utc) + timedelta(days=day, hours=12) if status == "COMPLETED" else None,
+        }
+
+
+def open_store(store):
+    """A fresh benchmark store of the given kind"""
+    database = f"{os.environ.get('DB_NAME', 'dashboard')}_benchmark"
+    if store == "memory":
+        return MemoryStorage()
+    if store == "sqlite":
+        return SqliteStorage(str(Path(tempfile.mkdtemp()) / f"{database}.sqlite3"))
+    if store == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+        return MotorStorage(AsyncMongoMockClient()[database])
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return MotorStorage(AsyncIOMotorClient(os.environ["MONGO_URL"])[database])
+
+
+def use_store(store):
+    """Point the server module at a fresh benchmark store"""
+    server.store = open_store(store)
+    return server.store
+
+
+async def seed(store, task_count, batch_size=10000, user_id=server.DEFAULT_USER_ID):
+    await store.drop()
+    batch = []
+    for task in make_tasks(task_count):
+        batch.append(task)
+        if len(batch) >= batch_size:
+            await store.insert_tasks(user_id, batch)
+            batch = []
+    if batch:
+        await store.insert_tasks(user_id, batch)
+    await store.ensure_indexes()
+    await server.rebuild_rollups(user_id)
+    server.response_cache.invalidate()
+
+
+def summarize(latencies, wall_seconds=None):
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    summary = {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "mean_ms": round(statistics.mean(ordered), 3),
+    }
+    if wall_seconds is not None:
+        summary["rps"] = round(len(ordered) / wall_seconds, 1)
+    return summary
+
+
+def memory_mb():
+    """Current and peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        current = peak
+    return {"rss_mb": round(current, 1), "peak_rss_mb": round(peak, 1)}
+
+
+def month_grid(day):
+    """The from/to params of the six week calendar grid showing `day`'s month"""
+    first = datetime.strptime(day[:8] + "01", "%Y-%m-%d")
+    start = first - timedelta(days=(first.weekday() + 1) % 7)
+    return {"from": start.strftime("%Y-%m-%d"), "to": (start + timedelta(days=41)).strftime("%Y-%m-%d")}
+
+
+def scenarios(task_ids, days, weeks):
+    """Each route with a factory producing one request's (method, url, kwargs)"""
+    return {
+        "GET /api/tasks": lambda: ("GET", "/api/tasks", {"params": {"limit": 100}}),
+        "GET /api/tasks?date": lambda: ("GET", "/api/tasks", {"params": {"date": random.choice(days)}}),
+        "GET /api/tasks?week&category": lambda: ("GET", "/api/tasks", {
+            "params": {"week": random.choice(weeks), "category": random.choice(CATEGORIES)}}),
+        "GET /api/tasks?status": lambda: ("GET", "/api/tasks", {"params": {"status": "COMPLETED", "limit": 100}}),
+        "GET /api/tasks/calendar": lambda: ("GET", "/api/tasks/calendar", {"params": month_grid(random.choice(days))}),
+        "GET /api/progress/weekly": lambda: ("GET", "/api/progress/weekly", {}),
+        "GET /api/progress/daily": lambda: ("GET", "/api/progress/daily", {"params": {"date": random.choice(days)}}),
+        "GET /api/progress/completions": lambda: ("GET", "/api/progress/completions", {"params": {"to": random.choice(days)}}),
+        "GET /api/progress/velocity": lambda: ("GET", "/api/progress/velocity", {"params": {"to": random.choice(days)}}),
+        "GET /api/progress/streaks": lambda: ("GET", "/api/progress/streaks", {}),
+        "GET /api/dashboard/overview": lambda: ("GET", "/api/dashboard/overview", {}),
+        "PUT /api/tasks/{task_id}": lambda: ("PUT", f"/api/tasks/{random.choice(task_ids)}", {
+            "json": {"status": random.choice(STATUSES)}}),
+        "PATCH /api/tasks/bulk": lambda: ("PATCH", "/api/tasks/bulk", {
+            "json": {"filter": {"date": random.choice(days)}, "update": {"status": random.choice(STATUSES)}}}),
+        "POST /api/ai/recommendations": lambda: ("POST", "/api/ai/recommendations", {
+            "json": {"user_prompt": f"What should I focus on? #{random.randint(0, 50)}"}}),
+        "GET /api/ai/recommendations/history": lambda: ("GET", "/api/ai/recommendations/history", {}),
+    }
+
+
+async def drive(client, make_request, total_requests, concurrency):
+    """Send `total_requests` requests from `concurrency` workers; return latencies and wall time"""
+    latencies, errors = [], 0
+    remaining = iter(range(total_requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = make_request()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, time.perf_counter() - started, errors
+
+
+async def run_suite(sizes, store, total_requests, concurrency, routes=None, cache=True):
+    results = {}
+    storage = use_store(store)
+    if not cache:
+        server.response_cache.max_entries = 0
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for size in sizes:
+            print(f"\n🌱 Seeding {size} tasks ({store})...")
+            started = time.perf_counter()
+            await seed(storage, size)
+            print(f"   seeded in {time.perf_counter() - started:.1f}s")
+
+            task_ids = [t["id"] for t in await storage.find_tasks(server.DEFAULT_USER_ID, limit=10000, fields=("id",))]
+            days = sorted({t["date"] for t in make_tasks(min(size, 5000))})
+            weeks = sorted({t["week_number"] for t in make_tasks(min(size, 5000))})
+
+            results[str(size)] = {}
+            for name, make_request in scenarios(task_ids, days, weeks).items():
+                if routes and name not in routes:
+                    continue
+                latencies, wall, errors = await drive(client, make_request, total_requests, concurrency)
+                summary = {**summarize(latencies, wall), "errors": errors, **memory_mb()}
+                results[str(size)][name] = summary
+                print(f"   {name:40} p50={summary['p50_ms']:8.2f}ms p95={summary['p95_ms']:8.2f}ms "
+                      f"p99={summary['p99_ms']:8.2f}ms rps={summary['rps']:8.1f} rss={summary['rss_mb']}MB"
+                      + (f" ❌ {errors} errors" if errors else ""))
+    await storage.drop()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print p95 changes against a baseline and return the regressions beyond `threshold`"""
+    regressions = []
+    print(f"\n📊 Comparison against baseline (regression threshold {threshold:.0%})")
+    for size, routes in results.items():
+        for name, summary in routes.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before:
+                continue
+            ratio = summary["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+            regressed = ratio > 1 + threshold
+            print(f"   {'❌' if regressed else '✅'} [{size}] {name:40} p95 {before['p95_ms']:.2f}ms -> "
+                  f"{summary['p95_ms']:.2f}ms ({ratio:.2f}x)")
+            if regressed:
+                regressions.append({"size": size, "route": name, "before": before["p95_ms"], "after": summary["p95_ms"]})
+    return regressions
+
+
+async def legacy_dashboard_overview(db):
+    """The original overview: five sequential round trips over the raw tasks collection"""
+    total_tasks = await db.tasks.count_documents({})
+    completed_tasks = await db.tasks.count_documents({"status": "COMPLETED"})
+    today = datetime.now().strftime("%Y-%m-%d")
+    today_tasks = await db.tasks.find({"date": today}).to_list(100)
+    week_tasks = await db.tasks.find({"week_number": 1}).to_list(100)
+    category_stats = await db.tasks.aggregate([
+        {"$group": {
+            "_id": "$category",
+            "total": {"$sum": 1},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}}
+        }}
+    ]).to_list(10)
+    return total_tasks, completed_tasks, today_tasks, week_tasks, category_stats
+
+
+async def time_calls(func, iterations):
+    """Call `func` repeatedly and return per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def compare_dashboard_overview(task_count=10000, iterations=50, store="mongo"):
+    """Seed a dataset and compare the legacy and current dashboard overview latency"""
+    storage = use_store(store)
+    db = storage.db
+    print(f"\n🌱 Seeding {task_count} tasks into {db.name}...")
+    await seed(storage, task_count)
+
+    print("⏱  Timing dashboard overview...")
+    legacy = summarize(await time_calls(lambda: legacy_dashboard_overview(db), iterations))
+    request = Request({"type": "http", "method": "GET", "path": "/api/dashboard/overview", "headers": [], "query_string": b""})
+    current = summarize(await time_calls(
+        lambda: server.get_dashboard_overview(request, user_id=server.DEFAULT_USER_ID), iterations))
+
+    print(f"   legacy  p50={legacy['p50_ms']:.2f}ms p95={legacy['p95_ms']:.2f}ms mean={legacy['mean_ms']:.2f}ms")
+    print(f"   current p50={current['p50_ms']:.2f}ms p95={current['p95_ms']:.2f}ms mean={current['mean_ms']:.2f}ms")
+    print(f"   speedup (p50): {legacy['p50_ms'] / current['p50_ms']:.1f}x")
+
+    await storage.drop()
+    return legacy, current
+
+
+def serialization_benchmark(task_count=1000, iterations=50):
+    """Per-request CPU cost of rendering `task_count` tasks on the old and the fast read path"""
+    # Motor returns naive UTC datetimes, so mirror that here
+    docs = [
+        {"_id": i, **task, **{field: task[field].replace(tzinfo=None)
+                              for field in ("created_at", "completed_at") if task[field] is not None}}
+        for i, task in enumerate(make_tasks(task_count))
+    ]
+    response_adapter = TypeAdapter(List[server.Task])
+
+    def legacy():
+        # Task(**doc) per row, response_model validation, jsonable_encoder and stdlib json
+        models = [server.Task(**doc) for doc in docs]
+        validated = response_adapter.validate_python(models)
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    def fast():
+        # Rows come back already projected to the model fields, so only orjson runs
+        projected = [{field: doc[field] for field in server.TASK_FIELDS} for doc in docs]
+        started = time.perf_counter()
+        body = server.ORJSONResponse(projected).body
+        return body, time.perf_counter() - started
+
+    legacy_ms, fast_ms = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        legacy()
+        legacy_ms.append((time.perf_counter() - started) * 1000)
+        fast_ms.append(fast()[1] * 1000)
+
+    legacy_summary, fast_summary = summarize(legacy_ms), summarize(fast_ms)
+    print(f"\n⏱  Serializing {task_count} tasks ({iterations} iterations)")
+    print(f"   Task(**doc) + response_model + json: p50={legacy_summary['p50_ms']:.2f}ms")
+    print(f"   projection + orjson:                 p50={fast_summary['p50_ms']:.2f}ms")
+    print(f"   speedup (p50): {legacy_summary['p50_ms'] / fast_summary['p50_ms']:.1f}x")
+    assert orjson.loads(fast()[0]) == orjson.loads(legacy())
+    return legacy_summary, fast_summary
+
+
+async def payload_sizes(task_count=1000, store="memory", iterations=20):
+    """Bytes on the wire and server time for one page of tasks in each representation"""
+    storage = use_store(store)
+    await seed(storage, task_count)
+    server.response_cache.max_entries = 0
+    minimal = "status,category,description,priority"
+    variants = {
+        "json": ({}, {"Accept-Encoding": "identity"}),
+        f"json ?fields={minimal}": ({"fields": minimal}, {"Accept-Encoding": "identity"}),
+        "json gzip": ({}, {"Accept-Encoding": "gzip"}),
+        "json br": ({}, {"Accept-Encoding": "br"}),
+        "msgpack": ({}, {"Accept-Encoding": "identity", "Accept": "application/msgpack"}),
+        f"msgpack ?fields={minimal} br": ({"fields": minimal}, {"Accept-Encoding": "br", "Accept": "application/msgpack"}),
+    }
+    print(f"\n📦 GET /api/tasks?limit={task_count} payloads")
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, (params, headers) in variants.items():
+            params = {"limit": task_count, **params}
+            response = await client.get("/api/tasks", params=params, headers=headers)
+            latencies = await time_calls(lambda: client.get("/api/tasks", params=params, headers=headers), iterations)
+            encoding = response.headers.get("content-encoding", "identity")
+            print(f"   {name:56} {response.num_bytes_downloaded:>9,} bytes  {encoding:8} "
+                  f"{response.headers['content-type']:24} p50={summarize(latencies)['p50_ms']:.2f}ms")
+    await storage.drop()
+
+
+async def check_conformance(store, user="alice", other="bob"):
+    """Exercise every Storage method on a small dataset; return the names of failed checks"""
+    failures = []
+
+    def check(name, condition):
+        if not condition:
+            failures.append(name)
+
+    await store.drop()
+    tasks = list(make_tasks(60, seed=7))
+    await store.insert_tasks(user, tasks)
+    ordered = sorted(tasks, key=lambda t: (t["date"], t["id"]))
+    ids = lambda docs: [doc["id"] for doc in docs]
+
+    check("find_tasks orders by (date, id)", ids(await store.find_tasks(user)) == ids(ordered))
+    for filters in ({"date": ordered[10]["date"]}, {"week_number": 2}, {"week_number": 1, "category": "DSA"},
+                    {"status": "COMPLETED"}, {"category": server.TaskCategory.APPLY}):
+        plain = {k: getattr(v, "value", v) for k, v in filters.items()}
+        expected = [t for t in ordered if all(t[k] == v for k, v in plain.items())]
+        check(f"find_tasks filters {plain}", ids(await store.find_tasks(user, filters)) == ids(expected))
+    pages, after = [], None
+    while True:
+        page = await store.find_tasks(user, after=after, limit=7)
+        pages.extend(page)
+        if len(page) < 7:
+            break
+        after = (page[-1]["date"], page[-1]["id"])
+    check("keyset pages cover every task once", ids(pages) == ids(ordered))
+    check("fields limit the returned keys", all(set(doc) == {"id", "date"} for doc in await store.find_tasks(user, fields=("id", "date"))))
+    check("iter_tasks matches find_tasks", ids([doc async for doc in store.iter_tasks(user, {"week_number": 1})])
+          == ids(await store.find_tasks(user, {"week_number": 1})))
+    check("get_tasks skips unknown ids", sorted(ids(await store.get_tasks(user, [ordered[0]["id"], "missing", ordered[1]["id"]])))
+          == sorted([ordered[0]["id"], ordered[1]["id"]]))
+
+    target = ordered[3]
+    previous = await store.update_task(user, target["id"], {"status": server.TaskStatus.COMPLETED, "priority": 9})
+    check("update_task returns the previous task", previous is not None and previous["status"] == target["status"])
+    updated = (await store.get_tasks(user, [target["id"]]))[0]
+    check("update_task applies fields", updated["status"] == "COMPLETED" and updated["priority"] == 9)
+    check("update_task on a missing task returns None", await store.update_task(user, "missing", {"priority": 1}) is None)
+    errors = await store.update_tasks(user, [(ordered[4]["id"], {"priority": 7}), ("missing", {"priority": 7})])
+    check("update_tasks applies updates", not errors and (await store.get_tasks(user, [ordered[4]["id"]]))[0]["priority"] == 7)
+
+    fresh = {**next(make_tasks(1, seed=99)), "natural_key": "conformance-key"}
+    await store.write_schedule(user, [fresh], [(ordered[5]["id"], {"phase": "Renamed"})], [ordered[6]["id"]])
+    await store.write_schedule(user, [{**fresh, "id": "duplicate"}], [], [])
+    check("write_schedule inserts once per natural_key", ids(await store.get_tasks(user, [fresh["id"], "duplicate"])) == [fresh["id"]])
+    check("write_schedule updates", (await store.get_tasks(user, [ordered[5]["id"]]))[0]["phase"] == "Renamed")
+    check("write_schedule deletes", not await store.get_tasks(user, [ordered[6]["id"]]))
+
+    upserted = {**ordered[7], "priority": 5}
+    errors = await store.upsert_tasks(user, [upserted, {**fresh, "id": "clash"}, {**ordered[8], "id": "upserted-new", "natural_key": None}])
+    check("upsert_tasks replaces by id and inserts", (await store.get_tasks(user, [ordered[7]["id"]]))[0]["priority"] == 5
+          and ids(await store.get_tasks(user, ["upserted-new"])) == ["upserted-new"])
+    # mongomock ignores the partial unique index on natural_key, so only the other engines can clash
+    check("upsert_tasks reports natural_key clashes", store.name == "mongo" or list(errors) == [1])
+    await store.write_schedule(user, [], [], ["upserted-new"])
+
+    remaining = await store.find_tasks(user)
+    groups = [group async for group in store.task_status_groups(user)]
+    check("task_status_groups totals", sum(g["total"] for g in groups) == len(remaining)
+          and sum(g["completed"] for g in groups) == sum(t["status"] == "COMPLETED" for t in remaining))
+
+    rollup = lambda owner, kind, **fields: {"_id": f"{owner}:{kind}", "user_id": owner, "kind": kind.split(":")[0],
+                                            "total": 2, "completed": 1, "categories": {}, **fields}
+    await store.replace_rollups(user, {
+        f"{user}:all": rollup(user, "all", categories={"DSA": {"total": 2, "completed": 1}}),
+        f"{user}:category:DSA": rollup(user, "category:DSA", category="DSA"),
+    })
+    await store.increment_rollups(user, {f"{user}:all": {"completed": 1, "categories.DSA.completed": 1},
+                                         f"{user}:missing": {"completed": 1}})
+    rollups = {doc["_id"]: doc for doc in await store.find_rollups(user)}
+    check("increment_rollups follows dotted paths", rollups[f"{user}:all"]["completed"] == 2
+          and rollups[f"{user}:all"]["categories"]["DSA"]["completed"] == 2 and f"{user}:missing" not in rollups)
+    check("find_rollups filters by kind",
+          [doc["_id"] for doc in await store.find_rollups(user, ["category"])] == [f"{user}:category:DSA"])
+    await store.replace_rollups(user, {f"{user}:all": rollups[f"{user}:all"]})
+    check("replace_rollups drops stale rollups", [doc["_id"] for doc in await store.find_rollups(user)] == [f"{user}:all"])
+
+    await store.replace_completion_days(user, {
+        date: {"date": date, "completed": 1, "categories": {"DSA": 1}} for date in ("2025-09-24", "2025-09-22", "2025-09-23")
+    })
+    await store.increment_completion_days(user, {"2025-09-23": {"completed": 2, "categories.OPS": 2},
+                                                 "2025-09-21": {"completed": 1, "categories.DSA": 1}})
+    history = await store.find_completion_days(user)
+    check("completion days are ordered by date", [day["date"] for day in history]
+          == ["2025-09-21", "2025-09-22", "2025-09-23", "2025-09-24"])
+    check("increment_completion_days adds and creates days", history[2]["completed"] == 3
+          and history[2]["categories"] == {"DSA": 1, "OPS": 2} and history[0]["completed"] == 1)
+    check("find_completion_days filters by range",
+          [day["date"] for day in await store.find_completion_days(user, "2025-09-22", "2025-09-23")] == ["2025-09-22", "2025-09-23"])
+
+    try:
+        found = await store.search_tasks(user, ["graphs", "trees"])
+    except NotImplementedError:
+        found = None  # mongomock has no $text operator
+    if found is not None:
+        words = lambda task: set(server.search_terms(f"{task['description']} {task['phase']}"))
+        check("search_tasks matches any term", sorted(ids(found)) == sorted(ids(t for t in remaining if words(t) & {"graphs", "trees"})))
+        check("search_tasks ranks by score, then id", [(-t["score"], t["id"]) for t in found] == sorted((-t["score"], t["id"]) for t in found))
+        both = [t for t in found if {"graphs", "trees"} <= words(t)]
+        check("search_tasks ranks tasks matching more terms first", not both or found[0]["id"] in ids(both))
+        pages, after = [], None
+        while True:
+            page = await store.search_tasks(user, ["graphs", "trees"], after=after, limit=3, fields=("id",))
+            pages.extend(page)
+            if len(page) < 3:
+                break
+            after = (page[-1]["score"], page[-1]["id"])
+        check("search_tasks keyset pages cover every match once", ids(pages) == ids(found))
+        check("search_tasks filters", ids(await store.search_tasks(user, ["graphs", "trees"], {"category": "DSA"}))
+              == [t["id"] for t in found if t["category"] == "DSA"])
+        await store.update_tasks(user, [(found[0]["id"], {"description": "Renamed to conformance"})])
+        check("search_tasks follows updates", ids(await store.search_tasks(user, ["conformance"])) == [found[0]["id"]]
+              and found[0]["id"] not in ids(await store.search_tasks(user, ["graphs", "trees"])))
+
+    for i in range(3):
+        recommendation = server.AIRecommendation(date="2025-09-22", recommendations=[f"r{i}"], focus_areas=[], priority_tasks=[])
+        recommendation.created_at = datetime.now(timezone.utc) + timedelta(seconds=i)
+        await store.insert_recommendation(user, recommendation.dict())
+    recent = await store.recent_recommendations(user, 2, ("recommendations",))
+    check("recent_recommendations is newest first", [doc["recommendations"] for doc in recent] == [["r2"], ["r1"]])
+    older = server.AIRecommendation(date="2025-09-21", recommendations=["r-1"], focus_areas=[], priority_tasks=[])
+    older.created_at = datetime.now(timezone.utc) - timedelta(days=1)
+    await store.upsert_recommendations(user, [older.dict(), {**recommendation.dict(), "recommendations": ["r2b"]}])
+    history = [doc["recommendations"] async for doc in store.iter_recommendations(user, ("recommendations",))]
+    check("upsert_recommendations inserts and replaces by id", history == [["r-1"], ["r0"], ["r1"], ["r2b"]])
+
+    job = server.AIJob(user_prompt="conformance")
+    await store.insert_job(user, job.dict())
+    await store.update_job(user, job.id, {"status": server.AIJobStatus.COMPLETED, "result": {"ok": True}})
+    stored_job = await store.get_job(user, job.id)
+    check("jobs round trip", stored_job is not None and stored_job["status"] == "COMPLETED" and stored_job["result"] == {"ok": True})
+    check("get_job on a missing job returns None", await store.get_job(user, "missing") is None)
+
+    await store.put_cached_response("key", "cached text")
+    check("response cache round trip", await store.get_cached_response("key") == "cached text"
+          and await store.get_cached_response("missing") is None)
+
+    await store.record_schedule_source(user, "first", {"outline": [], "result": {"count": 1}})
+    await store.record_schedule_source(user, "second", {"outline": [{"phase": "P"}], "result": {"count": 2}})
+    latest = await store.latest_schedule_source(user)
+    check("latest_schedule_source is the last recorded", latest is not None and latest["content_hash"] == "second"
+          and latest["result"]["count"] == 2)
+
+    # Another user sees none of the first user's data and cannot change it
+    await store.insert_tasks(other, [{**ordered[0], "status": "PENDING"}])
+    check("users share task ids without clashing", (await store.get_tasks(other, [ordered[0]["id"]]))[0]["status"] == "PENDING"
+          and len(await store.find_tasks(user)) == len(remaining))
+    check("find_tasks is scoped to the user", ids(await store.find_tasks(other)) == [ordered[0]["id"]])
+    if found is not None:
+        check("search_tasks is scoped to the user", not await store.search_tasks(other, ["conformance"]))
+    check("update_task is scoped to the user", await store.update_task(other, ordered[1]["id"], {"priority": 1}) is None)
+    await store.replace_rollups(other, {f"{other}:all": rollup(other, "all")})
+    check("replace_rollups keeps other users' rollups", [doc["_id"] for doc in await store.find_rollups(user)] == [f"{user}:all"])
+    check("recommendations are scoped to the user", not await store.recent_recommendations(other, 10))
+    check("completion days are scoped to the user", not await store.find_completion_days(other))
+    check("jobs are scoped to the user", await store.get_job(other, job.id) is None)
+    check("schedule sources are scoped to the user", await store.latest_schedule_source(other) is None)
+
+    await store.drop()
+    check("drop empties the store", not await store.find_tasks(user) and await store.latest_schedule_source(user) is None)
+    return failures
+
+
+async def time_storage(store, task_count, iterations):
+    """Per-operation latency of the storage calls the routes make"""
+    user = server.DEFAULT_USER_ID
+    await seed(store, task_count)
+    sample = await store.find_tasks(user, limit=10000, fields=("id", "date", "week_number"))
+    rng = random.Random(1)
+    operations = {
+        "find_tasks date": lambda: store.find_tasks(user, {"date": rng.choice(sample)["date"]}, limit=100),
+        "find_tasks week+category": lambda: store.find_tasks(
+            user, {"week_number": rng.choice(sample)["week_number"], "category": rng.choice(CATEGORIES)}, limit=1001),
+        "find_tasks status page": lambda: store.find_tasks(user, {"status": "COMPLETED"}, limit=100),
+        "find_tasks after cursor": lambda: store.find_tasks(
+            user, after=(rng.choice(sample)["date"], rng.choice(sample)["id"]), limit=100),
+        "get_tasks 100 ids": lambda: store.get_tasks(user, [rng.choice(sample)["id"] for _ in range(100)]),
+        "update_task": lambda: store.update_task(user, rng.choice(sample)["id"], {"status": rng.choice(STATUSES)}),
+        "find_rollups": lambda: store.find_rollups(user, ["all", "week", "category"]),
+        "increment_rollups": lambda: store.increment_rollups(user, {f"{user}:all": {"completed": 0}}),
+    }
+    results = {name: summarize(await time_calls(operation, iterations)) for name, operation in operations.items()}
+    started = time.perf_counter()
+    await server.rebuild_rollups(user)
+    results["rebuild_rollups"] = summarize([(time.perf_counter() - started) * 1000])
+    await store.drop()
+    return results
+
+
+async def compare_storage(engines, task_count, iterations):
+    """Run the conformance checks and the operation timings on each engine"""
+    failed = False
+    report = {}
+    for engine in engines:
+        store = use_store(engine)
+        failures = await check_conformance(store)
+        failed = failed or bool(failures)
+        print(f"\n{'❌' if failures else '✅'} {engine}: conformance "
+              + (f"failed: {', '.join(failures)}" if failures else "passed"))
+        report[engine] = await time_storage(store, task_count, iterations)
+        store.close()
+
+    print(f"\n⏱  Storage operations at {task_count} tasks, p50 / p95 in ms")
+    print(f"   {'operation':28}" + "".join(f"{engine:>22}" for engine in engines))
+    for name in next(iter(report.values())):
+        cells = "".join(f"{report[e][name]['p50_ms']:>11.3f} /{report[e][name]['p95_ms']:>8.3f}" for e in engines)
+        print(f"   {name:28}{cells}")
+    return report, failed
+
+
+def user_scenarios(users):
+    """Per-user routes, each request acting as a random user from `users` ({user_id: task ids})"""
+    user_ids = list(users)
+
+    def request(method, url, **kwargs):
+        user_id = random.choice(user_ids)
+        return method, url.format(task_id=random.choice(users[user_id])), {**kwargs, "headers": {"X-User-Id": user_id}}
+
+    return {
+        "GET /api/tasks?date": lambda: request("GET", "/api/tasks", params={"date": START_DATE}),
+        "GET /api/progress/weekly": lambda: request("GET", "/api/progress/weekly"),
+        "GET /api/dashboard/overview": lambda: request("GET", "/api/dashboard/overview"),
+        "PUT /api/tasks/{task_id}": lambda: request("PUT", "/api/tasks/{task_id}", json={"status": random.choice(STATUSES)}),
+    }
+
+
+async def user_scaling(user_counts, store, tasks_per_user, total_requests, concurrency, sample_size=1000):
+    """Seed `tasks_per_user` tasks for each of N users and time per-user routes at every N.
+
+    Every query is led by user_id, so latency should stay flat as the number of users grows.
+    Rollups are only built for the sampled users the requests act as.
+    """
+    results = {}
+    storage = use_store(store)
+    server.response_cache.max_entries = 0
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for count in user_counts:
+            print(f"\n🌱 Seeding {count} users x {tasks_per_user} tasks ({store})...")
+            started = time.perf_counter()
+            await storage.drop()
+            sampled = set(random.Random(count).sample(range(count), min(count, sample_size)))
+            users = {}
+            for index in range(count):
+                user_id = f"user-{index}"
+                tasks = list(make_tasks(tasks_per_user, seed=index))
+                await storage.insert_tasks(user_id, tasks)
+                if index in sampled:
+                    users[user_id] = [task["id"] for task in tasks]
+            await storage.ensure_indexes()
+            for user_id in users:
+                await server.rebuild_rollups(user_id)
+            print(f"   seeded in {time.perf_counter() - started:.1f}s")
+
+            results[str(count)] = {}
+            for name, make_request in user_scenarios(users).items():
+                latencies, wall, errors = await drive(client, make_request, total_requests, concurrency)
+                summary = {**summarize(latencies, wall), "errors": errors}
+                results[str(count)][name] = summary
+                print(f"   {name:40} p50={summary['p50_ms']:8.2f}ms p95={summary['p95_ms']:8.2f}ms "
+                      f"rps={summary['rps']:8.1f}" + (f" ❌ {errors} errors" if errors else ""))
+    await storage.drop()
+
+    first, last = results[str(user_counts[0])], results[str(user_counts[-1])]
+    print(f"\n📈 p95 at {user_counts[-1]} users relative to {user_counts[0]}")
+    for name in first:
+        print(f"   {name:40} {first[name]['p95_ms']:8.2f}ms -> {last[name]['p95_ms']:8.2f}ms "
+              f"({last[name]['p95_ms'] / first[name]['p95_ms']:.2f}x)")
+    return results
+
+
+async def search_scaling(sizes, store, iterations=100):
+    """Time GET /api/tasks/search at each collection size against a full scan of the same query.
+
+    Index lookups only touch the postings of the query terms, so a rare term stays flat as the
+    collection grows, while the scan and queries matching a fixed share of tasks grow with it.
+    """
+    storage = use_store(store)
+    server.response_cache.max_entries = 0
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for size in sizes:
+            print(f"\n🌱 Seeding {size} tasks ({store})...")
+            await seed(storage, size)
+            rng = random.Random(size)
+            # Task numbers from the upper half never collide with the phase numbers also in the index
+            rare = lambda: str(rng.randrange(size // 2, size))
+            queries = {
+                "rare term (one task)": lambda: {"q": rare()},
+                "topic (1 in 10 tasks)": lambda: {"q": rng.choice(TOPICS)},
+                "two topics + category": lambda: {"q": " ".join(rng.sample(TOPICS, 2)), "category": rng.choice(CATEGORIES)},
+                "every task, first page": lambda: {"q": "seeded"},
+            }
+            results[str(size)] = {}
+            for name, make_params in queries.items():
+                matches = len(await storage.search_tasks(server.DEFAULT_USER_ID, server.search_terms(make_params()["q"]),
+                                                         fields=("id",)))
+                latencies = await time_calls(lambda: client.get("/api/tasks/search", params={"limit": 50, **make_params()}),
+                                             iterations)
+                results[str(size)][name] = {**summarize(latencies), "matches": matches}
+                print(f"   {name:32} p50={results[str(size)][name]['p50_ms']:8.2f}ms "
+                      f"p95={results[str(size)][name]['p95_ms']:8.2f}ms  ~{matches} matches")
+
+            async def scan():
+                term = rare()
+                return [task async for task in storage.iter_tasks(server.DEFAULT_USER_ID, fields=("id", "description"))
+                        if term in server.search_terms(task["description"])]
+            results[str(size)]["full scan, rare term"] = summarize(await time_calls(scan, max(3, iterations // 20)))
+            print(f"   {'full scan, rare term':32} p50={results[str(size)]['full scan, rare term']['p50_ms']:8.2f}ms")
+    await storage.drop()
+
+    first, last = results[str(sizes[0])], results[str(sizes[-1])]
+    print(f"\n📈 p50 at {sizes[-1]} tasks relative to {sizes[0]}")
+    for name in first:
+        print(f"   {name:32} {first[name]['p50_ms']:8.2f}ms -> {last[name]['p50_ms']:8.2f}ms "
+              f"({last[name]['p50_ms'] / first[name]['p50_ms']:.2f}x)")
+    return results
+
+
+async def asgi_request(method, path, query="", body=None, headers=()):
+    """Call the app directly, streaming `body` in and counting the response as it streams out.
+
+    httpx's ASGI transport buffers whole bodies, which would hide whether the app streams.
+    """
+    chunks = body.__aiter__() if body is not None else None
+    received = {"status": None, "bytes": 0, "body": b""}
+    body_sent, finished = False, asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            # Like a server, report the disconnect only once the response is done
+            await finished.wait()
+            return {"type": "http.disconnect"}
+        if chunks is not None:
+            async for chunk in chunks:
+                return {"type": "http.request", "body": chunk, "more_body": True}
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            received["bytes"] += len(message.get("body", b""))
+            if received["bytes"] < 65536:
+                received["body"] += message.get("body", b"")
+            if not message.get("more_body", False):
+                finished.set()
+
+    scope = {"type": "http", "http_version": "1.1", "method": method, "path": path, "raw_path": path.encode(),
+             "root_path": "", "scheme": "http", "query_string": query.encode(), "server": ("benchmark", 80),
+             "client": ("127.0.0.1", 1), "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    await server.app(scope, receive, send)
+    return received
+
+
+async def transfer_benchmark(task_count, store="sqlite", format="ndjson"):
+    """Export and import `task_count` tasks through the API while sampling resident memory.
+
+    The export is counted as it streams out and the import body is generated as it is sent, so
+    neither side of the benchmark holds the dump either; peak memory above the starting point
+    should stay flat as task_count grows.
+    """
+    storage = use_store(store)
+    print(f"\n🌱 Seeding {task_count} tasks ({store})...")
+    await seed(storage, task_count)
+    peak = {"rss_mb": 0.0}
+
+    async def sample():
+        while True:
+            peak["rss_mb"] = max(peak["rss_mb"], memory_mb()["rss_mb"])
+            await asyncio.sleep(0.02)
+
+    async def measure(name, make_request):
+        baseline = memory_mb()["rss_mb"]
+        peak["rss_mb"] = baseline
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        response = await make_request()
+        seconds = time.perf_counter() - started
+        sampler.cancel()
+        print(f"   {name:24} status={response['status']} {response['bytes'] / 2 ** 20:8.1f} MB out  {seconds:7.2f}s "
+              f"{task_count / seconds:10,.0f} tasks/s  peak +{peak['rss_mb'] - baseline:.1f} MB RSS")
+        return response
+
+    async def generated_body():
+        async def tasks():
+            for task in make_tasks(task_count, seed=11):
+                yield task
+        async for chunk in encode_documents(tasks(), format, server.TRANSFER_FIELDS[server.TransferKind.TASKS]):
+            yield chunk
+
+    print(f"📤📥 {format} transfer of {task_count} tasks")
+    await measure("GET /api/export", lambda: asgi_request("GET", "/api/export", f"format={format}"))
+    response = await measure("POST /api/import", lambda: asgi_request(
+        "POST", "/api/import", f"format={format}", generated_body(), [("x-user-id", "import-benchmark")]))
+    print(f"   {response['body'].decode()[:200]}")
+    await storage.drop()
+
+
+ADVICE = ["Finish today's DSA problems before anything else.", "Push one project commit.",
+          "Send two applications before the evening.", "Review yesterday's mistakes for 15 minutes.",
+          "Timebox learning to an hour.", "Update your resume with the latest project."]
+
+
+def make_recommendations(count, start, seed=5):
+    """`count` past recommendations, one reply of shuffled advice each, dated before `start`"""
+    rng = random.Random(seed)
+    first = datetime.strptime(start, "%Y-%m-%d") - timedelta(days=count)
+    for i in range(count):
+        day = first + timedelta(days=i)
+        lines = rng.sample(ADVICE, 4) + [f"Focus on {rng.choice(TOPICS)} in today's session."]
+        yield {"id": str(uuid.uuid4()), "date": day.strftime("%Y-%m-%d"), "created_at": day.replace(tzinfo=timezone.utc),
+               "recommendations": ["\n".join(f"{n}. {line}" for n, line in enumerate(lines, start=1))],
+               "focus_areas": [], "priority_tasks": []}
+
+
+async def context_scaling(history_sizes, store="memory", iterations=20, batch_size=10000):
+    """Time prompt context building and POST /api/ai/recommendations as recommendation history grows.
+
+    The context only reads bounded history (week rollups, a window of completion days and the
+    latest recommendations), so prompt tokens and latency stay flat while the history a naive
+    prompt would carry grows with it.
+    """
+    storage = use_store(store)
+    user = server.DEFAULT_USER_ID
+    today = datetime.now().strftime("%Y-%m-%d")
+    await storage.drop()
+    start = (datetime.now() - timedelta(days=100)).strftime("%Y-%m-%d")
+    await storage.insert_tasks(user, list(make_tasks(1000, start_date=start)))
+    await storage.ensure_indexes()
+    await server.rebuild_rollups(user)
+    results, stored, history_tokens = {}, 0, 0
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=30) as client:
+        print(f"\n🧠 Recommendation prompts with a {server.AI_CONTEXT_TOKEN_BUDGET} token context budget ({store})")
+        for size in history_sizes:
+            recommendations = list(make_recommendations(size, today))[stored:]
+            for offset in range(0, len(recommendations), batch_size):
+                await storage.upsert_recommendations(user, recommendations[offset:offset + batch_size])
+            history_tokens += sum(server.count_tokens(rec["recommendations"][0]) for rec in recommendations)
+            stored = size
+
+            server.response_cache.invalidate(user)
+            cold = await time_calls(lambda: server.build_prompt_context(user, today), 1)
+            warm = await time_calls(lambda: server.build_prompt_context(user, today), iterations)
+            context, sections, _ = await server.build_prompt_context(user, today)
+            counter = iter(range(iterations))
+            latencies = await time_calls(lambda: client.post("/api/ai/recommendations",
+                                                             json={"user_prompt": f"Question {size}-{next(counter)}"}),
+                                         iterations)
+            response = await client.post("/api/ai/recommendations", json={"user_prompt": "Tokens"})
+            results[str(size)] = {
+                "history_tokens": history_tokens,
+                "context_tokens": server.count_tokens(context),
+                "prompt_tokens": response.json()["prompt_tokens"],
+                "sections": sections,
+                "build_cold_ms": round(cold[0], 2),
+                "build_cached_ms": summarize(warm)["p50_ms"],
+                "route_p50_ms": summarize(latencies)["p50_ms"],
+            }
+            row = results[str(size)]
+            print(f"   {size:>7} past recommendations ({history_tokens:>9} tokens): prompt={row['prompt_tokens']:5} tokens "
+                  f"{sections} build cold={row['build_cold_ms']:6.2f}ms cached={row['build_cached_ms']:5.2f}ms "
+                  f"route p50={row['route_p50_ms']:6.2f}ms")
+    await storage.drop()
+    return results
+
+
+class FlakyStorage:
+    """Fault-injecting stand-in around a storage engine.
+
+    Reads fail with a network error at `failure_rate`, and every call takes `delay` seconds.
+    Like Mongo under maxTimeMS, a call that would outlast the request deadline stops at the
+    deadline and raises a timeout instead.
+    """
+    def __init__(self, engine, failure_rate=0.0, delay=0.0, seed=1):
+        self.engine = engine
+        self.failure_rate = failure_rate
+        self.delay = delay
+        self.rng = random.Random(seed)
+
+    def is_transient(self, error):
+        return isinstance(error, AutoReconnect) or self.engine.is_transient(error)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.engine, name)
+        if name not in RetryingStorage.READS:
+            return attribute
+
+        async def read(*args, **kwargs):
+            if self.delay:
+                left = remaining()
+                if left is not None and left < self.delay:
+                    await asyncio.sleep(max(left, 0))
+                    raise TimeoutError(f"{name} exceeded the request deadline")
+                await asyncio.sleep(self.delay)
+            if self.rng.random() < self.failure_rate:
+                raise AutoReconnect(f"Injected network error in {name}")
+            return await attribute(*args, **kwargs)
+        return read
+
+
+async def resilience_benchmark(failure_rate=0.3, requests=200, concurrency=8):
+    """Inject faults into storage and the fake LLM and show how the API degrades.
+
+    Flaky reads are retried with jittered backoff, slow storage and a slow LLM are cut off at the
+    request deadline, and a failing LLM trips the circuit breaker, which serves the last
+    recommendation until a trial call succeeds again.
+    """
+    engine = use_store("memory")
+    await seed(engine, 1000)
+    retries = []
+    transport = httpx.ASGITransport(app=server.app)
+    server.response_cache.max_entries = 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=30) as client:
+        print(f"\n🔁 GET /api/tasks with {failure_rate:.0%} of storage reads failing")
+        for name, store in (("no retries", FlakyStorage(engine, failure_rate)),
+                            ("retrying reads", RetryingStorage(FlakyStorage(engine, failure_rate),
+                                                               on_retry=lambda *args: retries.append(args)))):
+            server.store = store
+            latencies, wall, errors = await drive(client, lambda: ("GET", "/api/tasks", {"params": {"limit": 50}}),
+                                                  requests, concurrency)
+            summary = summarize(latencies, wall)
+            print(f"   {name:16} errors={errors / requests:6.1%} p50={summary['p50_ms']:7.2f}ms "
+                  f"p99={summary['p99_ms']:7.2f}ms retries={len(retries)}")
+
+        print("\n⏱️  Deadlines (X-Request-Timeout-Ms: 250)")
+        deadline = {"X-Request-Timeout-Ms": "250"}
+        server.store = RetryingStorage(FlakyStorage(engine, delay=2.0))
+        started = time.perf_counter()
+        response = await client.get("/api/tasks", params={"limit": 50}, headers=deadline)
+        print(f"   storage taking 2s      -> {response.status_code} in {(time.perf_counter() - started) * 1000:6.0f}ms")
+        server.store = engine
+        chunk_delay = os.environ["LLM_FAKE_CHUNK_DELAY"]
+        os.environ["LLM_FAKE_CHUNK_DELAY"] = "0.05"
+        breaker = server.llm_executor.breaker
+        started = time.perf_counter()
+        response = await client.post("/api/ai/recommendations", json={"user_prompt": "Slow reply"}, headers=deadline)
+        print(f"   LLM reply taking ~2s   -> {response.status_code} in {(time.perf_counter() - started) * 1000:6.0f}ms "
+              f"(header ignored on the LLM route) [{breaker.state}]")
+        llm_timeout, server.llm_executor.timeout_seconds = server.llm_executor.timeout_seconds, 0.25
+        started = time.perf_counter()
+        response = await client.post("/api/ai/recommendations", json={"user_prompt": "Slower reply"})
+        print(f"   LLM past its 0.25s timeout -> {response.status_code} in {(time.perf_counter() - started) * 1000:6.0f}ms "
+              f"(one provider failure) [{breaker.state}]")
+        server.llm_executor.timeout_seconds = llm_timeout
+        os.environ["LLM_FAKE_CHUNK_DELAY"] = chunk_delay
+        response = await client.put("/api/tasks/missing", json={"status": "COMPLETED"})
+        print(f"   update of a missing task -> {response.status_code} {response.json()['detail']}")
+
+        print("\n🔌 LLM circuit breaker (every provider call failing)")
+        saved = breaker.failure_threshold, breaker.reset_seconds
+        breaker.failure_threshold, breaker.reset_seconds = 3, 1.0
+        await client.post("/api/ai/recommendations", json={"user_prompt": "Before the outage"})
+        os.environ["LLM_FAKE_FAILURE_RATE"] = "1"
+        try:
+            for attempt in range(6):
+                started = time.perf_counter()
+                response = await client.post("/api/ai/recommendations", json={"user_prompt": f"Question {attempt}"})
+                body = response.json()
+                outcome = "stale recommendation" if body.get("stale") else body.get("detail", "")[:60]
+                print(f"   call {attempt + 1}: {response.status_code} in {(time.perf_counter() - started) * 1000:6.1f}ms "
+                      f"[{breaker.state}] {outcome}")
+            os.environ["LLM_FAKE_FAILURE_RATE"] = "0"
+            await asyncio.sleep(breaker.reset_seconds)
+            response = await client.post("/api/ai/recommendations", json={"user_prompt": "After recovery"})
+            print(f"   trial call after {breaker.reset_seconds:.0f}s: {response.status_code} [{breaker.state}] "
+                  f"stale={response.json().get('stale')}")
+        finally:
+            os.environ.pop("LLM_FAKE_FAILURE_RATE", None)
+            breaker.failure_threshold, breaker.reset_seconds = saved
+            breaker.record_success()
+    await engine.drop()
+
+
+# Runs in a fresh interpreter, so imports are cold; prints one JSON line of timings
+STARTUP_PROBE = """
+import asyncio, json, sys, time
+import httpx
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def main():
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://startup")
+    async with server.app.router.lifespan_context(server.app):
+        started_up = time.perf_counter()
+        response = await client.get("/api/tasks", params={"limit": 1})
+        served = time.perf_counter()
+        ready = await client.get("/ready")
+        warmed = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "lifespan_ms": (started_up - imported) * 1000,
+        "first_request_ms": (served - started_up) * 1000,
+        "import_to_first_response_ms": (served - started) * 1000,
+        "ready_ms": (warmed - served) * 1000,
+        "status": [response.status_code, ready.status_code],
+    }))
+
+asyncio.run(main())
+"""
+
+
+def startup_benchmark(store="sqlite", runs=5):
+    """Median import, lifespan and first request time of fresh server processes.
+
+    Clients are opened in the lifespan and the LLM SDK on first use (or by /ready), so neither
+    is paid for at import; ready_ms is what a readiness probe spends warming them afterwards.
+    """
+    env = {**os.environ, "STORAGE_ENGINE": store}
+    if store == "sqlite":
+        env["SQLITE_PATH"] = str(Path(tempfile.mkdtemp()) / "startup.sqlite3")
+    backend = str(Path(__file__).parent / "backend")
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE, backend], env=env, capture_output=True,
+                                text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    print(f"\n🚀 Startup of a fresh process ({store}, LLM_BACKEND={env.get('LLM_BACKEND', 'default')}), median of {runs}")
+    results = {}
+    for name in samples[0]:
+        if name == "status":
+            continue
+        results[name] = round(statistics.median(sample[name] for sample in samples), 1)
+        print(f"   {name:32} {results[name]:8.1f}ms")
+    print(f"   statuses                         {samples[-1]['status']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API routes in process")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="drive concurrent load at every route")
+    run.add_argument("--sizes", default="1000", help="comma separated dataset sizes, e.g. 1000,100000,1000000")
+    run.add_argument("--store", choices=STORES, default="mongomock")
+    run.add_argument("--requests", type=int, default=200, help="requests per route and size")
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--routes", help="comma separated route names to run, default all")
+    run.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    run.add_argument("--output", help="write results as a JSON baseline")
+    run.add_argument("--compare", help="baseline JSON to compare against")
+    run.add_argument("--threshold", type=float, default=0.2, help="allowed p95 slowdown before failing")
+
+    overview = commands.add_parser("overview", help="compare the legacy and current dashboard overview")
+    overview.add_argument("tasks", type=int, nargs="?", default=10000)
+    overview.add_argument("--store", choices=["mongomock", "mongo"], default="mongo")
+
+    serialization = commands.add_parser("serialization", help="compare per-1k-task serialization cost")
+    serialization.add_argument("tasks", type=int, nargs="?", default=1000)
+
+    payload = commands.add_parser("payload", help="compare response sizes across fields, compression and formats")
+    payload.add_argument("tasks", type=int, nargs="?", default=1000)
+    payload.add_argument("--store", choices=STORES, default="memory")
+
+    storage = commands.add_parser("storage", help="run conformance checks and timings on each storage engine")
+    storage.add_argument("--engines", default="memory,sqlite,mongomock", help="comma separated engines")
+    storage.add_argument("--tasks", type=int, default=10000)
+    storage.add_argument("--iterations", type=int, default=200)
+
+    users = commands.add_parser("users", help="show per-user route latency staying flat as the user count grows")
+    users.add_argument("--users", default="1,100,10000,100000", help="comma separated user counts")
+    users.add_argument("--store", choices=STORES, default="memory")
+    users.add_argument("--tasks-per-user", type=int, default=5)
+    users.add_argument("--requests", type=int, default=200, help="requests per route and user count")
+    users.add_argument("--concurrency", type=int, default=16)
+    users.add_argument("--output", help="write results as JSON")
+
+    search = commands.add_parser("search", help="show search latency following matches rather than collection size")
+    search.add_argument("--sizes", default="1000,10000,100000", help="comma separated dataset sizes")
+    search.add_argument("--store", choices=["memory", "sqlite", "mongo"], default="memory")
+    search.add_argument("--iterations", type=int, default=100)
+    search.add_argument("--output", help="write results as JSON")
+
+    transfer = commands.add_parser("transfer", help="stream a full export and import, reporting peak memory")
+    transfer.add_argument("tasks", type=int, nargs="?", default=100000)
+    transfer.add_argument("--store", choices=STORES, default="sqlite")
+    transfer.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+
+    startup = commands.add_parser("startup", help="time a fresh process from import to its first served request")
+    startup.add_argument("--store", choices=["memory", "sqlite", "mongo"], default="sqlite")
+    startup.add_argument("--runs", type=int, default=5)
+
+    resilience = commands.add_parser("resilience", help="inject storage and LLM faults into retries, deadlines and the breaker")
+    resilience.add_argument("--failure-rate", type=float, default=0.3, help="share of storage reads that fail")
+    resilience.add_argument("--requests", type=int, default=200)
+    resilience.add_argument("--concurrency", type=int, default=8)
+
+    context = commands.add_parser("context", help="show recommendation prompts staying within budget as history grows")
+    context.add_argument("--history", default="10,1000,100000", help="comma separated recommendation history sizes")
+    context.add_argument("--store", choices=STORES, default="memory")
+    context.add_argument("--iterations", type=int, default=20)
+    context.add_argument("--output", help="write results as JSON")
+
+    args = parser.parse_args()
+    if args.command == "context":
+        results = asyncio.run(context_scaling([int(size) for size in args.history.split(",")], args.store, args.iterations))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+        return 0
+    if args.command == "resilience":
+        asyncio.run(resilience_benchmark(args.failure_rate, args.requests, args.concurrency))
+        return 0
+    if args.command == "startup":
+        startup_benchmark(args.store, args.runs)
+        return 0
+    if args.command == "transfer":
+        asyncio.run(transfer_benchmark(args.tasks, args.store, args.format))
+        return 0
+    if args.command == "search":
+        results = asyncio.run(search_scaling([int(size) for size in args.sizes.split(",")], args.store, args.iterations))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+        return 0
+    if args.command == "users":
+        results = asyncio.run(user_scaling([int(count) for count in args.users.split(",")], args.store,
+                                           args.tasks_per_user, args.requests, args.concurrency))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+        return
+    if args.command == "storage":
+        _, failed = asyncio.run(compare_storage(args.engines.split(","), args.tasks, args.iterations))
+        return 1 if failed else 0
+    if args.command == "payload":
+        asyncio.run(payload_sizes(args.tasks, args.store))
+        return 0
+    if args.command == "serialization":
+        serialization_benchmark(args.tasks)
+        return 0
+    if args.command == "overview":
+        legacy, current = asyncio.run(compare_dashboard_overview(args.tasks, store=args.store))
+        return 0 if current["p50_ms"] <= legacy["p50_ms"] else 1
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    routes = set(args.routes.split(",")) if args.routes else None
+    results = asyncio.run(run_suite(sizes, args.store, args.requests, args.concurrency, routes, cache=not args.no_cache))
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "store": args.store,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Saved results to {args.output}")
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 import { BrowserRouter, Routes, Route } from "react-router-dom";
 import axios from "axios";
@@ -11,6 +11,40 @@ import { Toaster } from "./components/ui/sonner";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const WS_URL = `${BACKEND_URL.replace(/^http/, "ws")}/api/ws`;
+// Task fields the views render; the API projects the rest away
+const TASK_LIST_FIELDS = "category,description,status,week_number,phase,priority,completed_at";
+
+// Identifies this tab's writes, so their change events (already applied from the response) are skipped
+const CLIENT_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+const WRITE_HEADERS = { headers: { "X-Client-Id": CLIENT_ID } };
+
+const percentage = (completed, total) => (total > 0 ? (completed / total) * 100 : 0);
+
+// Apply task status deltas to dashboard counters without refetching the overview
+const applyDeltasToDashboard = (data, deltas) => {
+  if (!data) return data;
+  const overview = { ...data.overview };
+  const today = { ...data.today, tasks: [...(data.today.tasks || [])] };
+  const currentWeek = { ...data.current_week };
+  const categories = data.category_distribution.map(item => ({ ...item }));
+
+  deltas.forEach(delta => {
+    const change = (delta.status === "COMPLETED") - (delta.previous_status === "COMPLETED");
+    today.tasks = today.tasks.map(task => (task.id === delta.id ? { ...task, ...delta } : task));
+    if (!change) return;
+    overview.completed_tasks += change;
+    if (delta.date === today.date) today.completed_tasks += change;
+    if (delta.week_number === currentWeek.week_number) currentWeek.completed_tasks += change;
+    const category = categories.find(item => item._id === delta.category);
+    if (category) category.completed += change;
+  });
+
+  overview.overall_completion = percentage(overview.completed_tasks, overview.total_tasks);
+  today.completion_percentage = percentage(today.completed_tasks, today.total_tasks);
+  currentWeek.completion_percentage = percentage(currentWeek.completed_tasks, currentWeek.total_tasks);
+  return { ...data, overview, today, current_week: currentWeek, category_distribution: categories };
+};
 
 // Context for global state
 export const AppContext = React.createContext();
@@ -20,17 +54,26 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [dashboardData, setDashboardData] = useState(null);
   const [sidebarOpen, setSidebarOpen] = useState(true);
+  const lastEvent = useRef({ epoch: null, seq: null });
 
   const fetchTasks = async (filters = {}) => {
     setLoading(true);
     try {
-      const params = new URLSearchParams();
+      const params = new URLSearchParams({ fields: TASK_LIST_FIELDS });
       Object.keys(filters).forEach(key => {
         if (filters[key]) params.append(key, filters[key]);
       });
       
-      const response = await axios.get(`${API}/tasks?${params}`);
-      setTasks(response.data);
+      // Follow the keyset cursor until the last page
+      const allTasks = [];
+      let cursor = null;
+      do {
+        if (cursor) params.set("cursor", cursor);
+        const response = await axios.get(`${API}/tasks?${params}`);
+        allTasks.push(...response.data);
+        cursor = response.headers["x-next-cursor"];
+      } while (cursor);
+      setTasks(allTasks);
     } catch (error) {
       console.error("Error fetching tasks:", error);
     } finally {
@@ -47,20 +90,37 @@ function App() {
     }
   };
 
+  // Our own writes are applied from their responses: the socket only hears about writes served by
+  // the same API worker, and it skips the events our writes cause
   const updateTaskStatus = async (taskId, status) => {
+    const previous = [...tasks, ...(dashboardData?.today?.tasks || [])].find(task => task.id === taskId);
     try {
-      await axios.put(`${API}/tasks/${taskId}`, { status });
-      await fetchTasks();
-      await fetchDashboardData();
+      const response = await axios.put(`${API}/tasks/${taskId}`, { status }, WRITE_HEADERS);
+      if (previous) {
+        applyTaskDeltas([{ ...response.data, previous_status: previous.status }]);
+      } else {
+        // Without the previous status the counters cannot be patched
+        await fetchDashboardData();
+      }
     } catch (error) {
       console.error("Error updating task:", error);
     }
   };
 
+  const bulkUpdateTasks = async (payload) => {
+    try {
+      const response = await axios.patch(`${API}/tasks/bulk`, payload, WRITE_HEADERS);
+      applyTaskDeltas(response.data.tasks);
+      return response.data;
+    } catch (error) {
+      console.error("Error bulk updating tasks:", error);
+    }
+  };
+
   const initializeSchedule = async () => {
     setLoading(true);
     try {
-      await axios.post(`${API}/tasks/initialize`);
+      await axios.post(`${API}/tasks/initialize`, null, WRITE_HEADERS);
       await fetchTasks();
       await fetchDashboardData();
     } catch (error) {
@@ -70,11 +130,69 @@ function App() {
     }
   };
 
+  const applyTaskDeltas = (deltas) => {
+    const byId = new Map(deltas.map(delta => [delta.id, delta]));
+    setTasks(current => current.map(task => {
+      const delta = byId.get(task.id);
+      if (!delta) return task;
+      const { previous_status, ...fields } = delta;
+      return { ...task, ...fields };
+    }));
+    setDashboardData(current => applyDeltasToDashboard(current, deltas));
+  };
+
   useEffect(() => {
     fetchTasks();
     fetchDashboardData();
   }, []);
 
+  // Subscribe to task change events, resuming from the last seen seq after reconnects
+  useEffect(() => {
+    let socket = null;
+    let retryTimer = null;
+    let retryDelay = 1000;
+    let closed = false;
+
+    const connect = () => {
+      const { epoch, seq } = lastEvent.current;
+      const params = epoch ? `?${new URLSearchParams({ epoch, since: seq })}` : "";
+      socket = new WebSocket(`${WS_URL}${params}`);
+      socket.binaryType = "arraybuffer";
+
+      socket.onopen = () => {
+        retryDelay = 1000;
+      };
+
+      socket.onmessage = (message) => {
+        const data = typeof message.data === "string" ? message.data : new TextDecoder().decode(message.data);
+        const event = JSON.parse(data);
+        lastEvent.current = { epoch: event.epoch, seq: event.seq };
+
+        // Missed events are replayed after "hello", or the server asks for a resync
+        if (event.origin === CLIENT_ID) return;
+        if (event.type === "tasks_updated") {
+          applyTaskDeltas(event.tasks);
+        } else if (event.type === "schedule_changed" || event.type === "resync") {
+          fetchTasks();
+          fetchDashboardData();
+        }
+      };
+
+      socket.onclose = () => {
+        if (closed) return;
+        retryTimer = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (socket) socket.close();
+    };
+  }, []);
+
   const contextValue = {
     tasks,
     setTasks,
@@ -83,6 +201,7 @@ function App() {
     fetchTasks,
     fetchDashboardData,
     updateTaskStatus,
+    bulkUpdateTasks,
     initializeSchedule
   };
 
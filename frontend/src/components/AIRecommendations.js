@@ -66,13 +66,33 @@ Keep it concise and actionable.
     }
 
     setLoading(true);
+    setRecommendations("");
     try {
-      const response = await axios.post(`${API}/ai/recommendations`, {
-        user_prompt: prompt,
-        context: "dashboard"
+      // Stream the recommendation as server-sent events and render chunks as they arrive
+      const response = await fetch(`${API}/ai/recommendations/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ user_prompt: prompt, context: "dashboard" })
       });
+      if (!response.ok) throw new Error(`Request failed with status ${response.status}`);
 
-      setRecommendations(response.data.recommendations);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+          if (event === "chunk") setRecommendations(current => current + data.text);
+          if (event === "done") setRecommendations(data.recommendations);
+          if (event === "error") throw new Error(data.detail);
+        }
+      }
       setPrompt("");
       await fetchRecommendationHistory();
       toast.success("AI recommendations generated! ✨", {
@@ -1,4 +1,5 @@
-import React, { useContext, useState, useEffect } from "react";
+import React, { useContext, useState, useEffect, useRef } from "react";
+import axios from "axios";
 import { AppContext } from "../App";
 import { 
   ChevronLeft, 
@@ -17,12 +18,19 @@ import { Card, CardContent, CardHeader, CardTitle } from "./ui/card";
 import { Badge } from "./ui/badge";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "./ui/select";
 
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+
+const toDateString = (date) => date.toISOString().split('T')[0];
+
 const Calendar = () => {
-  const { tasks, updateTaskStatus, fetchTasks } = useContext(AppContext);
+  const { tasks, updateTaskStatus } = useContext(AppContext);
   const [currentDate, setCurrentDate] = useState(new Date());
   const [selectedDate, setSelectedDate] = useState(null);
   const [categoryFilter, setCategoryFilter] = useState("ALL");
   const [statusFilter, setStatusFilter] = useState("ALL");
+  const [calendarDays, setCalendarDays] = useState({});
+  // Month grids already fetched, keyed by their first day; cleared whenever tasks change
+  const monthCache = useRef(new Map());
 
   // Get calendar data
   const getCalendarDays = () => {
@@ -47,14 +55,44 @@ const Calendar = () => {
     return days;
   };
 
+  const days = getCalendarDays();
+  const gridStart = toDateString(days[0]);
+  const gridEnd = toDateString(days[days.length - 1]);
+
+  useEffect(() => {
+    monthCache.current.clear();
+  }, [tasks]);
+
+  // Fetch only the visible grid, already grouped per day by the server
+  useEffect(() => {
+    const cached = monthCache.current.get(gridStart);
+    if (cached) {
+      setCalendarDays(cached);
+      return;
+    }
+    let cancelled = false;
+    axios.get(`${API}/tasks/calendar`, { params: { from: gridStart, to: gridEnd } })
+      .then(response => {
+        const byDate = Object.fromEntries(response.data.days.map(day => [day.date, day]));
+        monthCache.current.set(gridStart, byDate);
+        if (!cancelled) setCalendarDays(byDate);
+      })
+      .catch(error => console.error("Error fetching calendar:", error));
+    return () => {
+      cancelled = true;
+    };
+  }, [gridStart, gridEnd, tasks]);
+
   const getDayTasks = (date) => {
-    const dateStr = date.toISOString().split('T')[0];
-    return tasks.filter(task => {
-      const matchesDate = task.date === dateStr;
-      const matchesCategory = categoryFilter === "ALL" || task.category === categoryFilter;
-      const matchesStatus = statusFilter === "ALL" || task.status === statusFilter;
-      return matchesDate && matchesCategory && matchesStatus;
-    });
+    const day = calendarDays[toDateString(date)];
+    if (!day) return [];
+    return day.tasks
+      .filter(task => {
+        const matchesCategory = categoryFilter === "ALL" || task.category === categoryFilter;
+        const matchesStatus = statusFilter === "ALL" || task.status === statusFilter;
+        return matchesCategory && matchesStatus;
+      })
+      .map(task => ({ ...task, date: day.date }));
   };
 
   const isToday = (date) => {
@@ -117,7 +155,6 @@ const Calendar = () => {
     }
   };
 
-  const calendarDays = getCalendarDays();
   const monthNames = [
     "January", "February", "March", "April", "May", "June",
     "July", "August", "September", "October", "November", "December"
@@ -223,7 +260,7 @@ const Calendar = () => {
 
               {/* Enhanced Calendar grid */}
               <div className="calendar-grid">
-                {calendarDays.map((day, index) => {
+                {days.map((day, index) => {
                   const dayTasks = getDayTasks(day);
                   const hasTasksClass = dayTasks.length > 0 ? 'has-tasks' : '';
                   const todayClass = isToday(day) ? 'today' : '';
@@ -30,6 +30,7 @@ const Dashboard = () => {
     loading, 
     dashboardData, 
     updateTaskStatus, 
+    bulkUpdateTasks,
     initializeSchedule,
     fetchDashboardData 
   } = useContext(AppContext);
@@ -88,6 +89,20 @@ const Dashboard = () => {
     });
   };
 
+  const handleCompleteAll = async () => {
+    const open = todayTasks.filter(task => task.status !== 'COMPLETED');
+    const result = await bulkUpdateTasks({
+      items: open.map(task => ({ id: task.id, status: 'COMPLETED' }))
+    });
+    if (!result) {
+      toast.error("Failed to update tasks. Please try again.");
+      return;
+    }
+    toast.success(`${result.counts.updated} tasks marked as completed 🎉`, {
+      className: "success-glow"
+    });
+  };
+
   const handleInitialize = async () => {
     await initializeSchedule();
     toast.success("Schedule initialized successfully! 🚀", {
@@ -274,6 +289,15 @@ const Dashboard = () => {
             <Badge className="ml-auto bg-gradient-to-r from-purple-500/20 to-blue-500/20 border-purple-500/30 text-purple-200">
               {todayTasks.length} tasks
             </Badge>
+            <Button
+              size="sm"
+              onClick={handleCompleteAll}
+              disabled={todayTasks.every(task => task.status === 'COMPLETED')}
+              className="glass-interactive bg-gradient-to-r from-green-500/20 to-emerald-500/20 border-green-500/30 hover:from-green-500/30 hover:to-emerald-500/30 text-white font-semibold"
+            >
+              <CheckCircle2 className="w-4 h-4 mr-2" />
+              Mark all done
+            </Button>
           </CardTitle>
           <CardDescription className="text-gray-400">
             Click on tasks to update their status: Pending → In Progress → Completed
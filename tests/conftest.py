@@ -0,0 +1,55 @@
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "backend"))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dashboard_test")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0")
+
+import server  # noqa: E402
+from storage import MemoryStorage, MotorStorage, SqliteStorage  # noqa: E402
+
+ENGINES = ["memory", "sqlite", "mongomock"]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def open_engine(name, tmp_path):
+    if name == "memory":
+        return MemoryStorage()
+    if name == "sqlite":
+        return SqliteStorage(str(tmp_path / "dashboard.sqlite3"))
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return MotorStorage(mongomock_motor.AsyncMongoMockClient()["dashboard_test"])
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request, tmp_path):
+    store = open_engine(request.param, tmp_path)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+async def client(engine):
+    """An HTTP client for the app, serving from `engine` with fresh caches and a closed LLM circuit"""
+    saved = server.store
+    server.store = engine
+    server.response_cache.invalidate()
+    server.llm_executor.breaker.record_success()
+    await engine.ensure_indexes()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+    server.store = saved
@@ -0,0 +1,72 @@
+import orjson
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def week_tasks(client, week_number=1):
+    return (await client.get("/api/tasks", params={"week": week_number})).json()
+
+
+async def test_items_are_updated_by_id(client):
+    await client.post("/api/tasks/initialize")
+    first, second = (await week_tasks(client))[:2]
+
+    response = await client.patch("/api/tasks/bulk", json={"items": [
+        {"id": first["id"], "status": "COMPLETED"},
+        {"id": second["id"], "description": "Renamed"},
+        {"id": "missing", "status": "COMPLETED"},
+        {"id": first["id"]},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["counts"] == {"updated": 2, "not_found": 1, "unchanged": 1}
+    assert [result["result"] for result in body["results"]] == ["updated", "updated", "not_found", "unchanged"]
+    tasks = {task["id"]: task for task in await week_tasks(client)}
+    assert tasks[first["id"]]["status"] == "COMPLETED"
+    assert tasks[first["id"]]["completed_at"] is not None
+    assert tasks[second["id"]]["description"] == "Renamed"
+
+
+async def test_filter_updates_every_matching_task_and_rollups(client):
+    await client.post("/api/tasks/initialize")
+    dsa = [task for task in await week_tasks(client) if task["category"] == "DSA"]
+
+    response = await client.patch("/api/tasks/bulk", json={
+        "filter": {"week_number": 1, "category": "DSA"},
+        "update": {"status": "COMPLETED"},
+    })
+
+    assert response.json()["counts"] == {"updated": len(dsa)}
+    week = next(week for week in (await client.get("/api/progress/weekly")).json() if week["week_number"] == 1)
+    assert week["dsa_completed"] == len(dsa)
+    assert (await client.get("/api/progress/rollups/verify")).json()["ok"] is True
+
+
+@pytest.mark.parametrize("payload", [
+    {"filter": {"category": "DSA"}},
+    {"filter": {}, "update": {"status": "COMPLETED"}},
+])
+async def test_invalid_filter_requests_are_rejected(client, payload):
+    response = await client.patch("/api/tasks/bulk", json=payload)
+    assert response.status_code == 400
+
+
+async def test_response_and_events_carry_the_applied_deltas(client):
+    await client.post("/api/tasks/initialize")
+    task = (await week_tasks(client))[0]
+    queue = server.task_events.subscribe(server.DEFAULT_USER_ID)
+    try:
+        response = await client.patch("/api/tasks/bulk", headers={"X-Client-Id": "tab-1"},
+                                      json={"items": [{"id": task["id"], "status": "COMPLETED"}]})
+        event = queue.get_nowait()
+    finally:
+        server.task_events.unsubscribe(server.DEFAULT_USER_ID, queue)
+
+    delta = response.json()["tasks"][0]
+    assert (delta["id"], delta["previous_status"], delta["status"]) == (task["id"], task["status"], "COMPLETED")
+    sent = orjson.loads(orjson.dumps(event))
+    assert (sent["type"], sent["origin"], sent["tasks"]) == ("tasks_updated", "tab-1", [delta])
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+TODAY = """# Phase 1: Launch
+
+## Week 1: Today
+
+### {date}
+- DSA: 2 Easy problems {{priority: 2}}
+- APPLY: 5 apps {{priority: 3}}
+"""
+
+
+async def seed_today(client):
+    text = TODAY.format(date=datetime.now().strftime("%Y-%m-%d"))
+    await client.post("/api/tasks/initialize/upload", files={"file": ("schedule.md", text.encode(), "text/markdown")})
+    task = (await client.get("/api/tasks")).json()[0]
+    await client.put(f"/api/tasks/{task['id']}", json={"status": "COMPLETED"})
+
+
+async def test_overview_counts_today_without_status_in_fields(client):
+    await seed_today(client)
+
+    response = await client.get("/api/dashboard/overview", params={"fields": "description"})
+
+    assert response.status_code == 200
+    today = response.json()["today"]
+    assert (today["total_tasks"], today["completed_tasks"]) == (2, 1)
+    assert all(set(task) == {"id", "date", "description"} for task in today["tasks"])
+
+
+async def test_overview_keeps_status_when_requested(client):
+    await seed_today(client)
+
+    today = (await client.get("/api/dashboard/overview", params={"fields": "status"})).json()["today"]
+
+    assert sorted(task["status"] for task in today["tasks"]) == ["COMPLETED", "PENDING"]
+    assert today["completed_tasks"] == 1
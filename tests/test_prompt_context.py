@@ -0,0 +1,104 @@
+import pytest
+
+import server
+from prompt_context import ContextSection, count_tokens, fit_sections, recommendation_lines, task_lines
+
+pytestmark = pytest.mark.anyio
+
+
+def section(name, count, share, words=8):
+    return ContextSection(name, f"{name.title()}:", [f"{name} line {i} " + "word " * words for i in range(count)], share)
+
+
+@pytest.mark.parametrize("budget", [40, 120, 400, 1000])
+def test_context_stays_within_budget(budget):
+    sections = [section("tasks", 30, 0.5), section("summary", 10, 0.25), section("advice", 50, 0.25)]
+
+    text, spent = fit_sections(sections, budget)
+
+    assert count_tokens(text) <= budget
+    assert sum(spent.values()) <= budget
+
+
+def test_sections_keep_their_leading_lines_in_priority_order():
+    sections = [section("tasks", 30, 0.5), section("summary", 10, 0.25), section("advice", 50, 0.25)]
+
+    text, spent = fit_sections(sections, 200)
+
+    rendered = text.split("\n\n")
+    assert [block.splitlines()[0] for block in rendered] == ["Tasks:", "Summary:", "Advice:"][:len(rendered)]
+    for block, source in zip(rendered, sections):
+        kept = block.splitlines()[1:]
+        assert kept == [line for line, _ in source.lines[:len(kept)]]
+    assert spent["tasks"] >= spent["summary"]
+
+
+def test_unused_share_goes_to_the_other_sections():
+    sections = [section("tasks", 1, 0.5), section("summary", 0, 0.25), section("advice", 100, 0.25)]
+
+    text, spent = fit_sections(sections, 400)
+
+    assert spent["summary"] == 0
+    assert "Summary:" not in text
+    assert spent["advice"] > 400 * 0.25
+
+
+def test_everything_fits_when_the_budget_allows():
+    sections = [section("tasks", 3, 0.5), section("advice", 3, 0.5)]
+
+    text, _ = fit_sections(sections, 10000)
+
+    assert text.count("line") == 6
+
+
+def test_task_lines_put_unfinished_high_priority_tasks_first():
+    tasks = [
+        {"status": "COMPLETED", "priority": 3, "category": "DSA", "description": "done"},
+        {"status": "PENDING", "priority": 1, "category": "LEARN", "description": "low"},
+        {"status": "PENDING", "priority": 3, "category": "APPLY", "description": "high"},
+        {"status": "IN_PROGRESS", "priority": 2, "category": "OPS", "description": "started"},
+    ]
+    assert [line.split(": ")[1] for line in task_lines(tasks)] == ["started", "high", "low", "done"]
+    assert task_lines([]) == ["Nothing scheduled"]
+
+
+def test_recommendation_lines_drop_repeats_markers_and_headings():
+    recommendations = [
+        {"recommendations": ["**Top tasks:**\n1. Finish the DSA set.\n2. **Push** one commit"]},
+        {"recommendations": ["- finish the dsa set\n* Send two applications"]},
+    ]
+    assert recommendation_lines(recommendations) == [
+        "- Finish the DSA set.", "- Push one commit", "- Send two applications"]
+
+
+async def test_prompt_context_is_flat_as_history_grows(client, monkeypatch):
+    monkeypatch.setattr(server, "AI_CONTEXT_TOKEN_BUDGET", 300)
+    await client.post("/api/tasks/initialize")
+    user = server.DEFAULT_USER_ID
+    sizes = []
+    started = server.datetime(2025, 9, 1, tzinfo=server.timezone.utc)
+    for count in (20, 500):
+        await server.store.upsert_recommendations(user, [
+            {"id": f"rec-{i:05}", "date": "2025-09-01", "created_at": started + server.timedelta(minutes=i),
+             "recommendations": [f"1. Advice number {i:05} for the day.\n2. Keep going {i:05}."],
+             "focus_areas": [], "priority_tasks": []}
+            for i in range(count)
+        ])
+        server.response_cache.invalidate(user)
+        context, spent, _ = await server.build_prompt_context(user, "2025-09-22")
+        assert count_tokens(context) <= 300
+        sizes.append(sum(spent.values()))
+    assert sizes[0] == sizes[1]
+
+
+async def test_repeated_identical_request_is_served_from_cache(client):
+    await client.post("/api/tasks/initialize")
+    server.llm_cache._hot.clear()
+    question = {"user_prompt": "What should I focus on?"}
+
+    responses = [(await client.post("/api/ai/recommendations", json=question)).json() for _ in range(3)]
+
+    assert [response["cached"] for response in responses] == [False, True, True]
+    assert len({response["recommendations"] for response in responses}) == 1
+    history = (await client.get("/api/ai/recommendations/history")).json()
+    assert len(history) == 3
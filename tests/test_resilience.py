@@ -0,0 +1,236 @@
+import asyncio
+import time
+
+import pytest
+
+import resilience
+import server
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineMiddleware, deadline, remaining, retry
+from storage import MemoryStorage, RetryingStorage
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Transient(Exception):
+    pass
+
+
+def fail(breaker, error=None):
+    with pytest.raises(Exception):
+        with breaker.guard():
+            raise error or RuntimeError("provider down")
+
+
+# Circuit breaker
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("llm", failure_threshold=3, reset_seconds=30, clock=Clock())
+    fail(breaker)
+    fail(breaker)
+    with breaker.guard():
+        pass
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == "closed"
+
+    fail(breaker)
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.check()
+    assert raised.value.retry_after == 30
+
+
+def test_half_open_breaker_lets_one_trial_call_through():
+    clock = Clock()
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_seconds=30, clock=clock)
+    fail(breaker)
+    clock.now = 29
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 1
+
+    clock.now = 30
+    assert breaker.state == "half_open"
+    with breaker.guard():
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_call_reopens_the_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker("llm", failure_threshold=2, reset_seconds=30, clock=clock)
+    fail(breaker)
+    fail(breaker)
+    clock.now = 30
+
+    fail(breaker)
+
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 30
+
+
+def test_errors_that_are_not_failures_release_the_trial_call():
+    clock = Clock()
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_seconds=30, clock=clock)
+    fail(breaker)
+    clock.now = 30
+
+    with pytest.raises(TimeoutError):
+        with breaker.guard(lambda error: not isinstance(error, TimeoutError)):
+            raise TimeoutError()
+    assert breaker.state == "half_open"
+
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    assert breaker.state == "half_open"
+    breaker.check()
+
+
+# Retries and deadlines
+async def test_retry_repeats_transient_failures_only():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise Transient()
+        return "ok"
+
+    assert await retry(flaky, lambda error: isinstance(error, Transient), attempts=3, base_delay=0) == "ok"
+    assert len(calls) == 3
+
+
+async def test_retry_raises_other_failures_at_once():
+    calls = []
+
+    async def broken():
+        calls.append(1)
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        await retry(broken, lambda error: isinstance(error, Transient), attempts=3, base_delay=0)
+    assert len(calls) == 1
+
+
+async def test_retry_never_waits_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise Transient()
+
+    started = time.monotonic()
+    with deadline(0.05):
+        with pytest.raises(Transient):
+            await retry(failing, lambda error: True, attempts=5, base_delay=1.0)
+    assert len(calls) == 1
+    assert time.monotonic() - started < 0.05
+
+
+async def test_retry_gives_up_on_timeouts():
+    calls = []
+
+    async def timing_out():
+        calls.append(1)
+        raise TimeoutError()
+
+    with pytest.raises(TimeoutError):
+        await retry(timing_out, lambda error: True, attempts=3, base_delay=0)
+    assert len(calls) == 1
+
+
+async def test_deadlines_nest_without_extending_the_outer_one():
+    assert remaining() is None
+    with deadline(0.5):
+        with deadline(10):
+            assert remaining() <= 0.5
+        assert remaining(0.1) == 0.1
+
+
+async def test_retrying_storage_retries_transient_reads():
+    class Flaky(MemoryStorage):
+        failures = 2
+
+        async def find_tasks(self, *args, **kwargs):
+            if self.failures:
+                self.failures -= 1
+                raise Transient()
+            return await super().find_tasks(*args, **kwargs)
+
+        def is_transient(self, error):
+            return isinstance(error, Transient)
+
+    retries = []
+    store = RetryingStorage(Flaky(), base_delay=0, on_retry=lambda *args: retries.append(args))
+
+    assert await store.find_tasks("alice") == []
+    assert [(name, attempt) for name, _, attempt in retries] == [("find_tasks", 1), ("find_tasks", 2)]
+
+
+def test_client_cannot_shorten_fixed_path_deadlines():
+    middleware = DeadlineMiddleware(None, timeout_seconds=10, exempt_paths={"/api/export"},
+                                    path_timeouts={"/api/ai/recommendations": 70})
+    scope = lambda path, headers=(): {"type": "http", "path": path, "headers": list(headers)}
+    header = [(b"x-request-timeout-ms", b"5")]
+
+    assert middleware.timeout_for(scope("/api/tasks")) == 10
+    assert middleware.timeout_for(scope("/api/tasks", header)) == 0.005
+    assert middleware.timeout_for(scope("/api/ai/recommendations", header)) == 70
+    assert middleware.timeout_for(scope("/api/export", header)) is None
+
+
+# LLM executor
+class SlowChat:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    async def send_message(self, user_message):
+        await asyncio.sleep(self.seconds)
+        return "done"
+
+
+def executor(reply_seconds, timeout_seconds):
+    llm = server.LlmExecutor(timeout_seconds=timeout_seconds,
+                             breaker=CircuitBreaker("llm", failure_threshold=2, reset_seconds=30))
+    llm.session_for = lambda user_id, session_id: SlowChat(reply_seconds)
+    return llm
+
+
+async def test_caller_deadline_timeouts_do_not_open_the_breaker():
+    llm = executor(reply_seconds=1, timeout_seconds=60)
+    for _ in range(3):
+        with deadline(0.01):
+            with pytest.raises(asyncio.TimeoutError):
+                await llm.send("alice", None, server.new_user_message("hello"))
+    assert llm.breaker.state == "closed"
+
+
+async def test_provider_timeouts_open_the_breaker():
+    llm = executor(reply_seconds=1, timeout_seconds=0.01)
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            await llm.send("alice", None, server.new_user_message("hello"))
+    assert llm.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await llm.send("alice", None, server.new_user_message("hello"))
+
+
+def test_sessions_are_kept_apart_per_user():
+    llm = server.LlmExecutor()
+
+    alice = llm.session_for("alice", "shared")
+
+    assert llm.session_for("alice", "shared") is alice
+    assert llm.session_for("bob", "shared") is not alice
+    assert llm.session_for("alice", None) is not llm.session_for("alice", None)
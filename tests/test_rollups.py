@@ -0,0 +1,89 @@
+import orjson
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def week_progress(client, week_number):
+    weeks = (await client.get("/api/progress/weekly")).json()
+    return next(week for week in weeks if week["week_number"] == week_number)
+
+
+async def test_status_changes_increment_rollups(client):
+    await client.post("/api/tasks/initialize")
+    tasks = (await client.get("/api/tasks", params={"week": 1})).json()
+    before = await week_progress(client, 1)
+    overall = (await client.get("/api/dashboard/overview")).json()["overview"]["completed_tasks"]
+
+    dsa = next(task for task in tasks if task["category"] == "DSA")
+    other = next(task for task in tasks if task["category"] != "DSA")
+    for task in (dsa, other):
+        response = await client.put(f"/api/tasks/{task['id']}", json={"status": "COMPLETED"})
+        assert response.status_code == 200
+        assert response.json()["completed_at"] is not None
+
+    after = await week_progress(client, 1)
+    assert after["total_tasks"] == before["total_tasks"]
+    assert after["completed_tasks"] == before["completed_tasks"] + 2
+    assert after["dsa_completed"] == before["dsa_completed"] + 1
+    assert (await client.get("/api/dashboard/overview")).json()["overview"]["completed_tasks"] == overall + 2
+    assert (await client.get("/api/progress/rollups/verify")).json() == {"ok": True, "drift": []}
+
+
+async def test_repeated_and_reverted_updates_do_not_drift(client):
+    await client.post("/api/tasks/initialize")
+    task = (await client.get("/api/tasks", params={"week": 1})).json()[0]
+    before = await week_progress(client, 1)
+
+    for status in ("COMPLETED", "COMPLETED", "IN_PROGRESS", "COMPLETED", "PENDING"):
+        await client.put(f"/api/tasks/{task['id']}", json={"status": status})
+
+    assert (await week_progress(client, 1))["completed_tasks"] == before["completed_tasks"]
+    assert (await client.get("/api/progress/rollups/verify")).json()["ok"] is True
+
+
+async def test_description_only_update_leaves_rollups_alone(client):
+    await client.post("/api/tasks/initialize")
+    task = (await client.get("/api/tasks", params={"week": 1})).json()[0]
+    before = await week_progress(client, 1)
+
+    await client.put(f"/api/tasks/{task['id']}", json={"description": "Renamed"})
+
+    assert await week_progress(client, 1) == before
+
+
+async def test_update_of_missing_task_is_404(client):
+    response = await client.put("/api/tasks/missing", json={"status": "COMPLETED"})
+    assert response.status_code == 404
+
+
+async def import_then_overlong_line(client, monkeypatch):
+    exported = (await client.get("/api/export")).content.splitlines()
+    task = orjson.loads(exported[0])
+    task["status"] = "COMPLETED"
+    monkeypatch.setattr(server, "IMPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(server, "IMPORT_MAX_LINE_BYTES", 4096)
+    body = orjson.dumps(task) + b"\n" + b"x" * 8192
+    return await client.post("/api/import", content=body)
+
+
+async def test_failed_import_still_rebuilds_rollups_for_written_batches(client, monkeypatch):
+    await client.post("/api/tasks/initialize")
+    response = await import_then_overlong_line(client, monkeypatch)
+
+    assert response.status_code == 413
+    assert (await client.get("/api/progress/rollups/verify")).json()["ok"] is True
+
+
+async def test_rebuild_error_does_not_replace_the_import_failure(client, monkeypatch):
+    async def broken_rebuild(user_id):
+        raise RuntimeError("rollups unavailable")
+
+    await client.post("/api/tasks/initialize")
+    monkeypatch.setattr(server, "rebuild_rollups", broken_rebuild)
+
+    response = await import_then_overlong_line(client, monkeypatch)
+
+    assert response.status_code == 413
@@ -0,0 +1,80 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+SCHEDULE = """# Phase 1: Launch
+
+## Week 1: Sep 22 - Sep 28
+
+### 2025-09-22
+- DSA: 2 Easy problems (arrays) {priority: 2}
+- APPLY: 5 apps {priority: 3}
+
+### 2025-09-23
+- LEARN: React hooks {priority: 1}
+"""
+
+
+async def upload(client, text, **params):
+    files = {"file": ("schedule.md", text.encode(), "text/markdown")}
+    response = await client.post("/api/tasks/initialize/upload", files=files, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def stored_tasks(client):
+    return {task["description"]: task for task in (await client.get("/api/tasks")).json()}
+
+
+async def test_reingesting_the_same_schedule_changes_nothing(client):
+    first = await upload(client, SCHEDULE)
+    assert (first["inserted"], first["changed"], first["skipped"]) == (3, 3, False)
+    before = await stored_tasks(client)
+
+    again = await upload(client, SCHEDULE)
+    assert (again["changed"], again["skipped"]) == (0, True)
+
+    forced = await upload(client, SCHEDULE, force="true")
+    assert (forced["changed"], forced["unchanged"], forced["skipped"]) == (0, 3, False)
+    assert await stored_tasks(client) == before
+
+
+async def test_changed_rows_are_updated_in_place_keeping_progress(client):
+    await upload(client, SCHEDULE)
+    task = (await stored_tasks(client))["5 apps"]
+    await client.put(f"/api/tasks/{task['id']}", json={"status": "COMPLETED"})
+
+    result = await upload(client, SCHEDULE.replace("5 apps {priority: 3}", "5 apps {priority: 1}"))
+
+    assert (result["inserted"], result["updated"], result["deleted"], result["unchanged"]) == (0, 1, 0, 2)
+    updated = (await stored_tasks(client))["5 apps"]
+    assert (updated["id"], updated["status"], updated["priority"]) == (task["id"], "COMPLETED", 1)
+    assert (await client.get("/api/progress/rollups/verify")).json()["ok"] is True
+
+
+async def test_removed_rows_are_deleted(client):
+    await upload(client, SCHEDULE)
+    before = await stored_tasks(client)
+
+    result = await upload(client, SCHEDULE.replace("- LEARN: React hooks {priority: 1}\n", ""))
+
+    assert (result["deleted"], result["unchanged"]) == (1, 2)
+    after = await stored_tasks(client)
+    assert set(after) == {"2 Easy problems (arrays)", "5 apps"}
+    assert all(after[name]["id"] == before[name]["id"] for name in after)
+
+
+async def test_dry_run_reports_the_diff_without_writing(client):
+    await upload(client, SCHEDULE)
+    before = await stored_tasks(client)
+
+    result = await upload(client, SCHEDULE + "- OPS: Install Docker\n", dry_run="true")
+
+    assert (result["dry_run"], result["inserted"]) == (True, 1)
+    assert await stored_tasks(client) == before
+    assert (await upload(client, SCHEDULE + "- OPS: Install Docker\n"))["inserted"] == 1
+
+
+async def test_duplicate_rows_are_ingested_once(client):
+    result = await upload(client, SCHEDULE + "- LEARN: React hooks {priority: 1}\n")
+    assert (result["inserted"], result["duplicates"]) == (3, 1)
@@ -0,0 +1,33 @@
+import pytest
+
+import server
+from settings import Settings
+from storage import MemoryStorage
+
+pytestmark = pytest.mark.anyio
+
+
+def test_settings_are_read_from_upper_case_environment_names(monkeypatch):
+    monkeypatch.setenv("LLM_TIMEOUT_SECONDS", "12.5")
+    monkeypatch.setenv("AI_CONTEXT_TOKEN_BUDGET", "300")
+    monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "")
+
+    settings = Settings.from_env()
+
+    assert settings.llm_timeout_seconds == 12.5
+    assert settings.ai_context_token_budget == 300
+    assert settings.mongo_socket_timeout_ms is None
+    assert settings.llm_model == Settings().llm_model
+
+
+async def test_lifespan_leaves_an_injected_store_open(monkeypatch):
+    closed = []
+    engine = MemoryStorage()
+    engine.close = lambda: closed.append(engine)
+    monkeypatch.setattr(server, "store", engine)
+
+    async with server.app.router.lifespan_context(server.app):
+        pass
+
+    assert server.store is engine
+    assert closed == []
@@ -0,0 +1,24 @@
+import pytest
+
+from backend_benchmark import check_conformance
+from storage import RetryingStorage, Storage
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_engine_conforms_to_the_storage_interface(engine):
+    await engine.ensure_indexes()
+    assert await check_conformance(engine) == []
+
+
+async def test_retrying_proxy_conforms_too(engine):
+    await engine.ensure_indexes()
+    assert await check_conformance(RetryingStorage(engine)) == []
+
+
+def test_incomplete_engine_fails_when_created():
+    class Incomplete(Storage):
+        name = "incomplete"
+
+    with pytest.raises(TypeError, match="abstract"):
+        Incomplete()